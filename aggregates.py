@@ -0,0 +1,486 @@
+import numpy as np
+import pandas as pd
+
+from sketches import QuantileSketch
+
+# Các chiều của khối tổng hợp
+CUBE_DIMENSIONS = ['location', 'region', 'year', 'month']
+
+
+# Các cột số day_* được tổng hợp trong khối
+def measure_columns(df):
+    return [c for c in df.columns if c.startswith('day_') and pd.api.types.is_numeric_dtype(df[c])
+            and not pd.api.types.is_bool_dtype(df[c])]
+
+
+# Tách khoá ô (địa điểm, vùng, năm, tháng) cho một bảng
+def cell_keys(df):
+    months = df['date'].to_numpy(dtype='datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+    region = df['location_region'] if 'location_region' in df.columns else pd.Series('', index=df.index)
+    return pd.DataFrame({
+        'location': df['location_name'].astype(object).fillna('').astype(str).to_numpy(),
+        'region': region.astype(object).fillna('').astype(str).to_numpy(),
+        'year': months // 12 + 1970,
+        'month': months % 12 + 1,
+    })
+
+
+# Khoá ô của một dòng (dạng dict)
+def row_key(row):
+    d = pd.Timestamp(row['date'])
+    region = row.get('location_region')
+    region = '' if region is None or (isinstance(region, float) and np.isnan(region)) else str(region)
+    return str(row['location_name']), region, d.year, d.month
+
+
+# Giá trị các cột columns của một dòng (dạng dict); thiếu hoặc không phải số thì là NaN
+def row_values(row, columns):
+    values = np.full(len(columns), np.nan)
+    for j, col in enumerate(columns):
+        v = row.get(col)
+        if v is not None:
+            try:
+                values[j] = float(v)
+            except (TypeError, ValueError):
+                pass
+    return values
+
+
+# Mặt nạ các ô có khoá thoả điều kiện; mỗi điều kiện là một giá trị hoặc khoảng (đầu, cuối) tính cả hai đầu
+def match_cells(key_arrays, n_cells, **conditions):
+    mask = np.ones(n_cells, dtype=bool)
+    for dim, value in conditions.items():
+        if value is None:
+            continue
+        if isinstance(value, tuple):
+            lo, hi = value
+            mask &= (key_arrays[dim] >= lo) & (key_arrays[dim] <= hi)
+        else:
+            mask &= key_arrays[dim] == value
+    return mask
+
+
+class AggregateCube:
+    """Khối tổng hợp (địa điểm × vùng × năm × tháng) cho các cột số day_*.
+
+    Mỗi ô giữ count/sum/sum bình phương/min/max của từng cột nên trung bình, độ lệch chuẩn,
+    min/max theo tháng, năm, vùng hay địa điểm chỉ là cộng vài ô thay vì quét lại toàn bộ dòng.
+    Khối được cập nhật tại chỗ khi thêm/sửa/xóa bản ghi; riêng min/max của ô bị xóa đúng giá trị
+    biên thì được tính lại (lười) từ dữ liệu của ô đó.
+    """
+
+    def __init__(self, df, columns=None, rows_for_cell=None):
+        self.columns = list(columns) if columns is not None else measure_columns(df)
+        self._col_pos = {c: i for i, c in enumerate(self.columns)}
+        self._rows_for_cell = rows_for_cell
+        self._dirty = set()
+        self._build(df)
+
+    @classmethod
+    def from_store(cls, store, columns=None):
+        """Dựng khối từ RecordStore và tự cập nhật theo mọi thay đổi của kho"""
+        def rows_for_cell(key):
+            location, _, year, month = key
+            return store.index().location(location, year, month)
+        cube = cls(store.frame(), columns, rows_for_cell)
+        store.subscribe(cube.apply_changes)
+        return cube
+
+    def _build(self, df):
+        keys = cell_keys(df)
+        codes, uniques = pd.MultiIndex.from_frame(keys).factorize()
+        n_cells, k = len(uniques), len(self.columns)
+        values = df[self.columns].to_numpy(dtype=float) if k else np.empty((len(df), 0))
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+
+        self._keys = list(uniques)
+        self._cell = {key: i for i, key in enumerate(self._keys)}
+        self.count = np.zeros((n_cells, k))
+        self.sum = np.zeros((n_cells, k))
+        self.sumsq = np.zeros((n_cells, k))
+        for j in range(k):
+            self.count[:, j] = np.bincount(codes, weights=valid[:, j], minlength=n_cells)
+            self.sum[:, j] = np.bincount(codes, weights=filled[:, j], minlength=n_cells)
+            self.sumsq[:, j] = np.bincount(codes, weights=filled[:, j] ** 2, minlength=n_cells)
+        grouped = pd.DataFrame(values).groupby(codes)
+        self.min = np.array(grouped.min().reindex(range(n_cells)), dtype=float).reshape(n_cells, k)
+        self.max = np.array(grouped.max().reindex(range(n_cells)), dtype=float).reshape(n_cells, k)
+        self._key_frame = None
+
+    def _cell_index(self, key):
+        idx = self._cell.get(key)
+        if idx is None:
+            idx = len(self._keys)
+            self._keys.append(key)
+            self._cell[key] = idx
+            k = len(self.columns)
+            self.count = np.vstack([self.count, np.zeros((1, k))])
+            self.sum = np.vstack([self.sum, np.zeros((1, k))])
+            self.sumsq = np.vstack([self.sumsq, np.zeros((1, k))])
+            self.min = np.vstack([self.min, np.full((1, k), np.nan)])
+            self.max = np.vstack([self.max, np.full((1, k), np.nan)])
+            self._key_frame = None
+        return idx
+
+    def apply_changes(self, removed, added):
+        """Cập nhật khối theo các dòng bị bỏ đi (removed) và các dòng mới (added)"""
+        for row in removed:
+            i = self._cell_index(row_key(row))
+            v = row_values(row, self.columns)
+            ok = ~np.isnan(v)
+            self.count[i, ok] -= 1
+            self.sum[i, ok] -= v[ok]
+            self.sumsq[i, ok] -= v[ok] ** 2
+            if np.any(ok & ((v <= self.min[i]) | (v >= self.max[i]))):
+                self._dirty.add(i)
+        for row in added:
+            i = self._cell_index(row_key(row))
+            v = row_values(row, self.columns)
+            ok = ~np.isnan(v)
+            self.count[i, ok] += 1
+            self.sum[i, ok] += v[ok]
+            self.sumsq[i, ok] += v[ok] ** 2
+            self.min[i, ok] = np.fmin(self.min[i, ok], v[ok])
+            self.max[i, ok] = np.fmax(self.max[i, ok], v[ok])
+
+    def _refresh(self):
+        """Tính lại min/max của các ô có giá trị biên vừa bị xóa"""
+        if not self._dirty or self._rows_for_cell is None:
+            return
+        for i in self._dirty:
+            rows = self._rows_for_cell(self._keys[i])
+            cols = [c for c in self.columns if c in rows.columns]
+            js = [self._col_pos[c] for c in cols]
+            self.min[i, js] = rows[cols].min().to_numpy(dtype=float)
+            self.max[i, js] = rows[cols].max().to_numpy(dtype=float)
+        self._dirty.clear()
+
+    def refresh(self):
+        """Tính lại ngay các ô đang chờ thay vì đợi lần truy vấn sau (để các lần đọc sau không phải sửa khối)"""
+        self._refresh()
+
+    def keys(self):
+        """Bảng khoá của các ô (location, region, year, month)"""
+        if self._key_frame is None:
+            self._key_frame = pd.DataFrame(self._keys, columns=CUBE_DIMENSIONS)
+            self._key_arrays = {dim: self._key_frame[dim].to_numpy() for dim in CUBE_DIMENSIONS}
+        return self._key_frame
+
+    def select(self, year=None, month=None, location=None, region=None):
+        """Mặt nạ các ô thoả điều kiện lọc (year/month có thể là khoảng (đầu, cuối))"""
+        self.keys()
+        return match_cells(self._key_arrays, len(self._keys), year=year, month=month, location=location,
+                           region=region)
+
+    def _aggregate(self, col, by, mask):
+        self._refresh()
+        j = self._col_pos[col]
+        if by is None:
+            groups, codes = np.array([None]), np.zeros(int(mask.sum()), dtype=np.intp)
+        else:
+            groups, codes = np.unique(self._key_arrays[by][mask], return_inverse=True)
+        g = len(groups)
+        n = np.bincount(codes, weights=self.count[mask, j], minlength=g)
+        total = np.bincount(codes, weights=self.sum[mask, j], minlength=g)
+        sumsq = np.bincount(codes, weights=self.sumsq[mask, j], minlength=g)
+        lo, hi = np.full(g, np.nan), np.full(g, np.nan)
+        np.fmin.at(lo, codes, self.min[mask, j])
+        np.fmax.at(hi, codes, self.max[mask, j])
+        with np.errstate(all='ignore'):
+            mean = np.where(n > 0, total / n, np.nan)
+            std = np.sqrt(np.maximum(np.where(n > 1, (sumsq - n * mean ** 2) / (n - 1), np.nan), 0))
+        return groups, n, mean, std, lo, hi
+
+    def stats(self, col, by=None, year=None, month=None, location=None, region=None):
+        """Thống kê (count, mean, std, min, max) của một cột, gộp từ các ô theo chiều by"""
+        groups, n, mean, std, lo, hi = self._aggregate(col, by, self.select(year, month, location, region))
+        keep = n > 0 if by is not None else slice(None)
+        index = pd.Index(groups[keep], name=by) if by is not None else None
+        return pd.DataFrame({'count': n[keep], 'mean': mean[keep], 'std': std[keep],
+                             'min': lo[keep], 'max': hi[keep]}, index=index)
+
+    def mean(self, col, year=None, month=None, location=None, region=None):
+        """Giá trị trung bình của một cột trên các ô thoả điều kiện"""
+        return float(self._aggregate(col, None, self.select(year, month, location, region))[2][0])
+
+
+class CovarianceCube:
+    """Bộ tích luỹ hiệp phương sai gộp được theo ô (địa điểm, vùng, năm, tháng).
+
+    Mỗi ô giữ, cho từng cặp cột (i, j), số dòng có cả hai giá trị n[i, j], trung bình của cột i
+    trên các dòng đó mean[i, j], tổng tích lệch co[i, j] = Σ(xi - x̄i)(xj - x̄j) và tổng bình
+    phương lệch m2[i, j] = Σ(xi - x̄i)² - giống df.corr() bỏ NaN theo từng cặp. Thêm/xóa một dòng
+    cập nhật ô của nó theo công thức Welford (O(k²)); ma trận tương quan của một lát bất kỳ
+    (vùng, năm, khoảng tháng...) được gộp từ các ô thay vì quét lại mọi dòng.
+    """
+
+    def __init__(self, df, columns):
+        self.columns = [c for c in columns if c in df.columns]
+        self._build(df)
+
+    @classmethod
+    def from_store(cls, store, columns):
+        """Dựng bộ tích luỹ từ RecordStore và tự cập nhật theo mọi thay đổi của kho"""
+        cube = cls(store.frame(), columns)
+        store.subscribe(cube.apply_changes)
+        return cube
+
+    def _build(self, df):
+        keys = cell_keys(df)
+        codes, uniques = pd.MultiIndex.from_frame(keys).factorize()
+        n_cells, k = len(uniques), len(self.columns)
+        values = df[self.columns].to_numpy(dtype=float) if k else np.empty((len(df), 0))
+        valid = ~np.isnan(values)
+
+        self._keys = list(uniques)
+        self._cell = {key: i for i, key in enumerate(self._keys)}
+        self._key_arrays = None
+        self.n = np.zeros((n_cells, k, k))
+        self.mean = np.zeros((n_cells, k, k))
+        self.co = np.zeros((n_cells, k, k))
+        self.m2 = np.zeros((n_cells, k, k))
+
+        # Hai lượt: trung bình theo ô rồi tổng tích lệch quanh trung bình (ổn định số học hơn Σxy - n·x̄ȳ)
+        def centered(i, w):
+            n = np.bincount(codes, weights=w, minlength=n_cells)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.where(n > 0, np.bincount(codes, weights=np.where(w, values[:, i], 0.0),
+                                                   minlength=n_cells) / n, 0.0)
+            return n, mean, np.where(w, values[:, i] - mean[codes], 0.0)
+
+        # Cột không có NaN thì mọi cặp dùng chung trung bình/độ lệch của cột đó
+        full = valid.all(axis=0)
+        own = {i: centered(i, valid[:, i]) for i in range(k) if full[i]}
+        for i in range(k):
+            for j in range(i, k):
+                if full[i] and full[j]:
+                    (n, mi, di), (_, mj, dj) = own[i], own[j]
+                else:
+                    w = valid[:, i] & valid[:, j]
+                    (n, mi, di), (_, mj, dj) = centered(i, w), centered(j, w)
+                self.n[:, i, j] = self.n[:, j, i] = n
+                self.mean[:, i, j], self.mean[:, j, i] = mi, mj
+                self.co[:, i, j] = self.co[:, j, i] = np.bincount(codes, weights=di * dj, minlength=n_cells)
+                self.m2[:, i, j] = np.bincount(codes, weights=di * di, minlength=n_cells)
+                self.m2[:, j, i] = np.bincount(codes, weights=dj * dj, minlength=n_cells)
+
+    def _cell_index(self, key):
+        idx = self._cell.get(key)
+        if idx is None:
+            idx = len(self._keys)
+            self._keys.append(key)
+            self._cell[key] = idx
+            k = len(self.columns)
+            for name in ('n', 'mean', 'co', 'm2'):
+                setattr(self, name, np.concatenate([getattr(self, name), np.zeros((1, k, k))]))
+            self._key_arrays = None
+        return idx
+
+    def apply_changes(self, removed, added):
+        """Cập nhật theo các dòng bị bỏ đi (removed) và các dòng mới (added)"""
+        for row in removed:
+            self._remove(self._cell_index(row_key(row)), row_values(row, self.columns))
+        for row in added:
+            self._add(self._cell_index(row_key(row)), row_values(row, self.columns))
+
+    def _add(self, c, v):
+        ok = ~np.isnan(v)
+        pair = ok[:, None] & ok[None, :]
+        x = np.where(ok, v, 0.0)
+        xi, xj = x[:, None], x[None, :]
+        n = self.n[c] + pair
+        delta = np.where(pair, xi - self.mean[c], 0.0)
+        mean = self.mean[c] + np.where(pair, delta / np.maximum(n, 1), 0.0)
+        self.co[c] += np.where(pair, delta * (xj - mean.T), 0.0)
+        self.m2[c] += np.where(pair, delta * (xi - mean), 0.0)
+        self.n[c], self.mean[c] = n, mean
+
+    def _remove(self, c, v):
+        ok = ~np.isnan(v)
+        pair = ok[:, None] & ok[None, :] & (self.n[c] > 0)
+        x = np.where(ok, v, 0.0)
+        xi, xj = x[:, None], x[None, :]
+        n = self.n[c] - pair
+        # Trung bình khi chưa có dòng này; phép Welford ngược với _add
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(pair, np.where(n > 0, (self.n[c] * self.mean[c] - xi) / n, 0.0), self.mean[c])
+        delta = np.where(pair, xi - mean, 0.0)
+        co = self.co[c] - np.where(pair, delta * (xj - self.mean[c].T), 0.0)
+        m2 = self.m2[c] - np.where(pair, delta * (xi - self.mean[c]), 0.0)
+        empty = n <= 0
+        self.co[c] = np.where(empty, 0.0, co)
+        self.m2[c] = np.where(empty, 0.0, np.maximum(m2, 0.0))
+        self.n[c], self.mean[c] = np.maximum(n, 0), np.where(empty, 0.0, mean)
+
+    def select(self, year=None, month=None, location=None, region=None):
+        """Mặt nạ các ô thoả điều kiện lọc (year/month có thể là khoảng (đầu, cuối))"""
+        if self._key_arrays is None:
+            frame = pd.DataFrame(self._keys, columns=CUBE_DIMENSIONS)
+            self._key_arrays = {dim: frame[dim].to_numpy() for dim in CUBE_DIMENSIONS}
+        return match_cells(self._key_arrays, len(self._keys), year=year, month=month, location=location,
+                           region=region)
+
+    def merged(self, mask):
+        """Gộp các ô được chọn thành một trạng thái (n, mean, co, m2) theo công thức gộp song song"""
+        n, mean, co, m2 = self.n[mask], self.mean[mask], self.co[mask], self.m2[mask]
+        total = n.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            overall = np.where(total > 0, (n * mean).sum(axis=0) / total, 0.0)
+        d = mean - overall
+        dt = np.swapaxes(d, 1, 2)
+        return total, overall, co.sum(axis=0) + (n * d * dt).sum(axis=0), m2.sum(axis=0) + (n * d * d).sum(axis=0)
+
+    def corr(self, year=None, month=None, location=None, region=None):
+        """Ma trận tương quan Pearson của lát dữ liệu (bỏ NaN theo từng cặp cột như df.corr())"""
+        n, _, co, m2 = self.merged(self.select(year, month, location, region))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            r = co / np.sqrt(m2 * m2.T)
+        r = np.where(n > 1, np.clip(r, -1, 1), np.nan)
+        return pd.DataFrame(r, index=self.columns, columns=self.columns)
+
+    def cov(self, year=None, month=None, location=None, region=None):
+        """Ma trận hiệp phương sai mẫu (chia n - 1) của lát dữ liệu"""
+        n, _, co, _ = self.merged(self.select(year, month, location, region))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.DataFrame(np.where(n > 1, co / (n - 1), np.nan), index=self.columns, columns=self.columns)
+
+
+# Các chiều của khối phác thảo phân vị
+SKETCH_DIMENSIONS = ['region', 'year', 'month']
+# Hệ số k của phác thảo gộp so với phác thảo từng ô
+MERGED_K_FACTOR = 4
+
+
+class QuantileCube:
+    """Phác thảo phân vị (QuantileSketch) theo ô (vùng, năm, tháng) cho các cột số day_*.
+
+    Biểu đồ hộp theo vùng chỉ cần gộp vài chục phác thảo nhỏ thay vì đưa mọi dòng cho seaborn,
+    nên chi phí phụ thuộc số vùng chứ không phụ thuộc số dòng. Phác thảo của mỗi cột được dựng
+    lần đầu cột đó được hỏi tới. Dòng mới được nạp thẳng vào phác thảo; phác thảo không xóa được
+    giá trị nên ô có dòng bị xóa/sửa được đánh dấu và dựng lại (lười) từ dữ liệu của ô đó.
+    frame là hàm trả về bảng hiện hành (hoặc một DataFrame cố định).
+    """
+
+    def __init__(self, frame, columns=None, k=200, rows_for_cell=None):
+        self._frame = frame if callable(frame) else (lambda: frame)
+        self.columns = list(columns) if columns is not None else measure_columns(self._frame())
+        self.k = k
+        self._rows_for_cell = rows_for_cell
+        self._keys = []
+        self._cell = {}
+        self._key_arrays = None
+        self._sketches = {}
+        self._dirty = set()
+
+    @classmethod
+    def from_store(cls, store, columns=None, k=200):
+        """Dựng khối từ RecordStore và tự cập nhật theo mọi thay đổi của kho"""
+        def rows_for_cell(key):
+            region, year, month = key
+            rows = store.index().month(year, month)
+            if 'location_region' not in rows.columns:
+                return rows
+            return rows[rows['location_region'].astype(object).fillna('').astype(str) == region]
+        cube = cls(store.frame, columns, k, rows_for_cell)
+        store.subscribe(cube.apply_changes)
+        return cube
+
+    def _cell_index(self, key):
+        idx = self._cell.get(key)
+        if idx is None:
+            idx = len(self._keys)
+            self._keys.append(key)
+            self._cell[key] = idx
+            for sketches in self._sketches.values():
+                sketches.append(QuantileSketch(self.k))
+            self._key_arrays = None
+        return idx
+
+    def _build(self, cols):
+        """Dựng phác thảo cho các cột cols từ bảng hiện hành"""
+        df = self._frame()
+        keys = cell_keys(df)[SKETCH_DIMENSIONS]
+        local, uniques = pd.MultiIndex.from_frame(keys).factorize()
+        cells = np.array([self._cell_index(tuple(key)) for key in uniques], dtype=np.intp)
+        order = np.argsort(local, kind='stable')
+        bounds = np.searchsorted(local[order], np.arange(len(uniques) + 1))
+        for col in cols:
+            sketches = [QuantileSketch(self.k) for _ in self._keys]
+            values = df[col].to_numpy(dtype=float)[order]
+            for u, cell in enumerate(cells):
+                sketches[cell].update(values[bounds[u]:bounds[u + 1]])
+            self._sketches[col] = sketches
+
+    def _ensure(self, col):
+        if col not in self.columns:
+            raise KeyError(f"Không có cột số {col}")
+        if col not in self._sketches:
+            self._build([col])
+        self._refresh()
+
+    def _refresh(self):
+        """Dựng lại phác thảo của các ô có dòng bị xóa/sửa"""
+        if not self._dirty or not self._sketches:
+            self._dirty.clear()
+            return
+        for i in self._dirty:
+            key = self._keys[i]
+            if self._rows_for_cell is not None:
+                rows = self._rows_for_cell(key)
+            else:
+                df = self._frame()
+                keys = cell_keys(df)[SKETCH_DIMENSIONS]
+                rows = df[(keys['region'] == key[0]).to_numpy() & (keys['year'] == key[1]).to_numpy()
+                          & (keys['month'] == key[2]).to_numpy()]
+            for col, sketches in self._sketches.items():
+                values = rows[col].to_numpy(dtype=float) if col in rows.columns else np.empty(0)
+                sketches[i] = QuantileSketch(self.k).update(values)
+        self._dirty.clear()
+
+    def refresh(self):
+        """Tính lại ngay các ô đang chờ thay vì đợi lần truy vấn sau (để các lần đọc sau không phải sửa khối)"""
+        self._refresh()
+
+    def apply_changes(self, removed, added):
+        """Cập nhật theo các dòng bị bỏ đi (removed) và các dòng mới (added)"""
+        if not self._sketches:
+            # Chưa dựng cột nào: lần dựng đầu tiên sẽ đọc bảng hiện hành
+            return
+        for row in removed:
+            self._dirty.add(self._cell_index(row_key(row)[1:]))
+        for row in added:
+            i = self._cell_index(row_key(row)[1:])
+            if i in self._dirty:
+                continue
+            for col, sketches in self._sketches.items():
+                sketches[i].update(row_values(row, [col]))
+
+    def select(self, year=None, month=None, region=None):
+        """Mặt nạ các ô thoả điều kiện lọc (year/month có thể là khoảng (đầu, cuối))"""
+        if self._key_arrays is None:
+            frame = pd.DataFrame(self._keys, columns=SKETCH_DIMENSIONS)
+            self._key_arrays = {dim: frame[dim].to_numpy() for dim in SKETCH_DIMENSIONS}
+        return match_cells(self._key_arrays, len(self._keys), year=year, month=month, region=region)
+
+    def sketch(self, col, by=None, year=None, month=None, region=None):
+        """Phác thảo gộp của cột col trên các ô được chọn; by='region'|'year'|'month' trả về dict nhóm -> phác thảo.
+
+        Phác thảo gộp dùng k lớn hơn (MERGED_K_FACTOR lần) để giữ độ chính xác khi gộp nhiều ô.
+        """
+        self._ensure(col)
+        mask = self.select(year, month, region)
+        k = self.k * MERGED_K_FACTOR
+        merged = {}
+        for i in np.flatnonzero(mask):
+            group = self._key_arrays[by][i] if by is not None else None
+            merged.setdefault(group, QuantileSketch(k)).merge(self._sketches[col][i])
+        if by is None:
+            return merged.get(None, QuantileSketch(k))
+        return {group: sk for group, sk in merged.items() if sk.n}
+
+    def box_stats(self, col, by='region', year=None, month=None, region=None, whis=1.5, max_fliers=50):
+        """Thống kê hộp (dạng dict cho Axes.bxp) theo nhóm by, sắp theo trung vị giảm dần"""
+        groups = self.sketch(col, by, year, month, region)
+        stats = [sk.box_stats(whis, max_fliers, label=group) for group, sk in groups.items()]
+        return sorted(stats, key=lambda st: -st['med'])
@@ -1,94 +1,249 @@
-from datetime import timedelta
+import os
+import numpy as np
 import pandas as pd
+from clean_data import cleaning_fingerprint
+from instrumentation import traced
+from load_data import expand_frame, file_fingerprint, write_cache
+from record_store import RecordStore
 
-# lưu dữ liệu vào file csv
+# lưu dữ liệu vào file csv (kèm cache dạng cột để lần mở sau không phải đọc lại CSV).
+# Bảng dạng gọn được khôi phục đủ cột (giờ dạng chữ, cột đơn vị Anh) trước khi ghi CSV.
+# Bảng đã làm sạch thì vẫn được đánh dấu là sạch (theo mã băm file mới) để lần sau không làm sạch lại
 def save_data(df, path):
-    df.to_csv(path, index=False)
+    # ghi ra file tạm rồi đổi tên, để lỗi giữa chừng không làm hỏng file cũ
+    tmp_path = path + '.tmp'
+    expand_frame(df).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    source = file_fingerprint(path)
+    extra = None
+    if df.attrs.get('clean_fingerprint'):
+        extra = {'clean_fingerprint': cleaning_fingerprint(source['sha1'])}
+        df.attrs['clean_fingerprint'] = extra['clean_fingerprint']
+    df.attrs['source_hash'] = source['sha1']
+    write_cache(df, path, source=source, extra=extra)
     return True
 
-# thêm dữ liệu thời tiết
+# Các hàm thêm/sửa/xóa dưới đây giữ cho mã cũ làm việc trên DataFrame (chỉ để tương thích): truyền DataFrame
+# thì mỗi lần gọi phải dựng lại RecordStore (kiểm tra/sắp xếp khoá) rồi gộp lại cả bảng. Giao diện và server
+# giữ một RecordStore dùng chung và gọi thẳng store.add/update/delete/update_many; mã mới nên làm vậy,
+# hoặc truyền chính RecordStore đó vào đây thay cho DataFrame.
+def _store_for(data):
+    return data if isinstance(data, RecordStore) else RecordStore(data)
+
+# Như bản cũ, update_record/delete_record bỏ qua các khoá định danh không phải là cột của bảng
+# ('index' và 'Date' vẫn mang nghĩa riêng); store.update/delete thì báo lỗi với cột không có
+def _legacy_identifier(store, identifier):
+    columns = store.frame().columns
+    return {k: v for k, v in identifier.items() if k in ('index', 'Date') or k in columns}
+
+# thêm dữ liệu thời tiết (chèn vào đúng vị trí theo khoá, không sắp xếp lại cả bảng)
 def add_record(df, record: dict):
-    rec = record.copy()
-    if 'Date' in rec:
-        rec['Date'] = pd.to_datetime(rec['Date'])
-    if 'date' in rec:
-        rec['date'] = pd.to_datetime(rec['date'])
-    df2 = pd.concat([df, pd.DataFrame([rec])], ignore_index=True)
-    df2 = df2.sort_values('date').reset_index(drop=True)
-    return df2
+    store = _store_for(df)
+    store.add(record)
+    return store.frame()
 
 # cập nhật dữ liệu
 def update_record(df, identifier: dict, updates: dict):
-    df2 = df.copy()
-    if 'index' in identifier:
-        idx = identifier['index']
-        if idx in df2.index:
-            for k, v in updates.items():
-                df2.at[idx, k] = v
-    elif 'Date' in identifier:
-        d = pd.to_datetime(identifier['Date'])
-        mask = df2['date'] == d
-        for k, v in updates.items():
-            df2.loc[mask, k] = v
-    else:
-        mask = pd.Series([True] * len(df2))
-        for k, v in identifier.items():
-            if k in df2.columns:
-                mask = mask & (df2[k] == v)
-        for k, v in updates.items():
-            df2.loc[mask, k] = v
-    df2 = df2.sort_values('date').reset_index(drop=True)
-    return df2
+    store = _store_for(df)
+    store.update(_legacy_identifier(store, identifier), updates)
+    return store.frame()
 
 # xóa dữ liệu
 def delete_record(df, identifier: dict):
-    df2 = df.copy()
-    if 'index' in identifier:
-        idx = identifier['index']
-        if idx in df2.index:
-            df2 = df2.drop(idx)
-    elif 'Date' in identifier:
-        d = pd.to_datetime(identifier['Date'])
-        df2 = df2[df2['date'] != d]
+    store = _store_for(df)
+    store.delete(_legacy_identifier(store, identifier))
+    return store.frame()
+
+# cập nhật hàng loạt: edits là danh sách (identifier, updates) hoặc bảng có các cột khoá và cột cần sửa.
+# identifier có thể dùng khoảng/bất đẳng thức, vd {'date': ('2024-05-01', '2024-05-31'), 'day_avgtemp_c': ('>', 35)}.
+# Trả về (bảng mới, số dòng được cập nhật của từng mục)
+def update_records(df, edits, on=None):
+    store = _store_for(df)
+    counts = store.update_many(edits, on=on)
+    return store.frame(), counts
+
+# xóa hàng loạt theo danh sách điều kiện hoặc bảng khoá; trả về (bảng mới, số dòng khớp của từng điều kiện)
+def delete_records(df, identifiers):
+    store = _store_for(df)
+    counts = store.delete_many(identifiers)
+    return store.frame(), counts
+
+HEATWAVE_COLUMNS = ['location_name', 'start', 'end', 'length', 'peak', 'mean', 'threshold', 'min_days']
+
+# Gom dữ liệu về chuỗi theo ngày của từng địa điểm, sắp theo (địa điểm, ngày).
+# Gom trên khoá số nguyên (mã địa điểm, ngày) thay vì groupby trên cột chữ/phân loại; bảng đã có
+# đúng một dòng mỗi (địa điểm, ngày) và đã sắp xếp thì không phải sắp xếp hay gom lại.
+def _daily_series(df, value_col, by='location_name', how='mean'):
+    if by in df.columns:
+        codes, locations = pd.factorize(df[by], sort=True)
     else:
-        mask = pd.Series([True] * len(df2))
-        for k, v in identifier.items():
-            if k in df2.columns:
-                mask = mask & (df2[k] == v)
-        df2 = df2[~mask]
-    df2 = df2.sort_values('date').reset_index(drop=True)
-    return df2
-
-# Phát hiện các đợt nắng nóng kéo dài.
-def detect_heatwaves(df, temp_col='day_avgtemp_c', threshold=30, min_days=3):
+        codes, locations = np.zeros(len(df), dtype=np.intp), pd.Index(['Tất cả'])
+    dates = df['date'].to_numpy().astype('datetime64[D]')
+    values = df[value_col].to_numpy(dtype=float)
+    valid = (codes >= 0) & ~np.isnat(dates)
+    if not valid.all():
+        codes, dates, values = codes[valid], dates[valid], values[valid]
+    days = dates.astype(np.int64)
+    if not len(days):
+        return codes.astype(np.intp), np.asarray(locations, dtype=object), days, values
+
+    key = codes.astype(np.int64) * (days.max() - days.min() + 1) + (days - days.min())
+    if len(key) > 1 and not (key[1:] > key[:-1]).all():
+        order = np.argsort(key, kind='stable')
+        key, codes, days, values = key[order], codes[order], days[order], values[order]
+        starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+        if len(starts) < len(key):
+            ok = ~np.isnan(values)
+            count = np.add.reduceat(ok.astype(np.int64), starts)
+            if how == 'sum':
+                values = np.add.reduceat(np.where(ok, values, 0.0), starts)
+            elif how == 'mean':
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    values = np.add.reduceat(np.where(ok, values, 0.0), starts) / count
+            elif how in ('max', 'min'):
+                reduce = np.fmax if how == 'max' else np.fmin
+                values = reduce.reduceat(values, starts)
+            else:
+                raise ValueError(f"Cách gom không hợp lệ: {how}")
+            codes, days = codes[starts], days[starts]
+    if how == 'sum':
+        # Tổng của một giá trị NaN là 0 (giống groupby().sum())
+        values = np.nan_to_num(values)
+    return codes.astype(np.intp), np.asarray(locations, dtype=object), days, values
+
+# Tìm các chuỗi ngày liên tiếp thoả mask (run-length) trên mảng đã sắp theo (địa điểm, ngày).
+# Chuỗi bị ngắt khi đổi địa điểm hoặc khi thiếu ngày (ngày thiếu không được coi là nóng).
+def _find_runs(mask, codes, days):
+    n = len(mask)
+    linked = np.zeros(n, dtype=bool)
+    linked[1:] = (codes[1:] == codes[:-1]) & (np.diff(days) == 1)
+    prev = np.zeros(n, dtype=bool)
+    prev[1:] = mask[:-1] & linked[1:]
+    nxt = np.zeros(n, dtype=bool)
+    nxt[:-1] = mask[1:] & linked[1:]
+    starts = np.flatnonzero(mask & ~prev)
+    ends = np.flatnonzero(mask & ~nxt)
+    return starts, ends
+
+# Phát hiện các đợt nắng nóng kéo dài cho từng địa điểm.
+# threshold và min_days có thể là một giá trị hoặc danh sách; kết quả gồm mọi tổ hợp.
+@traced('analysis.detect_heatwaves')
+def detect_heatwaves(df, temp_col='day_avgtemp_c', threshold=30, min_days=3, by='location_name'):
     try:
-        s = df.set_index('date')[temp_col].resample('D').mean().ffill()
-        mask = s >= threshold
-        events = []
-        start = None
-        for d, val in mask.items():
-            if val and start is None:
-                start = d
-            if (not val or d == mask.index[-1]) and start is not None:
-                end = d if not val else d
-                length = (end - start).days + (0 if not val else 1)
-                if length >= min_days:
-                    events.append((start, end - timedelta(days=0), length))
-                start = None
-        return events
+        codes, locations, days, values = _daily_series(df, temp_col, by)
+        csum = np.concatenate([[0.0], np.cumsum(np.nan_to_num(values))])
+        frames = []
+        for t in np.atleast_1d(threshold):
+            mask = values >= t
+            starts, ends = _find_runs(mask, codes, days)
+            length = ends - starts + 1
+            mean = (csum[ends + 1] - csum[starts]) / np.maximum(length, 1)
+            if len(starts):
+                peak = np.maximum.reduceat(np.where(mask, values, -np.inf), starts)
+            else:
+                peak = np.empty(0)
+            for m in np.atleast_1d(min_days):
+                keep = length >= m
+                frames.append(pd.DataFrame({
+                    'location_name': locations[codes[starts[keep]]],
+                    'start': days[starts[keep]].astype('datetime64[D]'),
+                    'end': days[ends[keep]].astype('datetime64[D]'),
+                    'length': length[keep],
+                    'peak': peak[keep],
+                    'mean': mean[keep],
+                    'threshold': t,
+                    'min_days': m,
+                }))
+        events = pd.concat(frames, ignore_index=True)
+        events['start'] = pd.to_datetime(events['start'])
+        events['end'] = pd.to_datetime(events['end'])
+        return events.sort_values(['threshold', 'min_days', 'start', 'location_name'], kind='stable',
+                                  ignore_index=True)
     except Exception as e:
         print(f"Lỗi detect_heatwaves: {e}")
-        return []
+        return pd.DataFrame(columns=HEATWAVE_COLUMNS)
+
+HEAVY_RAIN_COLUMNS = ['location_name', 'window', 'start', 'end', 'length', 'peak', 'peak_date', 'total',
+                      'max_daily', 'threshold']
+# Ngưỡng mưa lớn theo độ dài cửa sổ cộng dồn (số ngày -> lượng mưa mm)
+HEAVY_RAIN_WINDOWS = {1: 100, 3: 150, 7: 250}
+
+# Vị trí dòng đầu của cửa sổ w ngày lịch kết thúc tại mỗi dòng (mảng sắp theo địa điểm, ngày; mỗi ngày một dòng).
+# Phần lớn các dòng có đủ w ngày liền nhau nên cửa sổ bắt đầu đúng w-1 dòng trước; chỉ các dòng đầu chuỗi
+# hoặc sau chỗ thiếu ngày mới phải dò lại từng bước.
+def _window_starts(codes, days, w):
+    rows = np.arange(len(days))
+    if w <= 1:
+        return rows
+    k = w - 1
+    full = np.zeros(len(days), dtype=bool)
+    full[k:] = (codes[k:] == codes[:-k]) & (days[k:] - days[:-k] == k)
+    lo = rows - k
+    irregular = np.flatnonzero(~full)
+    first = irregular.copy()
+    for j in range(1, w):
+        prev = np.maximum(irregular - j, 0)
+        ok = (irregular >= j) & (codes[prev] == codes[irregular]) & (days[irregular] - days[prev] < w)
+        first = np.where(ok, prev, first)
+    lo[irregular] = first
+    return lo
 
-# Phát hiện ngày mưa lớn.
-def detect_heavy_rain(df, precip_col='day_totalprecip_mm', threshold_mm=100):
+# Phát hiện các đợt mưa lớn của từng địa điểm theo lượng mưa cộng dồn 1, 3, 7 ngày.
+# windows: {số ngày: ngưỡng mm}; threshold_mm (nếu có) thay ngưỡng của cửa sổ 1 ngày.
+# Mỗi đợt là chuỗi ngày liên tiếp có lượng mưa cộng dồn vượt ngưỡng; start tính từ ngày đầu cửa sổ.
+@traced('analysis.detect_heavy_rain')
+def detect_heavy_rain(df, precip_col='day_totalprecip_mm', threshold_mm=None, windows=None, by='location_name'):
     try:
         if precip_col not in df.columns:
-            return pd.DataFrame()
-        s = df.set_index('date')[precip_col].resample('D').sum()
-        result = s[s >= threshold_mm].reset_index().rename(columns={precip_col:'TotalPrecipitation'})
-        result['Date'] = result['date']
-        return result
+            return pd.DataFrame(columns=HEAVY_RAIN_COLUMNS)
+        windows = {int(w): t for w, t in (HEAVY_RAIN_WINDOWS if windows is None else windows).items()}
+        if threshold_mm is not None:
+            windows[1] = threshold_mm
+        codes, locations, days, values = _daily_series(df, precip_col, by, how='sum')
+        if not len(values):
+            return pd.DataFrame(columns=HEAVY_RAIN_COLUMNS)
+        csum = np.concatenate([[0.0], np.cumsum(values)])
+        frames = []
+        for w, t in sorted(windows.items()):
+            lo = _window_starts(codes, days, w)
+            rolling = csum[1:] - csum[lo]
+            mask = rolling >= t
+            starts, ends = _find_runs(mask, codes, days)
+            # Các chỉ số đỉnh chỉ tính trên những dòng vượt ngưỡng (thường rất ít)
+            hit = np.flatnonzero(mask)
+            bounds = np.searchsorted(hit, starts)
+            if len(starts):
+                seg = np.repeat(np.arange(len(starts)), np.diff(np.append(bounds, len(hit))))
+                peak = np.maximum.reduceat(rolling[hit], bounds)
+                # Vị trí đỉnh: dòng đầu tiên trong đợt đạt giá trị lớn nhất
+                is_peak = rolling[hit] == peak[seg]
+                peak_pos = hit[np.minimum.reduceat(np.where(is_peak, np.arange(len(hit)), len(hit)), bounds)]
+                # Lượng mưa ngày lớn nhất trong cửa sổ của mỗi dòng vượt ngưỡng
+                daily = values[hit]
+                for j in range(1, w):
+                    prev = np.maximum(hit - j, 0)
+                    daily = np.where(hit - j >= lo[hit], np.maximum(daily, values[prev]), daily)
+                max_daily = np.maximum.reduceat(daily, bounds)
+            else:
+                peak = max_daily = np.empty(0)
+                peak_pos = np.empty(0, dtype=np.intp)
+            first = lo[starts]
+            frames.append(pd.DataFrame({
+                'location_name': locations[codes[starts]],
+                'window': w,
+                'start': (days[starts] - (w - 1)).astype('datetime64[D]'),
+                'end': days[ends].astype('datetime64[D]'),
+                'length': days[ends] - days[starts] + w,
+                'peak': peak,
+                'peak_date': days[peak_pos].astype('datetime64[D]'),
+                'total': csum[ends + 1] - csum[first],
+                'max_daily': max_daily,
+                'threshold': t,
+            }))
+        events = pd.concat(frames, ignore_index=True)
+        for col in ['start', 'end', 'peak_date']:
+            events[col] = pd.to_datetime(events[col])
+        return events.sort_values(['window', 'start', 'location_name'], kind='stable', ignore_index=True)
     except Exception as e:
         print(f"Lỗi detect_heavy_rain: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame(columns=HEAVY_RAIN_COLUMNS)
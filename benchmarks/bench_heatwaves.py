@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analysis import detect_heatwaves
+
+
+# Tạo dữ liệu nhiệt độ giả lập: n_stations địa điểm x n_years năm, mỗi ngày một dòng
+def make_temperature_frame(n_stations, n_years, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2000-01-01', periods=365 * n_years, freq='D')
+    doy = dates.dayofyear.to_numpy()
+    base = rng.uniform(22, 28, n_stations)[:, None]
+    season = 6 * np.sin(2 * np.pi * (doy - 100) / 365)[None, :]
+    noise = np.cumsum(rng.normal(0, 0.6, (n_stations, len(dates))), axis=1) * 0.1
+    temps = base + season + noise + rng.normal(0, 1.2, (n_stations, len(dates)))
+    return pd.DataFrame({
+        'location_name': np.repeat([f"Trạm {i:04d}" for i in range(n_stations)], len(dates)),
+        'date': np.tile(dates.to_numpy(), n_stations),
+        'day_avgtemp_c': temps.ravel(),
+    })
+
+
+def main():
+    print(f"{'trạm':>6} {'năm':>4} {'số dòng':>10} {'thời gian (s)':>14} {'dòng/s':>12} {'số đợt':>8}")
+    for n_stations, n_years in [(63, 1), (63, 10), (200, 10), (200, 30), (500, 30)]:
+        df = make_temperature_frame(n_stations, n_years)
+        t0 = time.perf_counter()
+        events = detect_heatwaves(df, threshold=[30, 32, 35], min_days=[3, 5])
+        elapsed = time.perf_counter() - t0
+        print(f"{n_stations:>6} {n_years:>4} {len(df):>10} {elapsed:>14.3f} {len(df) / elapsed:>12,.0f} {len(events):>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analysis import detect_heavy_rain
+
+
+# Tạo dữ liệu lượng mưa giả lập: n_stations địa điểm x n_years năm, mùa mưa giữa năm
+def make_precip_frame(n_stations, n_years, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2000-01-01', periods=365 * n_years, freq='D')
+    doy = dates.dayofyear.to_numpy()
+    wet = np.exp(-((doy - 230) ** 2) / (2 * 50 ** 2))[None, :]
+    raining = rng.random((n_stations, len(dates))) < 0.15 + 0.6 * wet
+    precip = np.where(raining, rng.gamma(0.7, 8 + 30 * wet, (n_stations, len(dates))), 0.0)
+    return pd.DataFrame({
+        'location_name': np.repeat([f"Trạm {i:04d}" for i in range(n_stations)], len(dates)),
+        'date': np.tile(dates.to_numpy(), n_stations),
+        'day_totalprecip_mm': precip.ravel(),
+    })
+
+
+def main():
+    print(f"{'trạm':>6} {'năm':>4} {'số dòng':>10} {'thời gian (s)':>14} {'dòng/s':>12} {'số đợt':>8}")
+    for n_stations, n_years in [(63, 1), (63, 10), (200, 10), (200, 30), (500, 30)]:
+        df = make_precip_frame(n_stations, n_years)
+        t0 = time.perf_counter()
+        events = detect_heavy_rain(df)
+        elapsed = time.perf_counter() - t0
+        print(f"{n_stations:>6} {n_years:>4} {len(df):>10} {elapsed:>14.3f} {len(df) / elapsed:>12,.0f} {len(events):>8}")
+
+
+if __name__ == '__main__':
+    main()
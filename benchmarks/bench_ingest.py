@@ -0,0 +1,59 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ingest import ingest_files, summarize_report
+from synthetic import generate_weather
+
+
+# Ghi dữ liệu giả lập thành nhiều file nhỏ: <thư mục>/<năm-tháng>/<địa điểm>.csv (như nguồn cấp theo tỉnh/tháng)
+def write_feed_directory(directory, n_stations=63, n_years=1, seed=0):
+    df = generate_weather(n_stations, n_years, seed=seed)
+    period = df['date'].dt.strftime('%Y-%m')
+    files = 0
+    for (location, month), part in df.groupby([df['location_name'], period], sort=False):
+        folder = os.path.join(directory, month)
+        os.makedirs(folder, exist_ok=True)
+        part.to_csv(os.path.join(folder, f"{location}.csv"), index=False, date_format='%Y-%m-%d')
+        files += 1
+    return files, len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo tốc độ nạp song song một thư mục nhiều file CSV")
+    parser.add_argument('--stations', type=int, default=63)
+    parser.add_argument('--years', type=float, default=2)
+    parser.add_argument('--workers', type=int, nargs='*',
+                        help="các số tiến trình cần đo (mặc định 1, 2, 4, ... tới số nhân CPU)")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    workers = args.workers or sorted({1, cores} | {2 ** i for i in range(1, 8) if 2 ** i < cores})
+    with tempfile.TemporaryDirectory() as tmp:
+        feeds = os.path.join(tmp, 'feeds')
+        files, rows = write_feed_directory(feeds, args.stations, args.years)
+        output = os.path.join(tmp, 'weather.csv')
+        print(f"{files} file, {rows} dòng, {cores} nhân CPU\n")
+
+        print(f"{'tiến trình':>10} {'thời gian (s)':>14} {'file/s':>10} {'tăng tốc':>9}")
+        base = None
+        for n in workers:
+            t0 = time.perf_counter()
+            _, report = ingest_files(feeds, output, workers=n, force=True)
+            elapsed = time.perf_counter() - t0
+            base = base or elapsed
+            print(f"{n:>10} {elapsed:>14.3f} {files / elapsed:>10,.0f} {base / elapsed:>8.2f}x")
+
+        # Lượt nạp lại khi không có file nào đổi: chỉ so kích thước/thời gian sửa trong manifest
+        t0 = time.perf_counter()
+        df, report = ingest_files(feeds, output)
+        print(f"\nNạp lại khi không có file nào đổi: {time.perf_counter() - t0:.3f}s "
+              f"({'giữ nguyên output' if df is None else 'đã ghi lại output'})")
+        print(summarize_report(report))
+
+
+if __name__ == '__main__':
+    main()
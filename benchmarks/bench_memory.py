@@ -0,0 +1,40 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from load_data import load_weather_data, compact_frame, expand_frame, memory_report, round_trip_mismatches
+
+
+def main(path='df_weather.csv'):
+    df = load_weather_data(path)
+
+    t0 = time.perf_counter()
+    compact = compact_frame(df)
+    t_compact = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    expand_frame(compact)
+    t_expand = time.perf_counter() - t0
+
+    report = memory_report(df, compact)
+    print(report.round(1).to_string())
+
+    before, after = report.loc['TỔNG', 'trước (KB)'] * 1024, report.loc['TỔNG', 'sau (KB)'] * 1024
+    print(f"\nSố dòng: {len(df)}  |  {before / len(df):.0f} -> {after / len(df):.0f} byte/dòng "
+          f"(giảm {before / after:.1f} lần)")
+    print(f"Chuyển sang dạng gọn: {t_compact:.3f}s, khôi phục đầy đủ: {t_expand:.3f}s")
+
+    # Dạng gọn được ghi ngược ra CSV khi lưu: phải cho lại đúng từng giá trị đã đọc
+    mismatches = round_trip_mismatches(df, compact)
+    print("Khôi phục đầy đủ: " + ("khớp mọi giá trị" if not mismatches else f"SAI LỆCH {mismatches}"))
+
+    # Ước lượng bộ nhớ cho nhiều năm x nhiều trạm (mỗi trạm một dòng mỗi ngày)
+    print(f"\n{'trạm':>6} {'năm':>4} {'đầy đủ (MB)':>12} {'dạng gọn (MB)':>14}")
+    for n_stations, n_years in [(63, 10), (63, 30), (500, 30), (2000, 30)]:
+        rows = n_stations * n_years * 365
+        print(f"{n_stations:>6} {n_years:>4} {rows * before / len(df) / 2**20:>12,.0f} "
+              f"{rows * after / len(df) / 2**20:>14,.0f}")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,108 @@
+import argparse
+import http.client
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import quote, urlparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server import make_server
+
+# Các truy vấn mẫu: (đường dẫn, danh sách tham số có thể chọn)
+QUERIES = [
+    ('/monthly', ['year=2024', 'year=2025', 'year=2024&region=Tây Nguyên', '']),
+    ('/stats', ['col=day_totalprecip_mm&by=region', 'col=day_avgtemp_c&by=location&year=2025', 'by=year']),
+    ('/heatwaves', ['year=2024', 'year=2025&threshold=32', 'threshold=30,32&min_days=3,5']),
+    ('/heavy-rain', ['year=2024', 'year=2025&threshold=80']),
+    ('/correlation', ['year=2024', 'year=2025&month=1', 'region=Đông Nam Bộ']),
+]
+
+
+def _request_paths(n, seed=0):
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(n):
+        path, options = rng.choice(QUERIES)
+        query = rng.choice(options)
+        paths.append(f"{path}?{query}" if query else path)
+    return paths
+
+
+# Mỗi luồng client giữ một kết nối HTTP/1.1 và gửi lần lượt các yêu cầu của mình
+def _client(host, port, paths, latencies, errors):
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    for path in paths:
+        t0 = time.perf_counter()
+        try:
+            conn.request('GET', quote(path, safe='/?=&,'))
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=60)
+        latencies.append(time.perf_counter() - t0)
+    conn.close()
+
+
+def run_load(host, port, clients, requests_per_client, seed=0):
+    paths = _request_paths(clients * requests_per_client, seed)
+    latencies, errors, threads = [], [], []
+    t0 = time.perf_counter()
+    for i in range(clients):
+        chunk = paths[i * requests_per_client:(i + 1) * requests_per_client]
+        thread = threading.Thread(target=_client, args=(host, port, chunk, latencies, errors))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - t0
+    ms = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'seconds': elapsed,
+        'rps': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p99_ms': float(np.percentile(ms, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo tải dịch vụ thống kê trên localhost")
+    parser.add_argument('--url', help="địa chỉ máy chủ đang chạy (mặc định: tự khởi động một máy chủ)")
+    parser.add_argument('--data', default='df_weather.csv')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=50, help="số yêu cầu mỗi client")
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        url = urlparse(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        server = make_server(args.data, port=0, workers=args.workers, journal=False)
+        host, port = server.server_address
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        print(f"{'lượt':<16} {'yêu cầu':>8} {'lỗi':>5} {'req/s':>9} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+        for label, seed in [('lần đầu (lạnh)', 0), ('lặp lại (cache)', 0), ('truy vấn khác', 1)]:
+            r = run_load(host, port, args.clients, args.requests, seed)
+            print(f"{label:<16} {r['requests']:>8} {r['errors']:>5} {r['rps']:>9.1f} {r['p50_ms']:>9.2f} "
+                  f"{r['p99_ms']:>9.2f}")
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    main()
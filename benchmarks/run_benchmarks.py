@@ -0,0 +1,215 @@
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analysis import (add_record, delete_record, delete_records, detect_heatwaves, detect_heavy_rain, update_record,
+                      update_records)
+from clean_data import CleaningPipeline
+from load_data import load_weather_data
+from record_store import RecordStore
+from synthetic import write_synthetic_csv
+from visualization import FigureManager, WeatherVisualizer
+
+# Chênh lệch nhỏ hơn các ngưỡng này được coi là nhiễu đo, không tính là chậm đi/tốn bộ nhớ hơn
+MIN_SECONDS_DELTA = 0.005
+MIN_MB_DELTA = 1.0
+
+
+class Case:
+    """Một phép đo: prepare() dựng dữ liệu đầu vào (không tính giờ), run(state) là phần được đo"""
+
+    def __init__(self, name, run, prepare=None):
+        self.name = name
+        self.run = run
+        self.prepare = prepare or (lambda: None)
+
+
+# Dựng danh sách phép đo trên file dữ liệu path
+def build_cases(path):
+    raw = pd.read_csv(path)
+    df = load_weather_data(path, use_cache=False)
+    pipeline = CleaningPipeline()
+    sample = df.iloc[len(df) // 2]
+    identifier = {'location_name': sample['location_name'], 'date': sample['date']}
+    new_record = {**df.iloc[-1].to_dict(), 'date': df['date'].max() + pd.Timedelta(days=1)}
+
+    # Bảng thô đã chạy qua các bước trước bước step (đầu vào của riêng bước đó)
+    def before_step(step):
+        def prepare():
+            data = raw.copy()
+            for prev in pipeline.steps[:pipeline.steps.index(step)]:
+                data = getattr(pipeline, f"_{prev}")(data)
+            return data
+        return prepare
+
+    # Một loạt thao tác sửa trên các dòng rải đều trong bảng
+    def batch_ops():
+        rows = df.iloc[np.linspace(0, len(df) - 1, 1000).astype(int)]
+        return [('update', {'location_name': loc, 'date': d}, {'day_avgtemp_c': 30.0})
+                for loc, d in zip(rows['location_name'], rows['date'])]
+
+    # Bảng sửa hàng loạt: 10000 dòng ngẫu nhiên theo khoá (ngày, địa điểm)
+    def bulk_edits():
+        rows = df.sample(min(10000, len(df)), random_state=0)
+        return rows[['date', 'location_name']].assign(day_avgtemp_c=30.0)
+
+    # Xóa theo điều kiện khoảng: những ngày nóng của một tháng
+    month = df['date'].max().to_period('M')
+    hot_days = [{'date': (month.start_time, month.end_time), 'day_avgtemp_c': ('>=', 30)}]
+
+    def plot(method):
+        def run(state):
+            fig = getattr(WeatherVisualizer(df, FigureManager()), method)()
+            if fig is not None:
+                fig.savefig(io.BytesIO(), format='png')
+        return run
+
+    cases = [
+        Case('load.csv', lambda _: load_weather_data(path, use_cache=False)),
+        Case('load.cache', lambda _: load_weather_data(path), prepare=lambda: load_weather_data(path)),
+        Case('load.compact', lambda _: load_weather_data(path, compact=True),
+             prepare=lambda: load_weather_data(path)),
+    ]
+    for step in pipeline.steps:
+        cases.append(Case(f"clean.{step}", lambda data, step=step: getattr(pipeline, f"_{step}")(data),
+                          prepare=before_step(step)))
+    cases += [
+        Case('clean.pipeline', lambda data: CleaningPipeline().run(data, copy=False), prepare=raw.copy),
+        Case('analysis.heatwaves', lambda _: detect_heatwaves(df, threshold=[30, 32, 35], min_days=[3, 5])),
+        Case('analysis.heavy_rain', lambda _: detect_heavy_rain(df)),
+        Case('crud.add', lambda _: add_record(df, new_record)),
+        Case('crud.update', lambda _: update_record(df, identifier, {'day_avgtemp_c': 30.0})),
+        Case('crud.delete', lambda _: delete_record(df, identifier)),
+        # Sửa trên kho dùng chung (cách giao diện/server làm): không dựng lại kho, không gộp lại bảng
+        Case('crud.update_shared_store', lambda store: store.update(identifier, {'day_avgtemp_c': 30.0}),
+             prepare=lambda: RecordStore(df)),
+        Case('crud.batch_1000', lambda ops: RecordStore(df).apply_batch(ops), prepare=batch_ops),
+        Case('crud.bulk_update_10000', lambda edits: update_records(df, edits), prepare=bulk_edits),
+        Case('crud.bulk_delete_range', lambda _: delete_records(df, hot_days)),
+        Case('plot.temp_trend', plot('plot_temp_trend')),
+        Case('plot.monthly_stats', plot('plot_monthly_stats')),
+        Case('plot.region_comparison', plot('plot_region_comparison')),
+        Case('plot.correlation', plot('plot_correlation')),
+    ]
+    return cases
+
+
+# Đo thời gian (trung vị và nhỏ nhất qua repeat lần) và bộ nhớ đỉnh (một lần riêng, có tracemalloc)
+def measure(case, repeat=3, memory=True):
+    times = []
+    for _ in range(repeat):
+        state = case.prepare()
+        t0 = time.perf_counter()
+        case.run(state)
+        times.append(time.perf_counter() - t0)
+    result = {'seconds': statistics.median(times), 'best': min(times), 'runs': repeat}
+    if memory:
+        # tracemalloc làm chậm đáng kể nên không đo cùng lượt với thời gian
+        state = case.prepare()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            case.run(state)
+            result['peak_mb'] = (tracemalloc.get_traced_memory()[1] - before) / 2**20
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_benchmarks(path, repeat=3, memory=True, only=None, verbose=True):
+    results = {}
+    for case in build_cases(path):
+        if only and not any(pattern in case.name for pattern in only):
+            continue
+        results[case.name] = r = measure(case, repeat, memory)
+        if verbose:
+            peak = f"{r['peak_mb']:>10.1f}" if 'peak_mb' in r else f"{'-':>10}"
+            print(f"{case.name:<34} {r['seconds']:>10.4f} {r['best']:>10.4f} {peak}")
+    return results
+
+
+# So sánh với lần chạy gốc; trả về danh sách (phép đo, chỉ số, giá trị gốc, giá trị mới, tỉ lệ) bị vượt ngưỡng
+def compare(results, baseline, time_threshold=0.2, mem_threshold=0.2):
+    regressions = []
+    for name, new in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        for metric, threshold, floor in [('seconds', time_threshold, MIN_SECONDS_DELTA),
+                                         ('peak_mb', mem_threshold, MIN_MB_DELTA)]:
+            if metric not in new or metric not in old:
+                continue
+            if new[metric] - old[metric] > max(old[metric] * threshold, floor):
+                ratio = new[metric] / old[metric] if old[metric] else float('inf')
+                regressions.append((name, metric, old[metric], new[metric], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo thời gian và bộ nhớ các thao tác chính trên dữ liệu giả lập")
+    parser.add_argument('--data', help="dùng file CSV có sẵn thay vì sinh dữ liệu giả lập")
+    parser.add_argument('--stations', type=int, default=63)
+    parser.add_argument('--years', type=float, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='*', help="chỉ chạy các phép đo có tên chứa một trong các chuỗi này")
+    parser.add_argument('--no-memory', action='store_true', help="bỏ qua đo bộ nhớ đỉnh (tracemalloc)")
+    parser.add_argument('--out', help="ghi kết quả ra file JSON")
+    parser.add_argument('--baseline', help="file JSON kết quả gốc để so sánh")
+    parser.add_argument('--time-threshold', type=float, default=0.2, help="tỉ lệ chậm đi cho phép (mặc định 0.2)")
+    parser.add_argument('--mem-threshold', type=float, default=0.2, help="tỉ lệ tăng bộ nhớ cho phép (mặc định 0.2)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.data:
+            path = args.data
+            meta = {'data': os.path.abspath(path)}
+        else:
+            path = os.path.join(tmp, 'synthetic_weather.csv')
+            write_synthetic_csv(path, args.stations, args.years, seed=args.seed)
+            meta = {'stations': args.stations, 'years': args.years, 'seed': args.seed}
+        with open(path, encoding='utf-8') as f:
+            meta['rows'] = sum(1 for _ in f) - 1
+        print(f"Dữ liệu: {meta['rows']} dòng\n")
+        print(f"{'phép đo':<34} {'trung vị (s)':>10} {'tốt nhất':>10} {'đỉnh (MB)':>10}")
+        results = run_benchmarks(path, args.repeat, not args.no_memory, args.only)
+
+    meta.update({
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+    })
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'meta': meta, 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"\nĐã ghi kết quả vào {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('rows') != meta['rows']:
+            print(f"\nCảnh báo: số dòng khác lần chạy gốc ({baseline.get('meta', {}).get('rows')} != {meta['rows']})")
+        regressions = compare(results, baseline.get('results', {}), args.time_threshold, args.mem_threshold)
+        if regressions:
+            print(f"\nCó {len(regressions)} chỉ số vượt ngưỡng so với {args.baseline}:")
+            for name, metric, old, new, ratio in regressions:
+                print(f"  {name:<34} {metric:<8} {old:>10.4f} -> {new:>10.4f} (x{ratio:.2f})")
+            sys.exit(1)
+        print(f"\nKhông có chỉ số nào vượt ngưỡng so với {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
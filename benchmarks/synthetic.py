@@ -0,0 +1,287 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from load_data import IMPERIAL_COLUMNS, decode_times, imperial
+
+# 63 tỉnh/thành của df_weather.csv: (tên, vùng, địa hình, vĩ độ, kinh độ)
+PROVINCES = [
+    ('An Giang', 'Đồng Bằng Sông Cửu Long', 'đồng bằng', 10.7, 105.1167),
+    ('Bà Rịa-Vũng Tàu', 'Đông Nam Bộ', 'ven biển', 10.35, 107.0667),
+    ('Bình Dương', 'Đông Nam Bộ', 'đồng bằng', 11.2667, 106.6),
+    ('Bình Phước', 'Đông Nam Bộ', 'miền núi', 11.5333, 106.9167),
+    ('Bình Thuận', 'Bắc Trung Bộ và Duyên hải miền Trung', 'ven biển', 10.9333, 108.1),
+    ('Bình Định', 'Bắc Trung Bộ và Duyên hải miền Trung', 'ven biển', 13.7667, 109.2333),
+    ('Bạc Liêu', 'Đồng Bằng Sông Cửu Long', 'ven biển', 9.285, 105.7244),
+    ('Bắc Giang', 'Trung du và miền núi Bắc Bộ', 'miền núi', 21.2667, 106.2),
+    ('Bắc Kạn', 'Trung du và miền núi Bắc Bộ', 'miền núi', 22.1333, 105.8333),
+    ('Bắc Ninh', 'Đồng Bằng Sông Hồng', 'đồng bằng', 21.1833, 106.05),
+    ('Bến Tre', 'Đồng Bằng Sông Cửu Long', 'ven biển', 10.2333, 106.3833),
+    ('Cao Bằng', 'Trung du và miền núi Bắc Bộ', 'miền núi', 22.6667, 106.25),
+    ('Cà Mau', 'Đồng Bằng Sông Cửu Long', 'ven biển', 9.1769, 105.15),
+    ('Cần Thơ', 'Đồng Bằng Sông Cửu Long', 'đồng bằng', 10.0333, 105.7833),
+    ('Gia Lai', 'Tây Nguyên', 'miền núi', 13.9833, 108.0),
+    ('Hà Giang', 'Trung du và miền núi Bắc Bộ', 'miền núi', 22.8333, 104.9833),
+    ('Hà Nam', 'Đồng Bằng Sông Hồng', 'đồng bằng', 20.5411, 105.9139),
+    ('Hà Nội', 'Đồng Bằng Sông Hồng', 'đồng bằng', 21.0333, 105.85),
+    ('Hà Tĩnh', 'Bắc Trung Bộ và Duyên hải miền Trung', 'ven biển', 18.3333, 105.9),
+    ('Hòa Bình', 'Trung du và miền núi Bắc Bộ', 'miền núi', 20.8133, 105.3383),
+    ('Hưng Yên', 'Đồng Bằng Sông Hồng', 'đồng bằng', 20.65, 106.0667),
+    ('Hải Dương', 'Đồng Bằng Sông Hồng', 'đồng bằng', 20.9333, 106.3167),
+    ('Hải Phòng', 'Đồng Bằng Sông Hồng', 'ven biển', 20.8561, 106.6822),
+    ('Hậu Giang', 'Đồng Bằng Sông Cửu Long', 'đồng bằng', 9.8333, 105.6333),
+    ('Khánh Hòa', 'Bắc Trung Bộ và Duyên hải miền Trung', 'ven biển', 12.4833, 109.1167),
+    ('Kiên Giang', 'Đồng Bằng Sông Cửu Long', 'ven biển', 10.0167, 105.0833),
+    ('Kon Tum', 'Tây Nguyên', 'miền núi', 14.35, 108.0),
+    ('Lai Châu', 'Trung du và miền núi Bắc Bộ', 'miền núi', 22.3833, 102.95),
+    ('Long An', 'Đồng Bằng Sông Cửu Long', 'đồng bằng', 10.5333, 106.4167),
+    ('Lào Cai', 'Trung du và miền núi Bắc Bộ', 'miền núi', 22.4833, 103.95),
+    ('Lâm Đồng', 'Tây Nguyên', 'miền núi', 11.9333, 108.4167),
+    ('Lạng Sơn', 'Trung du và miền núi Bắc Bộ', 'miền núi', 21.8333, 106.7333),
+    ('Nam Định', 'Đồng Bằng Sông Hồng', 'ven biển', 20.4167, 106.1667),
+    ('Nghệ An', 'Bắc Trung Bộ và Duyên hải miền Trung', 'ven biển', 18.6667, 105.6667),
+    ('Ninh Bình', 'Đồng Bằng Sông Hồng', 'đồng bằng', 20.2539, 105.975),
+    ('Ninh Thuận', 'Bắc Trung Bộ và Duyên hải miền Trung', 'ven biển', 11.8167, 108.8833),
+    ('Phú Thọ', 'Đồng Bằng Sông Hồng', 'miền núi', 21.3019, 105.4308),
+    ('Phú Yên', 'Bắc Trung Bộ và Duyên hải miền Trung', 'ven biển', 13.35, 109.0333),
+    ('Quảng Bình', 'Bắc Trung Bộ và Duyên hải miền Trung', 'ven biển', 17.5, 106.6333),
+    ('Quảng Nam', 'Bắc Trung Bộ và Duyên hải miền Trung', 'ven biển', 15.8794, 108.335),
+    ('Quảng Ngãi', 'Bắc Trung Bộ và Duyên hải miền Trung', 'ven biển', 15.1167, 108.8),
+    ('Quảng Ninh', 'Trung du và miền núi Bắc Bộ', 'ven biển', 21.0167, 107.3167),
+    ('Quảng Trị', 'Bắc Trung Bộ và Duyên hải miền Trung', 'ven biển', 16.7, 107.1667),
+    ('Sóc Trăng', 'Đồng Bằng Sông Cửu Long', 'ven biển', 9.6033, 105.98),
+    ('Sơn La', 'Trung du và miền núi Bắc Bộ', 'miền núi', 21.3167, 103.9),
+    ('TP. Hồ Chí Minh', 'Đông Nam Bộ', 'đồng bằng', 10.75, 106.6667),
+    ('Thanh Hóa', 'Bắc Trung Bộ và Duyên hải miền Trung', 'ven biển', 19.8, 105.7667),
+    ('Thái Bình', 'Đồng Bằng Sông Hồng', 'ven biển', 20.45, 106.3333),
+    ('Thái Nguyên', 'Trung du và miền núi Bắc Bộ', 'miền núi', 21.5928, 105.8442),
+    ('Thừa Thiên - Huế', 'Bắc Trung Bộ và Duyên hải miền Trung', 'ven biển', 16.4667, 107.6),
+    ('Tiền Giang', 'Đồng Bằng Sông Cửu Long', 'ven biển', 10.35, 106.35),
+    ('Trà Vinh', 'Đồng Bằng Sông Cửu Long', 'ven biển', 9.9347, 106.3453),
+    ('Tuyên Quang', 'Trung du và miền núi Bắc Bộ', 'miền núi', 21.8233, 105.2181),
+    ('Tây Ninh', 'Đông Nam Bộ', 'đồng bằng', 11.3, 106.1),
+    ('Vĩnh Long', 'Đồng Bằng Sông Cửu Long', 'đồng bằng', 10.25, 105.9667),
+    ('Vĩnh Phúc', 'Đồng Bằng Sông Hồng', 'đồng bằng', 21.31, 105.5967),
+    ('Yên Bái', 'Trung du và miền núi Bắc Bộ', 'miền núi', 21.7, 104.8667),
+    ('Điện Biên', 'Trung du và miền núi Bắc Bộ', 'miền núi', 21.3833, 103.0167),
+    ('Đà Nẵng', 'Bắc Trung Bộ và Duyên hải miền Trung', 'ven biển', 16.0406, 108.2125),
+    ('Đắk Lắk', 'Tây Nguyên', 'miền núi', 12.6667, 108.05),
+    ('Đắk Nông', 'Tây Nguyên', 'miền núi', 12.3, 107.5833),
+    ('Đồng Nai', 'Đông Nam Bộ', 'đồng bằng', 10.95, 106.8167),
+    ('Đồng Tháp', 'Đồng Bằng Sông Cửu Long', 'đồng bằng', 10.6667, 105.7333),
+]
+
+# Thứ tự 36 cột của df_weather.csv
+COLUMNS = [
+    'location_name', 'location_region', 'location_terrain', 'location_country', 'location_lat', 'location_lon',
+    'date', 'date_epoch', 'day_maxtemp_c', 'day_maxtemp_f', 'day_mintemp_c', 'day_mintemp_f', 'day_avgtemp_c',
+    'day_avgtemp_f', 'day_maxwind_mph', 'day_maxwind_kph', 'day_totalprecip_mm', 'day_totalprecip_in',
+    'day_totalsnow_cm', 'day_avgvis_km', 'day_avgvis_miles', 'day_avghumidity', 'day_daily_will_it_rain',
+    'day_daily_chance_of_rain', 'day_condition_text', 'day_condition_icon', 'day_condition_code', 'day_uv',
+    'astro_sunrise', 'astro_sunset', 'astro_moonrise', 'astro_moonset', 'astro_moon_phase',
+    'astro_moon_illumination', 'month', 'year',
+]
+
+# Trạng thái thời tiết theo lượng mưa: (mưa tối thiểu mm, mã, mô tả, mã biểu tượng)
+CONDITIONS = [
+    (0.0, 1000, 'Sunny', 113), (0.0, 1003, 'Partly cloudy', 116), (0.0, 1006, 'Cloudy', 119),
+    (0.1, 1063, 'Patchy rain possible', 176), (2.0, 1183, 'Light rain', 296),
+    (8.0, 1186, 'Moderate rain at times', 299), (20.0, 1189, 'Moderate rain', 302),
+    (40.0, 1243, 'Moderate or heavy rain shower', 356), (70.0, 1195, 'Heavy rain', 308),
+    (120.0, 1246, 'Torrential rain shower', 359),
+]
+MOON_PHASES = ['New Moon', 'Waxing Crescent', 'First Quarter', 'Waxing Gibbous',
+               'Full Moon', 'Waning Gibbous', 'Last Quarter', 'Waning Crescent']
+# Các cột số có thể bị thiếu giá trị (NaN) trong dữ liệu giả lập
+NAN_COLUMNS = ['day_maxtemp_c', 'day_mintemp_c', 'day_avgtemp_c', 'day_maxwind_kph', 'day_totalprecip_mm',
+               'day_avgvis_km', 'day_avghumidity', 'day_uv']
+
+
+# Danh sách trạm: 63 tỉnh đầu tiên giữ nguyên tên, các trạm sau lặp lại tỉnh với số thứ tự và toạ độ lệch nhẹ
+def make_stations(n_stations, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(n_stations):
+        name, region, terrain, lat, lon = PROVINCES[i % len(PROVINCES)]
+        k = i // len(PROVINCES)
+        if k:
+            name = f"{name} {k + 1}"
+            lat, lon = round(lat + rng.normal(0, 0.2), 4), round(lon + rng.normal(0, 0.2), 4)
+        rows.append((name, region, terrain, lat, lon))
+    return pd.DataFrame(rows, columns=['location_name', 'location_region', 'location_terrain',
+                                       'location_lat', 'location_lon'])
+
+
+# Sinh một khối dữ liệu cho mọi trạm trong các ngày dates (dòng sắp theo ngày rồi trạm, như file gốc)
+def generate_block(stations, dates, seed=0):
+    n_st, n_days = len(stations), len(dates)
+    lat = stations['location_lat'].to_numpy()[None, :]
+    mountain = (stations['location_terrain'] == 'miền núi').to_numpy()[None, :]
+    coast = (stations['location_terrain'] == 'ven biển').to_numpy()[None, :]
+    doy = dates.dayofyear.to_numpy()[:, None].astype(float)
+    day_num = ((dates - pd.Timestamp('2000-01-01')).days.to_numpy())[:, None].astype(float)
+
+    # Hạt giống theo ngày đầu khối: cùng tham số thì sinh lại đúng dữ liệu cũ
+    rng = np.random.default_rng([seed, int(day_num[0, 0]), n_days])
+    station_rng = np.random.default_rng([seed, n_st])
+    phases = station_rng.uniform(0, 2 * np.pi, (3, n_st))
+    periods = np.array([9.0, 23.0, 61.0])[:, None]
+
+    # Nhiệt độ: mùa hè nóng hơn và biên độ mùa lớn hơn ở phía Bắc, vùng núi mát hơn
+    base = 28.5 - 0.33 * (lat - 10) - 3.0 * mountain
+    amplitude = 0.8 + 0.45 * (lat - 10)
+    season = -np.cos(2 * np.pi * (doy - 15) / 365.25)
+    anomaly = sum(np.sin(2 * np.pi * day_num / periods[i, 0] + phases[i]) for i in range(3)) * 0.9
+    avgtemp = base + amplitude * season + anomaly + rng.normal(0, 0.8, (n_days, n_st))
+    spread = 5 + 2 * mountain - 1.5 * coast + rng.gamma(2.0, 0.8, (n_days, n_st))
+    maxtemp = avgtemp + spread * 0.55
+    mintemp = avgtemp - spread * 0.45
+
+    # Mưa: mùa mưa tháng 5-10 (miền Trung lệch về tháng 9-12)
+    central = (stations['location_region'] == 'Bắc Trung Bộ và Duyên hải miền Trung').to_numpy()[None, :]
+    peak = np.where(central, 300, 220)
+    wet = np.exp(-((doy - peak + 182) % 365 - 182) ** 2 / (2 * 55 ** 2))
+    rain_prob = 0.12 + 0.68 * wet
+    raining = rng.random((n_days, n_st)) < rain_prob
+    precip = np.where(raining, rng.gamma(0.7, 6 + 22 * wet), 0.0)
+    precip = np.round(precip, 2)
+
+    humidity = np.clip(62 + 25 * wet + 8 * raining + rng.normal(0, 5, (n_days, n_st)), 20, 100).round()
+    wind = np.round(rng.gamma(4.0, 3.5, (n_days, n_st)) + 4 * coast, 1)
+    vis = np.clip(10 - precip / 12 + rng.normal(0, 0.3, (n_days, n_st)), 0, 10).round(1)
+    uv = np.clip(np.round(11 - 0.12 * (lat - 8) - 3 * raining - 2 * wet + rng.normal(0, 0.8, (n_days, n_st))),
+                 1, 12)
+    chance = np.clip(np.round(rain_prob * 100 + rng.normal(0, 10, (n_days, n_st))), 0, 100)
+    chance = np.where(raining, np.maximum(chance, 70), np.minimum(chance, 60))
+
+    thresholds = np.array([c[0] for c in CONDITIONS])
+    cond = np.searchsorted(thresholds, precip, side='right') - 1
+    dry = precip == 0
+    cond = np.where(dry, rng.integers(0, 3, (n_days, n_st)), np.maximum(cond, 3))
+
+    # Thiên văn: độ dài ngày theo vĩ độ và mùa, pha mặt trăng theo chu kỳ 29.53 ngày
+    decl = 23.44 * np.sin(2 * np.pi * (doy - 81) / 365.25)
+    day_len = 12 + 4 * np.arcsin(np.clip(np.tan(np.radians(lat)) * np.tan(np.radians(decl)), -1, 1)) / np.pi * 3
+    noon = 12 * 60 - (stations['location_lon'].to_numpy()[None, :] - 105) * 4
+    sunrise = np.round(noon - day_len * 30).astype(int)
+    sunset = np.round(noon + day_len * 30).astype(int)
+    moon_age = (day_num - 7.5) % 29.53
+    moonrise = np.round(sunrise + moon_age * 50.5).astype(int) % 1440
+    moonset = (moonrise + 745) % 1440
+    moonrise = np.where(rng.random((n_days, n_st)) < 0.03, -1, moonrise)
+    moonset = np.where(rng.random((n_days, n_st)) < 0.03, -1, moonset)
+    phase = np.broadcast_to(np.floor(moon_age / 29.53 * 8 + 0.5).astype(int) % 8, (n_days, n_st))
+    illumination = np.broadcast_to(np.round(50 * (1 - np.cos(2 * np.pi * moon_age / 29.53))), (n_days, n_st))
+
+    def flat(a):
+        return np.broadcast_to(a, (n_days, n_st)).ravel()
+
+    codes = np.tile(np.arange(n_st), n_days)
+    cond = cond.ravel()
+    block = pd.DataFrame({
+        'location_name': stations['location_name'].to_numpy()[codes],
+        'location_region': stations['location_region'].to_numpy()[codes],
+        'location_terrain': stations['location_terrain'].to_numpy()[codes],
+        'location_country': 'Vietnam',
+        'location_lat': stations['location_lat'].to_numpy()[codes],
+        'location_lon': stations['location_lon'].to_numpy()[codes],
+        'date': np.repeat(dates.to_numpy(), n_st),
+        'date_epoch': np.repeat((dates - pd.Timestamp('1970-01-01')).total_seconds().astype(np.int64), n_st),
+        'day_maxtemp_c': maxtemp.round(1).ravel(),
+        'day_mintemp_c': mintemp.round(1).ravel(),
+        'day_avgtemp_c': avgtemp.round(1).ravel(),
+        'day_maxwind_kph': flat(wind),
+        'day_totalprecip_mm': precip.ravel(),
+        'day_totalsnow_cm': 0.0,
+        'day_avgvis_km': vis.ravel(),
+        'day_avghumidity': humidity.ravel().astype(int),
+        'day_daily_will_it_rain': raining.ravel().astype(int),
+        'day_daily_chance_of_rain': chance.ravel().astype(int),
+        'day_condition_text': pd.Categorical.from_codes(cond, [c[2] for c in CONDITIONS]),
+        'day_condition_icon': pd.Categorical.from_codes(
+            cond, [f"//cdn.weatherapi.com/weather/64x64/day/{c[3]}.png" for c in CONDITIONS]),
+        'day_condition_code': np.array([c[1] for c in CONDITIONS])[cond],
+        'day_uv': flat(uv),
+        'astro_sunrise': decode_times(flat(sunrise)),
+        'astro_sunset': decode_times(flat(sunset)),
+        'astro_moonrise': decode_times(flat(moonrise), 'No moonrise'),
+        'astro_moonset': decode_times(flat(moonset), 'No moonset'),
+        'astro_moon_phase': pd.Categorical.from_codes(phase.ravel(), MOON_PHASES),
+        'astro_moon_illumination': illumination.ravel().astype(int),
+        'month': np.repeat(dates.month.to_numpy(), n_st),
+        'year': np.repeat(dates.year.to_numpy(), n_st),
+    })
+    for col in IMPERIAL_COLUMNS:
+        block[col] = imperial(block, col)
+    return block[COLUMNS]
+
+
+# Thêm NaN vào các cột số và chèn lại một số dòng trùng (ngay sau dòng gốc)
+def add_noise(block, nan_rate=0.002, dup_rate=0.001, seed=0):
+    rng = np.random.default_rng([seed, len(block)])
+    if nan_rate:
+        for col in NAN_COLUMNS:
+            mask = rng.random(len(block)) < nan_rate
+            if mask.any():
+                block[col] = block[col].astype(float).mask(mask)
+    if dup_rate:
+        dups = np.flatnonzero(rng.random(len(block)) < dup_rate)
+        if len(dups):
+            order = np.sort(np.concatenate([np.arange(len(block)), dups]), kind='stable')
+            block = block.take(order).reset_index(drop=True)
+    return block
+
+
+# Sinh dữ liệu theo từng khối ngày (generator), để ghi file lớn mà không giữ cả bảng trong bộ nhớ
+def iter_synthetic_chunks(n_stations=63, n_years=1, start='2024-01-01', days_per_chunk=None,
+                          nan_rate=0.002, dup_rate=0.001, seed=0):
+    stations = make_stations(n_stations, seed)
+    dates = pd.date_range(start, periods=int(round(365.25 * n_years)), freq='D')
+    if days_per_chunk is None:
+        days_per_chunk = max(1, 500_000 // max(n_stations, 1))
+    for lo in range(0, len(dates), days_per_chunk):
+        block = generate_block(stations, dates[lo:lo + days_per_chunk], seed)
+        yield add_noise(block, nan_rate, dup_rate, seed + lo)
+
+
+# Sinh toàn bộ dữ liệu giả lập đúng định dạng df_weather.csv
+def generate_weather(n_stations=63, n_years=1, start='2024-01-01', nan_rate=0.002, dup_rate=0.001, seed=0):
+    chunks = list(iter_synthetic_chunks(n_stations, n_years, start, nan_rate=nan_rate, dup_rate=dup_rate,
+                                        seed=seed))
+    return pd.concat(chunks, ignore_index=True)
+
+
+# Ghi dữ liệu giả lập ra CSV theo từng khối; trả về số dòng đã ghi
+def write_synthetic_csv(path, n_stations=63, n_years=1, **kwargs):
+    rows = 0
+    for i, chunk in enumerate(iter_synthetic_chunks(n_stations, n_years, **kwargs)):
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=(i == 0), index=False,
+                     date_format='%Y-%m-%d')
+        rows += len(chunk)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sinh dữ liệu thời tiết giả lập đúng định dạng df_weather.csv")
+    parser.add_argument('--stations', type=int, default=63)
+    parser.add_argument('--years', type=float, default=1)
+    parser.add_argument('--start', default='2024-01-01')
+    parser.add_argument('--nan-rate', type=float, default=0.002)
+    parser.add_argument('--dup-rate', type=float, default=0.001)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='synthetic_weather.csv')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    rows = write_synthetic_csv(args.out, args.stations, args.years, start=args.start, nan_rate=args.nan_rate,
+                               dup_rate=args.dup_rate, seed=args.seed)
+    print(f"Đã ghi {rows} dòng vào {args.out} ({time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
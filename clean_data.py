@@ -1,6 +1,18 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+import tracemalloc
+
 import numpy as np
 import pandas as pd
 
+from instrumentation import span
+from load_data import expand_frame, file_fingerprint, write_cache, iter_weather_chunks
+from sketches import QuantileSketch
+
 # Hàm xoá các dòng trùng lặp
 def remove_duplicate_rows(df):
     df = df.copy()
@@ -11,15 +23,19 @@ def remove_duplicate_rows(df):
 #Hàm chuẩn hoá tên cột
 def column_name_normalization(df):
     df = df.copy()
-    df.columns = (
-        df.columns
+    df.columns = normalize_column_names(df.columns)
+    return df
+
+# Quy tắc chuẩn hoá tên cột (bỏ khoảng trắng, chữ thường, ký tự khác chữ/số thành "_")
+def normalize_column_names(columns):
+    return (
+        pd.Index(columns)
         .astype(str)
         .str.strip()
         .str.lower()
         .str.replace(r"[^\w]+", "_", regex=True)
         .str.strip("_")
     )
-    return df
 
 # Hàm chuyển dữ liệu date sang datetime
 def convert_date_data_to_datetime(df):
@@ -41,4 +57,437 @@ def handling_NaN_values(df, method):
     elif method == "ffill" or method == "bfill":
         df[num_cols] = df[num_cols].ffill().bfill()
 
-    return df
\ No newline at end of file
+    return df
+
+
+# Vị trí dòng trước/sau gần nhất có giá trị trong cùng nhóm (địa điểm), trên thứ tự đã sắp theo ngày
+def _neighbour_positions(valid, codes):
+    positions = pd.Series(np.where(valid, np.arange(len(valid)), np.nan))
+    grouped = positions.groupby(codes, sort=False)
+    return grouped.ffill().to_numpy(), grouped.bfill().to_numpy()
+
+
+# Điền NaN theo từng địa điểm cho một cột đã sắp theo (địa điểm, ngày).
+# interpolate: nội suy tuyến tính theo thời gian giữa hai ngày có số liệu, hai đầu lấy giá trị gần nhất;
+# ffill/bfill: lấy giá trị liền trước (liền sau) của cùng địa điểm; mean/median: trung bình/trung vị của địa điểm.
+# Địa điểm không có số liệu nào thì dùng giá trị chung của cả bảng.
+def fill_by_location(values, codes, days, method):
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    if valid.all() or not valid.any():
+        return values
+    out = values.copy()
+    missing = ~valid
+    if method in ("mean", "median"):
+        per_location = pd.Series(values).groupby(codes, sort=False).transform(method).to_numpy()
+        out[missing] = per_location[missing]
+    else:
+        prev, nxt = _neighbour_positions(valid, codes)
+        if method == "bfill":
+            prev, nxt = nxt, prev
+        has_prev, has_next = ~np.isnan(prev), ~np.isnan(nxt)
+        p = np.where(has_prev, prev, 0).astype(np.intp)
+        n = np.where(has_next, nxt, 0).astype(np.intp)
+        if method == "interpolate":
+            both = missing & has_prev & has_next
+            span = (days[n] - days[p]).astype(float)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                weight = np.where(span > 0, (days - days[p]) / span, 0.0)
+            out[both] = values[p[both]] + (values[n[both]] - values[p[both]]) * weight[both]
+        take_prev = missing & np.isnan(out) & has_prev
+        out[take_prev] = values[p[take_prev]]
+        take_next = missing & np.isnan(out) & has_next
+        out[take_next] = values[n[take_next]]
+    rest = np.isnan(out)
+    if rest.any():
+        out[rest] = np.nanmedian(values) if method == "median" else np.nanmean(values)
+    return out
+
+
+# Số chữ số thập phân mà các giá trị có sẵn của cột đang dùng (tối đa 7)
+def stored_decimals(values):
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    for decimals in range(8):
+        if np.allclose(np.round(values, decimals), values, rtol=0, atol=1e-9):
+            return decimals
+    return None
+
+
+class CleaningPipeline:
+    """Quy trình làm sạch khai báo trước các bước, chạy một lượt trên cùng một bảng.
+
+    Thay vì mỗi hàm làm sạch tự chép lại cả bảng, pipeline chép (tuỳ chọn) đúng một lần ở đầu
+    rồi các bước sửa trực tiếp trên bảng đó. Bước điền NaN làm theo từng địa điểm trên thứ tự
+    (địa điểm, ngày) nên không lấy số liệu của tỉnh này điền cho tỉnh khác; mặc định điền bằng
+    trung bình như handling_NaN_values, nội suy theo thời gian là tuỳ chọn. Sau mỗi lần chạy,
+    stats ghi lại thời gian và bộ nhớ đỉnh của từng bước.
+    """
+
+    STEPS = ('remove_duplicate_rows', 'column_name_normalization', 'convert_date_data_to_datetime',
+             'fill_missing')
+    FILL_METHODS = ('mean', 'median', 'ffill', 'bfill', 'interpolate')
+
+    def __init__(self, steps=None, fill_method="mean"):
+        self.steps = tuple(steps) if steps is not None else self.STEPS
+        unknown = [step for step in self.steps if step not in self.STEPS]
+        if unknown:
+            raise ValueError(f"Bước làm sạch không hợp lệ: {unknown}")
+        if fill_method not in self.FILL_METHODS:
+            raise ValueError(f"Cách điền giá trị thiếu không hợp lệ: {fill_method}")
+        self.fill_method = fill_method
+        self.stats = []
+
+    @property
+    def recipe(self):
+        """Mô tả các bước (dùng cho dấu vân tay làm sạch)"""
+        return tuple(f"{step}:by_location:{self.fill_method}" if step == 'fill_missing' else step
+                     for step in self.steps)
+
+    def run(self, df, copy=True, trace_memory=False):
+        """Chạy các bước trên df (chép một lần nếu copy=True); trả về bảng đã làm sạch"""
+        if copy:
+            df = df.copy()
+        self.stats = []
+        tracing = trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        try:
+            for step in self.steps:
+                if trace_memory:
+                    tracemalloc.reset_peak()
+                    before = tracemalloc.get_traced_memory()[0]
+                t0 = time.perf_counter()
+                with span(f"clean.{step}", rows=len(df)):
+                    df = getattr(self, f"_{step}")(df)
+                elapsed = time.perf_counter() - t0
+                peak_mb = (tracemalloc.get_traced_memory()[1] - before) / 2**20 if trace_memory else None
+                self.stats.append({'step': step, 'seconds': elapsed, 'peak_mb': peak_mb, 'rows': len(df)})
+        finally:
+            if tracing:
+                tracemalloc.stop()
+        return df
+
+    def report(self):
+        """Bảng thời gian và bộ nhớ đỉnh của từng bước trong lần chạy gần nhất"""
+        return pd.DataFrame(self.stats).set_index('step') if self.stats else pd.DataFrame()
+
+    def _remove_duplicate_rows(self, df):
+        df.drop_duplicates(inplace=True, ignore_index=True)
+        return df
+
+    def _column_name_normalization(self, df):
+        df.columns = normalize_column_names(df.columns)
+        return df
+
+    def _convert_date_data_to_datetime(self, df):
+        if not pd.api.types.is_datetime64_any_dtype(df["date"]):
+            df["date"] = pd.to_datetime(df["date"], errors="coerce")
+        df["month"] = df["date"].dt.month
+        df["year"] = df["date"].dt.year
+        return df
+
+    def _fill_missing(self, df):
+        num_cols = [c for c in df.select_dtypes(include=[np.number]).columns
+                    if not pd.api.types.is_bool_dtype(df[c]) and df[c].isna().any()]
+        if not num_cols:
+            return df
+        if 'location_name' not in df.columns or 'date' not in df.columns:
+            # Không có khoá địa điểm/ngày: coi cả bảng là một nhóm theo thứ tự hiện có
+            codes = np.zeros(len(df), dtype=np.intp)
+            days = np.arange(len(df), dtype=np.int64)
+            order = np.arange(len(df))
+        else:
+            codes = pd.factorize(df['location_name'])[0]
+            days = df['date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+            order = np.lexsort((days, codes))
+            codes, days = codes[order], days[order]
+        for col in num_cols:
+            values = df[col].to_numpy(dtype=float)[order]
+            filled = np.empty(len(df))
+            filled[order] = fill_by_location(values, codes, days, self.fill_method)
+            # Giá trị điền vào (trung bình, nội suy) làm tròn theo độ chính xác của cột, để cột vẫn
+            # giữ nguyên khi chuyển qua dạng gọn float32 và ghi lại CSV
+            decimals = stored_decimals(values)
+            if decimals is not None:
+                missing = df[col].isna().to_numpy()
+                filled[missing] = np.round(filled[missing], decimals)
+            df[col] = filled.astype(df[col].dtype) if pd.api.types.is_float_dtype(df[col]) else filled
+        return df
+
+
+# Quy trình làm sạch mà main() áp dụng; đổi quy trình thì dấu vân tay cũng đổi theo
+DEFAULT_PIPELINE = CleaningPipeline()
+CLEANING_RECIPE = DEFAULT_PIPELINE.recipe
+
+
+# Dấu vân tay của (công thức làm sạch, mã băm file đầu vào)
+def cleaning_fingerprint(source_hash, recipe=CLEANING_RECIPE):
+    payload = json.dumps([list(recipe), source_hash])
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+# Kiểm tra dữ liệu đọc từ file đã được làm sạch bằng đúng công thức này hay chưa
+def is_already_clean(df, recipe=CLEANING_RECIPE):
+    source_hash = df.attrs.get('source_hash')
+    if source_hash is None:
+        return False
+    return df.attrs.get('clean_fingerprint') == cleaning_fingerprint(source_hash, recipe)
+
+
+# Lưu dữ liệu đã làm sạch kèm dấu vân tay để lần chạy sau bỏ qua bước làm sạch
+def save_clean_data(df, path, recipe=CLEANING_RECIPE):
+    expand_frame(df).to_csv(path, index=False)
+    source = file_fingerprint(path)
+    fingerprint = cleaning_fingerprint(source['sha1'], recipe)
+    df.attrs['source_hash'] = source['sha1']
+    df.attrs['clean_fingerprint'] = fingerprint
+    write_cache(df, path, source=source, extra={'clean_fingerprint': fingerprint})
+    return df
+
+
+# Mã băm 64 bit của từng dòng; cột số đưa về float64 để cùng giá trị ở các khối khác nhau
+# (kiểu int ở khối này, float ở khối khác) vẫn cho cùng mã băm
+def row_digests(df):
+    normalized = pd.DataFrame({
+        col: s.astype(float) if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s)
+        else s.astype(str)
+        for col, s in df.items()
+    })
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+
+# Số ngày gần nhất (tính từ ngày mới nhất đã gặp) còn giữ mã băm để bỏ dòng trùng khi làm sạch theo khối
+DEDUP_WINDOW_DAYS = 7
+
+# Khoá ngày của các dòng không có ngày hợp lệ
+_NO_DAY = np.iinfo(np.int64).min
+
+
+class RecentRows:
+    """Mã băm các dòng đã gặp, chia theo ngày, chỉ giữ window ngày gần nhất.
+
+    File dữ liệu ghi theo thứ tự ngày nên dòng trùng nằm gần dòng gốc: bỏ mã băm của các ngày
+    cũ giữ bộ nhớ ở mức (số địa điểm × window) mã băm thay vì tăng theo kích thước file.
+    Giới hạn còn lại: dòng trùng có ngày cũ hơn ngày mới nhất đã gặp từ window ngày trở lên
+    thì không bị phát hiện; các dòng không có ngày (hoặc không có cột date) chung một nhóm
+    không bị giới hạn.
+    """
+
+    def __init__(self, window=DEDUP_WINDOW_DAYS):
+        self.window = window
+        self._days = {}
+        self._newest = None
+
+    def __len__(self):
+        return sum(len(digests) for digests in self._days.values())
+
+    def drop_seen(self, chunk):
+        """Bỏ các dòng của chunk đã gặp (ở khối này hoặc các khối trước)"""
+        if 'date' in chunk.columns and pd.api.types.is_datetime64_any_dtype(chunk['date']):
+            days = chunk['date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+        else:
+            days = np.full(len(chunk), _NO_DAY)
+        keep = np.ones(len(chunk), dtype=bool)
+        for i, (day, digest) in enumerate(zip(days.tolist(), row_digests(chunk).tolist())):
+            seen = self._days.setdefault(day, set())
+            if digest in seen:
+                keep[i] = False
+            else:
+                seen.add(digest)
+
+        known = days[days != _NO_DAY]
+        if len(known):
+            self._newest = max(int(known.max()), self._newest if self._newest is not None else _NO_DAY)
+            for day in [d for d in self._days if d != _NO_DAY and d <= self._newest - self.window]:
+                del self._days[day]
+        return chunk[keep].reset_index(drop=True)
+
+
+# Bỏ các dòng trùng trong một khối, dựa trên mã băm các dòng đã gặp ở những khối trước (RecentRows)
+def drop_seen_rows(chunk, seen):
+    return seen.drop_seen(chunk)
+
+
+# Các bước làm sạch không cần nhìn toàn bộ dữ liệu, áp dụng cho từng khối
+def _clean_chunk(chunk, seen):
+    chunk = column_name_normalization(chunk)
+    chunk = convert_date_data_to_datetime(chunk)
+    return drop_seen_rows(chunk, seen)
+
+
+# Khoá địa điểm của từng dòng; không có cột địa điểm thì cả bảng là một nhóm (như CleaningPipeline)
+def _location_keys(chunk):
+    if 'location_name' in chunk.columns:
+        return chunk['location_name'].astype(str).to_numpy(dtype=object)
+    return np.full(len(chunk), '', dtype=object)
+
+
+class StreamingFill:
+    """Điền NaN theo từng địa điểm khi làm sạch theo khối, như fill_by_location trên file sắp theo ngày.
+
+    Lượt 1 (observe) gom cho từng (địa điểm, cột) số giá trị, tổng, giá trị đầu tiên và phác thảo
+    trung vị; bộ nhớ tỉ lệ với số địa điểm, không theo số dòng. Lượt 2 (fill) điền từng khối:
+    mean/median lấy thống kê của địa điểm, ffill nối tiếp giá trị cuối của địa điểm ở các khối
+    trước. bfill cần giá trị phía sau: từ dòng có ô NaN mà địa điểm chỉ còn số liệu ở khối sau,
+    phần còn lại của khối được giữ lại và ghép vào khối kế tiếp, nên phần giữ lại dài bằng đoạn
+    thiếu số liệu dài nhất của một địa điểm. Ô không có giá trị ở phía cần lấy thì lấy phía còn
+    lại, địa điểm không có số liệu lấy giá trị chung; giá trị điền được làm tròn theo cột.
+    """
+
+    def __init__(self, method):
+        self.method = method
+        self.counts = self.totals = self.firsts = None
+        self.decimals = {}
+        self.sketches = {}
+        self.columns = []
+
+    def observe(self, chunk, cols):
+        """Lượt 1: gom thống kê theo địa điểm của một khối"""
+        grouped = chunk[cols].groupby(_location_keys(chunk), sort=False)
+        counts, totals, firsts = grouped.count(), grouped.sum(), grouped.first()
+        if self.counts is None:
+            self.counts, self.totals, self.firsts = counts, totals, firsts
+        else:
+            self.counts = self.counts.add(counts, fill_value=0)
+            self.totals = self.totals.add(totals, fill_value=0)
+            self.firsts = self.firsts.combine_first(firsts)
+        for col in cols:
+            values = chunk[col].to_numpy(dtype=float)
+            decimals, before = stored_decimals(values), self.decimals.get(col, 0)
+            self.decimals[col] = None if decimals is None or before is None else max(decimals, before)
+            if self.method == "median":
+                for name, positions in grouped.indices.items():
+                    valid = values[positions]
+                    valid = valid[~np.isnan(valid)]
+                    self.sketches.setdefault((name, col), QuantileSketch()).update(valid)
+                    self.sketches.setdefault((None, col), QuantileSketch()).update(valid)
+
+    def prepare(self):
+        """Sau lượt 1: chọn các cột có số liệu và tính giá trị điền của từng địa điểm"""
+        if self.counts is None:
+            return []
+        cols = [c for c in self.counts.columns if self.counts[c].sum() > 0]
+        counts = self.counts[cols]
+        if self.method == "median":
+            self.overall = pd.Series({c: self.sketches[(None, c)].median() for c in cols}, dtype=float)
+            per_location = pd.DataFrame(
+                {c: [self.sketches[(name, c)].median() if counts.at[name, c] else np.nan for name in counts.index]
+                 for c in cols}, index=counts.index)
+        else:
+            self.overall = self.totals[cols].sum() / counts.sum()
+            per_location = self.totals[cols] / counts.where(counts > 0)
+        self.per_location = per_location.fillna(self.overall)
+        self.remaining = counts.copy()
+        self.last = pd.DataFrame(np.nan, index=counts.index, columns=cols)
+        self.columns = cols
+        return cols
+
+    @staticmethod
+    def _lookup(table, keys, index):
+        return pd.DataFrame(table.reindex(keys).to_numpy(dtype=float), index=index, columns=table.columns)
+
+    def fill(self, block, final=False):
+        """Lượt 2: điền một khối; trả về (phần đã điền để ghi ra, phần giữ lại cho khối sau, số ô đã điền)"""
+        cols = [c for c in self.columns if c in block.columns]
+        if not cols or block.empty:
+            return block, block.iloc[:0], 0
+        keys = _location_keys(block)
+        values = block[cols].astype(float)
+        missing = values.isna()
+        grouped = values.groupby(keys, sort=False)
+        cut = len(block)
+        if self.method in ("mean", "median"):
+            filled = values.fillna(self._lookup(self.per_location[cols], keys, block.index))
+        else:
+            prev = grouped.ffill().fillna(self._lookup(self.last[cols], keys, block.index))
+            if self.method == "ffill":
+                # Chưa có giá trị trước: giá trị sau gần nhất chính là giá trị hợp lệ đầu tiên của địa điểm
+                filled = values.fillna(prev).fillna(self._lookup(self.firsts[cols], keys, block.index))
+            else:
+                nxt = grouped.bfill()
+                later = self.remaining[cols].sub(grouped.count(), fill_value=0)
+                waiting = missing & nxt.isna() & (self._lookup(later, keys, block.index) > 0)
+                if not final and waiting.to_numpy().any():
+                    cut = int(np.argmax(waiting.to_numpy().any(axis=1)))
+                filled = values.fillna(nxt).fillna(prev)
+            filled = filled.fillna(self.overall[cols])
+
+        out, rest = block.iloc[:cut].copy(), block.iloc[cut:]
+        for col in cols:
+            mask = missing[col].to_numpy()[:cut]
+            if mask.any():
+                column = filled[col].to_numpy()[:cut].copy()
+                if self.decimals.get(col) is not None:
+                    column[mask] = np.round(column[mask], self.decimals[col])
+                out[col] = column
+
+        written = values.iloc[:cut].groupby(keys[:cut], sort=False)
+        self.last = written.last().combine_first(self.last)[self.columns]
+        self.remaining = self.remaining.sub(written.count(), fill_value=0)[self.columns]
+        return out, rest, int(missing.iloc[:cut].to_numpy().sum())
+
+
+# Làm sạch file CSV theo từng khối, ghi kết quả ra output_path từng khối một.
+# Lượt 1: bỏ trùng (RecentRows) và gom thống kê theo địa điểm; lượt 2: đọc lại, bỏ trùng y hệt rồi
+# điền NaN theo từng địa điểm (StreamingFill), cho cùng kết quả với CleaningPipeline cùng cách điền
+def clean_csv_streaming(input_path, output_path, method="mean", chunksize=100_000):
+    t0 = time.perf_counter()
+    seen = RecentRows()
+    rows_in = 0
+    filler = StreamingFill(method)
+    for chunk in iter_weather_chunks(input_path, chunksize):
+        rows_in += len(chunk)
+        chunk = _clean_chunk(chunk, seen)
+        filler.observe(chunk, [c for c in chunk.select_dtypes(include=[np.number]).columns
+                               if not pd.api.types.is_bool_dtype(chunk[c])])
+    filler.prepare()
+
+    seen = RecentRows()
+    rows_out, filled = 0, 0
+    header = True
+    pending = None
+    tmp_path = output_path + '.tmp'
+    chunks = (_clean_chunk(chunk, seen) for chunk in iter_weather_chunks(input_path, chunksize))
+    # None ở cuối: ghi nốt các dòng còn giữ lại
+    for chunk in itertools.chain(chunks, [None]):
+        if chunk is None:
+            block, final = pending, True
+        else:
+            block = chunk if pending is None or pending.empty else pd.concat([pending, chunk], ignore_index=True)
+            final = False
+        if block is None:
+            break
+        out, pending, count = filler.fill(block, final)
+        filled += count
+        out.to_csv(tmp_path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+        rows_out += len(out)
+    os.replace(tmp_path, output_path)
+
+    return {
+        'rows_in': rows_in,
+        'rows_out': rows_out,
+        'duplicates': rows_in - rows_out,
+        'filled': filled,
+        'seconds': time.perf_counter() - t0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Làm sạch file dữ liệu lớn theo từng khối (không nạp cả file)")
+    parser.add_argument('input', help="file CSV đầu vào")
+    parser.add_argument('output', help="file CSV đã làm sạch")
+    parser.add_argument('--method', default='mean', choices=['mean', 'median', 'ffill', 'bfill'],
+                        help="cách điền giá trị thiếu")
+    parser.add_argument('--chunksize', type=int, default=100_000, help="số dòng mỗi khối")
+    args = parser.parse_args()
+
+    summary = clean_csv_streaming(args.input, args.output, args.method, args.chunksize)
+    print(f"Đã đọc {summary['rows_in']} dòng, bỏ {summary['duplicates']} dòng trùng, "
+          f"điền {summary['filled']} giá trị thiếu, ghi {summary['rows_out']} dòng "
+          f"({summary['seconds']:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
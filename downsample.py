@@ -0,0 +1,65 @@
+import numpy as np
+
+
+# Chuyển trục x (số hoặc ngày giờ) về float để tính toán
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(float)
+    return x.astype(float)
+
+
+# Largest-Triangle-Three-Buckets: chọn n_out điểm giữ được hình dạng đường (kể cả các cực trị).
+# Trả về chỉ số các điểm được giữ lại, tăng dần.
+def lttb_indices(x, y, n_out):
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = _as_float(x)
+    y = np.asarray(y, dtype=float)
+
+    # Điểm đầu và cuối luôn được giữ, n - 2 điểm giữa chia đều vào n_out - 2 nhóm
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    # Trung bình của từng nhóm, dùng làm đỉnh thứ ba của tam giác cho nhóm liền trước
+    counts = np.diff(edges)
+    csx = np.concatenate([[0.0], np.cumsum(x)])
+    csy = np.concatenate([[0.0], np.cumsum(y)])
+    avg_x = (csx[edges[1:]] - csx[edges[:-1]]) / np.maximum(counts, 1)
+    avg_y = (csy[edges[1:]] - csy[edges[:-1]]) / np.maximum(counts, 1)
+    avg_x = np.append(avg_x, x[-1])
+    avg_y = np.append(avg_y, y[-1])
+
+    out = np.empty(n_out, dtype=np.intp)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        bx, by = x[lo:hi], y[lo:hi]
+        cx, cy = avg_x[i + 1], avg_y[i + 1]
+        area = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+# Giảm mẫu min/max: mỗi nhóm giữ điểm nhỏ nhất và lớn nhất (theo đúng thứ tự thời gian).
+# Trả về chỉ số các điểm được giữ lại, tăng dần (tối đa 2 * n_buckets + 2 điểm).
+def minmax_indices(x, y, n_buckets):
+    n = len(y)
+    if 2 * n_buckets >= n or n_buckets < 1:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    bucket = (np.arange(n) * n_buckets) // n
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    order = np.lexsort((y, bucket))
+    # Với mỗi nhóm: phần tử đầu (nhỏ nhất) và cuối (lớn nhất) theo thứ tự (nhóm, y)
+    ends = np.r_[starts[1:], n] - 1
+    keep = np.concatenate([[0, n - 1], order[starts], order[ends]])
+    return np.unique(keep)
+
+
+# Chọn chỉ số các điểm cần vẽ để một chuỗi còn khoảng max_points điểm
+def decimate(x, y, max_points, method='lttb'):
+    if method == 'minmax':
+        return minmax_indices(x, y, max(1, max_points // 2))
+    return lttb_indices(x, y, max_points)
@@ -1,35 +1,136 @@
+import os
+import threading
 import tkinter as tk
-from tkinter import ttk, messagebox
-import pandas as pd
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from visualization import WeatherVisualizer
-from analysis import detect_heatwaves, detect_heavy_rain, add_record, update_record, delete_record, save_data
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import ttk, messagebox, filedialog
+from instrumentation import span, tracer
+from startup import DATA_MODULES, import_modules, mark, prewarm_plotting
+
+# Các mô-đun kéo theo pandas/matplotlib/seaborn không được nạp ở đây mà nạp ở luồng nền khi khởi động
+# (xem WeatherApp._load_data và startup.prewarm_plotting), để cửa sổ hiện ra trước khi nạp xong;
+# các lệnh import bên trong phương thức bên dưới khi đó chỉ lấy lại mô-đun đã nạp.
 
 
 class WeatherApp:
-    def __init__(self, root):
-        """Khởi tạo ứng dụng: thiết lập cửa sổ, đọc dữ liệu từ CSV, tạo giao diện"""
+    def __init__(self, root, df=None, prewarm=True, on_ready=None):
+        """Khởi tạo ứng dụng: thiết lập cửa sổ, tạo giao diện rồi nạp dữ liệu ở luồng nền.
+
+        df: DataFrame đã nạp, hàm trả về DataFrame (chạy ở luồng nền) hoặc None (tự đọc qua cache).
+        Cửa sổ hiện ngay với màn hình chờ; các nút dùng dữ liệu được bật khi nạp xong. prewarm: sau khi
+        nạp dữ liệu thì nạp trước matplotlib/seaborn ở luồng nền. on_ready(app) được gọi trên luồng Tk
+        khi dữ liệu (và bộ vẽ, nếu prewarm) đã sẵn sàng.
+        """
         self.root = root
         self.root.title("Hệ thống Thống kê Thời tiết")
         self.root.geometry("1400x700")
         self.root.configure(bg='#f0f0f0')
 
-        try:
-            self.df = pd.read_csv('df_weather.csv')
-            self.df['date'] = pd.to_datetime(self.df['date'])
-            # Tạo các cột cần thiết cho analysis
-            if 'day_avgtemp_c' in self.df.columns:
-                self.df['Temperature'] = self.df['day_avgtemp_c']
-            if 'day_totalprecip_mm' in self.df.columns:
-                self.df['Precipitation'] = self.df['day_totalprecip_mm']
-        except Exception as e:
-            messagebox.showerror("Lỗi", f"Không thể đọc file dữ liệu: {e}")
+        self.store = None
+        self.figures = None
+        self.visualizer = None
+        self.canvas_widget = None
+        self._on_ready = on_ready
+
+        # Luồng nền cho các phép tính nặng; _year_job tăng mỗi khi đổi khung hiển thị để huỷ việc cũ
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self._year_job = 0
+        # Kho dữ liệu và các khối tổng hợp chỉ bị sửa trong _apply_edit (luồng Tk, giữ khoá này, gộp/tính lại
+        # xong ngay trong khoá) và được đọc ở luồng nền khi tính thống kê năm (cũng giữ khoá)
+        self._cube_lock = threading.Lock()
+        self._pending_future = None
+        self._save_future = None
+        self.root.protocol('WM_DELETE_WINDOW', self.on_close)
+
+        with span('startup.create_widgets'):
+            self.create_widgets()
+            self._show_splash()
+
+        future = self.executor.submit(self._load_data, df)
+        self._poll_future(future, None, lambda fut: self._on_data_loaded(fut, prewarm))
+
+    @staticmethod
+    def _load_data(df):
+        """Nạp mô-đun dữ liệu, đọc dữ liệu, áp lại nhật ký và dựng các khối tổng hợp (chạy ở luồng nền)"""
+        with span('startup.load_data'):
+            import_modules(DATA_MODULES)
+            from load_data import load_weather_data
+            from journal import Journal, journal_path_for
+            from record_store import RecordStore
+            from aggregates import AggregateCube, CovarianceCube, QuantileCube
+            from visualization import CORRELATION_COLUMNS
+
+            if callable(df):
+                df = df()
+            store = RecordStore(df if df is not None else load_weather_data('df_weather.csv', compact=True))
+            # Áp lại các thao tác đã ghi trong nhật ký nhưng chưa gộp vào file dữ liệu
+            with span('startup.journal_replay'):
+                base_hash = store.frame().attrs.get('source_hash')
+                journal = Journal(journal_path_for('df_weather.csv'), base_hash)
+                applied, skipped = journal.replay(store, base_hash)
+            if applied or skipped:
+                print(f"Đã áp lại {applied} thao tác từ nhật ký ({skipped} thao tác bỏ qua)")
+            with span('startup.aggregate_cube'):
+                cube = AggregateCube.from_store(store)
+            with span('startup.covariance_cube'):
+                covariance = CovarianceCube.from_store(store, CORRELATION_COLUMNS)
+            return {
+                'store': store,
+                'journal': journal,
+                'cube': cube,
+                'covariance': covariance,
+                # Phác thảo phân vị theo ô (vùng, năm, tháng), chỉ dựng khi cần tới lần đầu
+                'quantiles': QuantileCube.from_store(store),
+            }
+
+    def _show_splash(self):
+        """Màn hình chờ trong vùng hiển thị trong lúc nạp dữ liệu"""
+        self._splash = tk.Frame(self.display_frame, bg='white')
+        self._splash.pack(fill='both', expand=True)
+        tk.Label(self._splash, text="⏳ Đang nạp dữ liệu...", font=('Arial', 12), bg='white').pack(pady=(120, 10))
+        self._splash_progress = ttk.Progressbar(self._splash, mode='indeterminate', length=300)
+        self._splash_progress.pack()
+        self._splash_progress.start(10)
+
+    def _on_data_loaded(self, future, prewarm):
+        """Nhận kết quả _load_data trên luồng Tk: gắn dữ liệu, bật các nút, rồi nạp trước bộ vẽ"""
+        self._splash_progress.stop()
+        self._splash.destroy()
+        if future.exception() is not None:
+            tk.Label(self.display_frame, text=f"Không thể đọc file dữ liệu:\n{future.exception()}",
+                     font=('Arial', 10), bg='white', fg='red').pack(pady=20)
+            messagebox.showerror("Lỗi", f"Không thể đọc file dữ liệu: {future.exception()}")
             return
+        from visualization import FigureManager, WeatherVisualizer
 
-        self.visualizer = WeatherVisualizer(self.df)
-        self.canvas_widget = None
+        data = future.result()
+        self.store, self.journal = data['store'], data['journal']
+        self.cube, self.covariance, self.quantiles = data['cube'], data['covariance'], data['quantiles']
+
+        # Quản lý figure: giải phóng figure khi widget bị huỷ, giữ LRU các khung vừa xem
+        self.figures = FigureManager(max_views=6)
+        self.visualizer = WeatherVisualizer(self.df, self.figures)
+
+        years = self.store.index().years()
+        self.year_dropdown.configure(values=years)
+        self.year_var.set(str(years[0]) if years else "2024")
+        for button in self._data_buttons:
+            button.configure(state='normal')
+        mark('data_ready')
 
-        self.create_widgets()
+        if not prewarm:
+            self._ready()
+            return
+        self._poll_future(self.executor.submit(prewarm_plotting), None, lambda fut: self._ready())
+
+    def _ready(self):
+        mark('ready')
+        if self._on_ready is not None:
+            self._on_ready(self)
+
+    @property
+    def df(self):
+        """Bảng dữ liệu hiện hành (kho dữ liệu tự gộp các thay đổi đang chờ khi được đọc)"""
+        return self.store.frame()
 
     def create_widgets(self):
         """Tạo các thành phần giao diện: header, control panel, data management panel, vùng hiển thị"""
@@ -61,11 +162,11 @@ class WeatherApp:
         tk.Label(select_frame, text="Năm:", bg='#ecf0f1',
                  font=('Arial', 10)).grid(row=0, column=2, padx=5)
 
-        years = sorted(self.df['date'].dt.year.unique())
-        self.year_var = tk.StringVar(value=str(years[0]) if years else "2024")
-        year_dropdown = ttk.Combobox(select_frame, textvariable=self.year_var,
-                                     values=years, state='readonly', width=8)
-        year_dropdown.grid(row=0, column=3, padx=5)
+        # Danh sách năm được điền khi nạp xong dữ liệu
+        self.year_var = tk.StringVar(value="")
+        self.year_dropdown = ttk.Combobox(select_frame, textvariable=self.year_var,
+                                          values=[], state='readonly', width=8)
+        self.year_dropdown.grid(row=0, column=3, padx=5)
 
         # Middle section: View buttons
         btn_frame = tk.Frame(control_frame, bg='#ecf0f1')
@@ -111,25 +212,87 @@ class WeatherApp:
                              padx=10, pady=8, relief='raised', cursor='hand2')
         btn_save.pack(side='left', padx=3)
 
+        # Các nút cần dữ liệu: tắt cho tới khi nạp xong
+        self._data_buttons = [btn_month, btn_year, btn_add, btn_update, btn_delete, btn_save]
+        for button in self._data_buttons:
+            button.configure(state='disabled')
+
+        # Bật/tắt đo thời gian; khi bật, thanh trạng thái dưới cùng hiện chi tiết thao tác gần nhất
+        self.timing_var = tk.BooleanVar(value=tracer.enabled)
+        tk.Checkbutton(control_frame, text="⏱ Đo thời gian", variable=self.timing_var,
+                       command=self.toggle_timing, bg='#ecf0f1', font=('Arial', 9)).pack(side='right', padx=5)
+
+        self.status_bar = tk.Frame(self.root, bg='#dfe6e9')
+        self.timing_text = tk.StringVar(value=tracer.action_breakdown())
+        tk.Label(self.status_bar, textvariable=self.timing_text, bg='#dfe6e9', anchor='w',
+                 font=('Consolas', 9)).pack(side='left', fill='x', expand=True, padx=10, pady=3)
+        tk.Button(self.status_bar, text="Xuất trace", command=self.export_trace,
+                  font=('Arial', 8), padx=6).pack(side='right', padx=5, pady=2)
+        if tracer.enabled:
+            self.status_bar.pack(side='bottom', fill='x')
+
         # Display Area
         self.display_frame = tk.Frame(self.root, bg='white')
         self.display_frame.pack(fill='both', expand=True, padx=10, pady=10)
 
+    def toggle_timing(self):
+        """Bật/tắt đo thời gian các thao tác (khi tắt gần như không tốn gì)"""
+        if self.timing_var.get():
+            tracer.enable(trace_memory=True)
+            self.status_bar.pack(side='bottom', fill='x', before=self.display_frame)
+            self._update_timing()
+        else:
+            tracer.disable()
+            self.status_bar.pack_forget()
+
+    def _update_timing(self):
+        """Hiển thị thời gian của thao tác gần nhất lên thanh trạng thái"""
+        if tracer.enabled:
+            self.timing_text.set(tracer.action_breakdown())
+
+    def export_trace(self):
+        """Ghi các span đã đo ra file Chrome trace (JSON) kèm bảng tổng hợp (CSV)"""
+        path = filedialog.asksaveasfilename(parent=self.root, defaultextension='.json',
+                                            initialfile='weather_trace.json',
+                                            filetypes=[('Chrome trace', '*.json')])
+        if not path:
+            return
+        tracer.export_chrome_trace(path)
+        summary_path = os.path.splitext(path)[0] + '_summary.csv'
+        tracer.summary().round(3).to_csv(summary_path)
+        messagebox.showinfo("Thành công", f"Đã ghi {path}\nvà {summary_path}\n"
+                                          f"(mở file trace bằng chrome://tracing hoặc ui.perfetto.dev)")
+
+    def on_close(self):
+        """Đóng cửa sổ: huỷ các việc đang chờ ở luồng nền (việc lưu đang chạy thì chờ cho xong)"""
+        if self._save_future is not None:
+            self._save_future.exception()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+
     def clear_display(self):
-        """Xóa toàn bộ nội dung trong vùng hiển thị"""
+        """Xóa toàn bộ nội dung trong vùng hiển thị và huỷ việc tính toán năm đang chờ"""
+        self._year_job += 1
+        if self._pending_future is not None:
+            self._pending_future.cancel()
+            self._pending_future = None
+        # Khung đã lưu trong LRU chỉ bị ẩn đi để dùng lại, các widget khác bị huỷ
+        cached = self.figures.cached_views()
         for widget in self.display_frame.winfo_children():
-            widget.destroy()
+            if widget in cached:
+                widget.pack_forget()
+            else:
+                widget.destroy()
         if self.canvas_widget:
             self.canvas_widget = None
 
     def reload_data(self):
         """Tải lại dữ liệu sau khi thêm/sửa/xóa"""
-        self.df['date'] = pd.to_datetime(self.df['date'])
-        if 'day_avgtemp_c' in self.df.columns:
-            self.df['Temperature'] = self.df['day_avgtemp_c']
-        if 'day_totalprecip_mm' in self.df.columns:
-            self.df['Precipitation'] = self.df['day_totalprecip_mm']
-        self.visualizer = WeatherVisualizer(self.df)
+        from visualization import WeatherVisualizer
+
+        # Dữ liệu đã đổi phiên bản: các khung đã vẽ không còn dùng lại được
+        self.figures.discard_views()
+        self.visualizer = WeatherVisualizer(self.df, self.figures)
 
     def add_data(self):
         """Thêm bản ghi dữ liệu thời tiết mới"""
@@ -179,7 +342,7 @@ class WeatherApp:
                     else:
                         record[key] = value
 
-                self.df = add_record(self.df, record)
+                self._apply_edit('add', record)
                 self.reload_data()
                 messagebox.showinfo("Thành công", "Đã thêm dữ liệu mới!")
                 dialog.destroy()
@@ -190,24 +353,50 @@ class WeatherApp:
                   font=('Arial', 10, 'bold'), padx=20, pady=5).pack(pady=15)
 
     def update_data(self):
-        """Cập nhật dữ liệu thời tiết theo ngày"""
-        dialog = tk.Toplevel(self.root)
-        dialog.title("Cập nhật dữ liệu")
-        dialog.geometry("400x400")
-        dialog.configure(bg='#ecf0f1')
+        """Cập nhật dữ liệu thời tiết của đúng một bản ghi (địa điểm, ngày) chọn trong trình duyệt bản ghi"""
+        self.browse_records(mode='update')
 
-        tk.Label(dialog, text="✏️ CẬP NHẬT DỮ LIỆU", font=('Arial', 14, 'bold'),
-                 bg='#ecf0f1').pack(pady=10)
+    def delete_data(self):
+        """Xóa dữ liệu thời tiết của đúng một bản ghi (địa điểm, ngày) chọn trong trình duyệt bản ghi"""
+        self.browse_records(mode='delete')
+
+    def browse_records(self, mode='update'):
+        """Trình duyệt bản ghi: tìm theo địa điểm, khoảng ngày, vùng miền rồi sửa/xóa bản ghi đang chọn.
+
+        Tìm kiếm chạy trên chỉ mục đã sắp xếp của kho dữ liệu (store.index(), dựng lại sau mỗi thay đổi)
+        và bảng kết quả chỉ đọc các dòng đang hiện, nên gõ tìm vẫn mượt với hàng triệu dòng.
+        """
+        import pandas as pd
+        from widgets import VirtualTable, format_date
 
-        # Chọn ngày cần cập nhật
-        tk.Label(dialog, text="Chọn ngày cần cập nhật:", bg='#ecf0f1').pack(pady=5)
-        date_var = tk.StringVar()
-        dates = sorted([d.strftime('%Y-%m-%d') for d in self.df['date'].unique()])
-        date_combo = ttk.Combobox(dialog, textvariable=date_var, values=dates,
-                                  state='readonly', width=30)
-        date_combo.pack(pady=5)
+        updating = mode == 'update'
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Cập nhật dữ liệu" if updating else "Xóa dữ liệu")
+        dialog.geometry("950x620")
+        dialog.configure(bg='#ecf0f1')
 
-        # Các trường cập nhật
+        tk.Label(dialog, text="✏️ CẬP NHẬT DỮ LIỆU" if updating else "🗑️ XÓA DỮ LIỆU",
+                 font=('Arial', 14, 'bold'), bg='#ecf0f1').pack(pady=10)
+
+        # Thanh tìm kiếm: kết quả được lọc lại ngay khi gõ
+        search_frame = tk.Frame(dialog, bg='#ecf0f1')
+        search_frame.pack(fill='x', padx=10)
+        location_var, start_var, end_var, region_var = (tk.StringVar() for _ in range(4))
+        tk.Label(search_frame, text="🔎 Địa điểm:", bg='#ecf0f1').grid(row=0, column=0, padx=5)
+        tk.Entry(search_frame, textvariable=location_var, width=20).grid(row=0, column=1, padx=5)
+        tk.Label(search_frame, text="Từ ngày:", bg='#ecf0f1').grid(row=0, column=2, padx=5)
+        tk.Entry(search_frame, textvariable=start_var, width=12).grid(row=0, column=3, padx=5)
+        tk.Label(search_frame, text="Đến ngày:", bg='#ecf0f1').grid(row=0, column=4, padx=5)
+        tk.Entry(search_frame, textvariable=end_var, width=12).grid(row=0, column=5, padx=5)
+        tk.Label(search_frame, text="Vùng miền:", bg='#ecf0f1').grid(row=0, column=6, padx=5)
+        ttk.Combobox(search_frame, textvariable=region_var, values=[''] + self.store.index().regions(),
+                     state='readonly', width=12).grid(row=0, column=7, padx=5)
+        count_var = tk.StringVar()
+        tk.Label(search_frame, textvariable=count_var, bg='#ecf0f1', fg='gray').grid(row=0, column=8, padx=10)
+        tk.Label(dialog, text="(ngày dạng YYYY-MM-DD; tên địa điểm gõ không dấu cũng được)", bg='#ecf0f1',
+                 fg='gray', font=('Arial', 9)).pack(anchor='w', padx=15)
+
+        # Các trường có thể sửa (cũng là các cột hiện trong bảng)
         fields = [
             ('Nhiệt độ TB (°C):', 'day_avgtemp_c'),
             ('Độ ẩm (%):', 'day_avghumidity'),
@@ -216,252 +405,448 @@ class WeatherApp:
             ('Chỉ số UV:', 'day_uv')
         ]
 
+        def number(value):
+            return '' if pd.isna(value) else f"{value:g}"
+
+        table = VirtualTable(dialog, [
+            ('date', 'Ngày', 90, format_date),
+            ('location_name', 'Địa điểm', 150, None),
+            ('location_region', 'Vùng miền', 100, None),
+        ] + [(key, label.rstrip(':'), 100, number) for label, key in fields], rows=12)
+        table.pack(fill='both', expand=True, padx=10, pady=10)
+
+        # Bản ghi đang chọn được giữ lại theo khoá, không theo vị trí trong bảng (bảng cuộn/lọc lại được)
+        chosen = {}
+        chosen_var = tk.StringVar(value="Chưa chọn bản ghi nào")
+        tk.Label(dialog, textvariable=chosen_var, bg='#ecf0f1', font=('Arial', 10, 'bold')).pack()
+
         entries = {}
-        for label, key in fields:
-            frame = tk.Frame(dialog, bg='#ecf0f1')
-            frame.pack(fill='x', padx=20, pady=5)
-            tk.Label(frame, text=label, bg='#ecf0f1', width=18, anchor='w').pack(side='left')
-            entry = tk.Entry(frame, width=20)
-            entry.pack(side='right')
-            entries[key] = entry
+        if updating:
+            form = tk.Frame(dialog, bg='#ecf0f1')
+            form.pack(pady=5)
+            for i, (label, key) in enumerate(fields):
+                tk.Label(form, text=label, bg='#ecf0f1').grid(row=0, column=2 * i, padx=(10, 3))
+                entry = tk.Entry(form, width=8)
+                entry.grid(row=0, column=2 * i + 1)
+                entries[key] = entry
+
+        def on_select(event):
+            row = table.selected_row()
+            if row is None:
+                return
+            date = pd.Timestamp(row['date'])
+            chosen.clear()
+            chosen.update({'date': date.strftime('%Y-%m-%d'), 'location_name': str(row['location_name'])})
+            chosen_var.set(f"Đã chọn: {chosen['location_name']} ngày {date.strftime('%d/%m/%Y')}")
+            for key, entry in entries.items():
+                entry.delete(0, 'end')
+                entry.insert(0, number(row.get(key, float('nan'))))
+
+        table.tree.bind('<<TreeviewSelect>>', on_select)
+
+        def parse_date(text):
+            text = text.strip()
+            return pd.Timestamp(text) if text else None
+
+        # Gõ liên tục chỉ tìm lại một lần sau khi ngừng gõ (pending: lần tìm đang hẹn giờ)
+        pending = [None]
+
+        def run_search(keep_position=False):
+            pending[0] = None
+            try:
+                start, end = parse_date(start_var.get()), parse_date(end_var.get())
+            except ValueError:
+                count_var.set("Ngày không hợp lệ")
+                return
+            with span('gui.search_records'):
+                index = self.store.index()
+                positions = index.search(location_var.get(), start, end, region_var.get())
+                table.set_rows(index.df, positions, keep_position)
+            count_var.set(f"{len(positions):,} bản ghi")
+            self._update_timing()
+
+        def schedule(*args):
+            if pending[0] is not None:
+                dialog.after_cancel(pending[0])
+            pending[0] = dialog.after(150, run_search)
+
+        for var in (location_var, start_var, end_var, region_var):
+            var.trace_add('write', schedule)
 
         def submit():
             try:
-                date_str = date_var.get()
-                if not date_str:
-                    messagebox.showwarning("Cảnh báo", "Vui lòng chọn ngày!")
+                if not chosen:
+                    messagebox.showwarning("Cảnh báo", "Vui lòng chọn một bản ghi!", parent=dialog)
                     return
-
-                updates = {}
-                for key, entry in entries.items():
-                    value = entry.get().strip()
-                    if value:
-                        updates[key] = float(value)
-
-                if not updates:
-                    messagebox.showwarning("Cảnh báo", "Vui lòng nhập ít nhất một trường!")
-                    return
-
-                self.df = update_record(self.df, {'Date': date_str}, updates)
+                identifier = dict(chosen)
+                label = f"{identifier['location_name']} ngày {identifier['date']}"
+                if updating:
+                    updates = {}
+                    for key, entry in entries.items():
+                        value = entry.get().strip()
+                        if value:
+                            updates[key] = float(value)
+                    if not updates:
+                        messagebox.showwarning("Cảnh báo", "Vui lòng nhập ít nhất một trường!", parent=dialog)
+                        return
+                    count = self._apply_edit('update', identifier, updates)
+                    message = f"Đã cập nhật {count} bản ghi của {label}!"
+                else:
+                    if not messagebox.askyesno("Xác nhận", f"Bạn có chắc muốn xóa dữ liệu của {label}?",
+                                               parent=dialog):
+                        return
+                    count = self._apply_edit('delete', identifier)
+                    chosen.clear()
+                    chosen_var.set("Chưa chọn bản ghi nào")
+                    message = f"Đã xóa {count} bản ghi của {label}!"
                 self.reload_data()
-                messagebox.showinfo("Thành công", f"Đã cập nhật dữ liệu ngày {date_str}!")
-                dialog.destroy()
+                run_search(keep_position=True)
+                messagebox.showinfo("Thành công", message, parent=dialog)
             except Exception as e:
-                messagebox.showerror("Lỗi", f"Không thể cập nhật: {e}")
-
-        tk.Button(dialog, text="✅ Cập nhật", command=submit, bg='#f39c12', fg='white',
-                  font=('Arial', 10, 'bold'), padx=20, pady=5).pack(pady=15)
-
-    def delete_data(self):
-        """Xóa dữ liệu thời tiết theo ngày"""
-        dialog = tk.Toplevel(self.root)
-        dialog.title("Xóa dữ liệu")
-        dialog.geometry("350x200")
-        dialog.configure(bg='#ecf0f1')
+                messagebox.showerror("Lỗi", f"Không thể {'cập nhật' if updating else 'xóa'}: {e}", parent=dialog)
+
+        buttons = tk.Frame(dialog, bg='#ecf0f1')
+        buttons.pack(pady=10)
+        tk.Button(buttons, text="✅ Cập nhật" if updating else "✅ Xóa", command=submit,
+                  bg='#f39c12' if updating else '#c0392b', fg='white',
+                  font=('Arial', 10, 'bold'), padx=20, pady=5).pack(side='left', padx=5)
+        tk.Button(buttons, text="Đóng", command=dialog.destroy, font=('Arial', 10),
+                  padx=20, pady=5).pack(side='left', padx=5)
+
+        run_search()
+
+    def _apply_edit(self, kind, *args):
+        """Thực hiện thêm/sửa/xóa trên kho dữ liệu và ghi ngay thao tác vào nhật ký"""
+        with self._cube_lock:
+            count = getattr(self.store, kind)(*args)
+            # Gộp kho, dựng lại chỉ mục và tính lại các ô bị đổi ngay trong khoá: sau đó các lần đọc
+            # store.frame()/index() và truy vấn khối trên luồng Tk không còn sửa gì (không đua với luồng nền)
+            self.store.index()
+            self.cube.refresh()
+            self.quantiles.refresh()
+        if count:
+            self.journal.append(kind, *args)
+        return count
 
-        tk.Label(dialog, text="🗑️ XÓA DỮ LIỆU", font=('Arial', 14, 'bold'),
-                 bg='#ecf0f1').pack(pady=10)
-
-        tk.Label(dialog, text="Chọn ngày cần xóa:", bg='#ecf0f1').pack(pady=5)
-        date_var = tk.StringVar()
-        dates = sorted([d.strftime('%Y-%m-%d') for d in self.df['date'].unique()])
-        date_combo = ttk.Combobox(dialog, textvariable=date_var, values=dates,
-                                  state='readonly', width=30)
-        date_combo.pack(pady=10)
+    def save_data_to_file(self):
+        """Gộp nhật ký thay đổi vào file CSV ở luồng nền (các thay đổi đã được ghi an toàn vào nhật ký)"""
+        if not len(self.journal):
+            messagebox.showinfo("Thông báo", "Không có thay đổi nào cần lưu.")
+            return
+        if self._save_future is not None and not self._save_future.done():
+            messagebox.showinfo("Thông báo", "Đang lưu dữ liệu, vui lòng chờ...")
+            return
+        snapshot, seq = self.df, self.journal.seq
+        self._save_future = self.executor.submit(self.journal.compact, snapshot, 'df_weather.csv', seq)
 
-        def submit():
+        def on_done(fut):
             try:
-                date_str = date_var.get()
-                if not date_str:
-                    messagebox.showwarning("Cảnh báo", "Vui lòng chọn ngày!")
-                    return
-
-                confirm = messagebox.askyesno("Xác nhận",
-                                              f"Bạn có chắc muốn xóa dữ liệu ngày {date_str}?")
-                if confirm:
-                    self.df = delete_record(self.df, {'Date': date_str})
-                    self.reload_data()
-                    messagebox.showinfo("Thành công", f"Đã xóa dữ liệu ngày {date_str}!")
-                    dialog.destroy()
+                result = fut.result()
+                messagebox.showinfo("Thành công", f"Đã lưu {result['rows']} bản ghi vào file df_weather.csv!")
             except Exception as e:
-                messagebox.showerror("Lỗi", f"Không thể xóa: {e}")
+                messagebox.showerror("Lỗi", f"Không thể lưu file (các thay đổi vẫn còn trong nhật ký): {e}")
 
-        tk.Button(dialog, text="✅ Xóa", command=submit, bg='#c0392b', fg='white',
-                  font=('Arial', 10, 'bold'), padx=20, pady=5).pack(pady=15)
+        self._poll_future(self._save_future, None, on_done)
 
-    def save_data_to_file(self):
-        """Lưu dữ liệu vào file CSV"""
-        try:
-            save_data(self.df, 'df_weather.csv')
-            messagebox.showinfo("Thành công", "Đã lưu dữ liệu vào file df_weather.csv!")
-        except Exception as e:
-            messagebox.showerror("Lỗi", f"Không thể lưu file: {e}")
+    def _show_cached_view(self, key):
+        """Hiển thị lại khung đã vẽ (nếu còn trong LRU) mà không vẽ lại"""
+        view = self.figures.get_view(key)
+        if view is None or not view.winfo_exists():
+            return False
+        view.pack(fill='both', expand=True)
+        return True
 
     def show_month_stats(self):
         """Hiển thị thống kê tháng: biểu đồ nhiệt độ và nhiệt độ trung bình"""
+        with tracer.action('Thống kê tháng'):
+            self._show_month_stats()
+        self._update_timing()
+
+    def _show_month_stats(self):
+        """Phần thân của show_month_stats (đo như một thao tác)"""
+        from visualization import WeatherVisualizer
+
         self.clear_display()
 
         month_str = self.month_var.get()
         month = int(month_str.split()[1])
         year = int(self.year_var.get())
 
-        df_month = self.df[(self.df['date'].dt.month == month) &
-                           (self.df['date'].dt.year == year)].copy()
+        with span('gui.filter'):
+            df_month = self.store.index().month(year, month)
 
         if df_month.empty:
             messagebox.showwarning("Không có dữ liệu",
                                    f"Không có dữ liệu cho {month_str}/{year}")
             return
 
+        # Khung đã vẽ gần đây cho đúng tháng và phiên bản dữ liệu này thì hiển thị lại ngay
+        key = ('month', year, month, self.store.version)
+        if self._show_cached_view(key):
+            return
+        view = tk.Frame(self.display_frame, bg='white')
+        view.pack(fill='both', expand=True)
+        self.figures.put_view(key, view, on_evict=lambda w: w.destroy())
+
         # Chart frame
-        chart_frame = tk.Frame(self.display_frame, bg='white')
+        chart_frame = tk.Frame(view, bg='white')
         chart_frame.pack(side='left', fill='both', expand=True, padx=5)
 
-        vis = WeatherVisualizer(df_month)
+        vis = WeatherVisualizer(df_month, self.figures)
         fig = vis.plot_temp_trend()
         if fig:
-            canvas = FigureCanvasTkAgg(fig, chart_frame)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill='both', expand=True)
+            canvas = self._embed_figure(fig, chart_frame)
             self.canvas_widget = canvas
 
         # Info frame
-        info_frame = tk.Frame(self.display_frame, bg='#ecf0f1', width=300)
-        info_frame.pack(side='right', fill='y', padx=5)
-        info_frame.pack_propagate(False)
+        with span('tk.widgets'):
+            info_frame = tk.Frame(view, bg='#ecf0f1', width=300)
+            info_frame.pack(side='right', fill='y', padx=5)
+            info_frame.pack_propagate(False)
+
+            tk.Label(info_frame, text=f"📊 Thông tin {month_str}/{year}",
+                     font=('Arial', 12, 'bold'), bg='#ecf0f1').pack(pady=10)
+
+            # Average temp
+            if 'day_avgtemp_c' in self.cube.columns:
+                avg_temp = self.cube.mean('day_avgtemp_c', year=year, month=month)
+                temp_label = tk.Label(info_frame,
+                                      text=f"🌡️ Nhiệt độ TB: {avg_temp:.1f}°C",
+                                      font=('Arial', 11), bg='#ecf0f1')
+                temp_label.pack(pady=5, padx=10, anchor='w')
 
-        tk.Label(info_frame, text=f"📊 Thông tin {month_str}/{year}",
-                 font=('Arial', 12, 'bold'), bg='#ecf0f1').pack(pady=10)
+    def show_year_stats(self):
+        """Hiển thị thống kê năm: 4 tab với biểu đồ nhiệt độ theo tháng, so sánh vùng, tương quan yếu tố, đợt nắng nóng và ngày mưa lớn.
 
-        # Average temp
-        if 'day_avgtemp_c' in df_month.columns:
-            avg_temp = df_month['day_avgtemp_c'].mean()
-            temp_label = tk.Label(info_frame,
-                                  text=f"🌡️ Nhiệt độ TB: {avg_temp:.1f}°C",
-                                  font=('Arial', 11), bg='#ecf0f1')
-            temp_label.pack(pady=5, padx=10, anchor='w')
+        Phần tính toán chạy ở luồng nền, kết quả được đưa về luồng Tk qua root.after;
+        mỗi tab chỉ được vẽ lần đầu tiên nó được chọn.
+        """
+        with tracer.action('Thống kê năm'):
+            self._show_year_stats()
+        self._update_timing()
+
+    def _show_year_stats(self):
+        """Phần thân của show_year_stats (phần chạy trên luồng Tk)"""
+        import pandas as pd
+        from analysis import HEAVY_RAIN_WINDOWS
 
-    def show_year_stats(self):
-        """Hiển thị thống kê năm: 4 tab với biểu đồ nhiệt độ theo tháng, so sánh vùng, tương quan yếu tố, đợt nắng nóng và ngày mưa lớn"""
         self.clear_display()
+        job = self._year_job
 
         year = int(self.year_var.get())
-        df_year = self.df[self.df['date'].dt.year == year].copy()
+        with span('gui.filter'):
+            df_year = self.store.index().year(year)
 
         if df_year.empty:
             messagebox.showwarning("Không có dữ liệu", f"Không có dữ liệu cho năm {year}")
             return
 
-        notebook = ttk.Notebook(self.display_frame)
+        key = ('year', year, None, self.store.version)
+        if self._show_cached_view(key):
+            return
+        view = tk.Frame(self.display_frame, bg='white')
+        view.pack(fill='both', expand=True)
+
+        progress_frame = tk.Frame(view, bg='white')
+        progress_frame.pack(fill='both', expand=True)
+        tk.Label(progress_frame, text=f"⏳ Đang tính toán thống kê năm {year}...",
+                 font=('Arial', 11), bg='white').pack(pady=(80, 10))
+        progress = ttk.Progressbar(progress_frame, mode='indeterminate', length=300)
+        progress.pack()
+        progress.start(10)
+
+        # Mưa lớn cộng dồn nhiều ngày cần thêm các ngày cuối năm trước (cửa sổ bắt đầu từ tháng 12)
+        context_start = pd.Timestamp(year, 1, 1) - pd.Timedelta(days=max(HEAVY_RAIN_WINDOWS) - 1)
+        df_rain = self.store.index().date_range(context_start, pd.Timestamp(year, 12, 31))
+
+        future = self.executor.submit(self._compute_year_stats, year, df_year, df_rain)
+        self._pending_future = future
+
+        def on_done(fut):
+            progress.stop()
+            progress_frame.destroy()
+            if fut.exception() is not None:
+                tk.Label(view, text=f"Lỗi khi tính thống kê năm {year}:\n{fut.exception()}",
+                         font=('Arial', 10), bg='white', fg='red').pack(pady=20)
+                return
+            result = fut.result()
+            with span('tk.widgets'):
+                self._show_year_tabs(view, year, df_year, result)
+            self._update_timing()
+            # Chỉ lưu khung khi đã tính xong, để không dùng lại một khung đang dở dang
+            self.figures.put_view(key, view, on_evict=lambda w: w.destroy())
+
+        self._poll_future(future, job, on_done)
+
+    def _poll_future(self, future, job, callback, interval=30):
+        """Chờ future trên luồng Tk; bỏ qua kết quả nếu người dùng đã chuyển sang thao tác khác (job=None: luôn chờ)"""
+        if job is not None and job != self._year_job:
+            future.cancel()
+            return
+        if future.done():
+            callback(future)
+        else:
+            self.root.after(interval, self._poll_future, future, job, callback, interval)
+
+    def _compute_year_stats(self, year, df_year, df_rain=None):
+        """Tính dữ liệu cho các tab năm (chạy ở luồng nền, không đụng tới Tk/matplotlib).
+
+        df_rain: dữ liệu của năm kèm các ngày cuối năm trước để tìm mưa lớn cộng dồn; chỉ giữ các đợt
+        kết thúc trong năm.
+        """
+        import pandas as pd
+        from analysis import detect_heatwaves, detect_heavy_rain
+        from visualization import prepare_correlation_from_cube
+
+        with self._cube_lock:
+            monthly = self.cube.stats('day_avgtemp_c', by='month', year=year)['mean'] \
+                if 'day_avgtemp_c' in self.cube.columns else None
+            # Tương quan gộp từ các ô (địa điểm, tháng) của năm, không quét lại các dòng
+            with span('analysis.correlation_from_cube'):
+                corr = prepare_correlation_from_cube(self.covariance, year=year)
+            # Thống kê hộp theo vùng gộp từ phác thảo phân vị (lần đầu phải dựng phác thảo gộp của năm)
+            with span('analysis.region_box_stats'):
+                region_stats = self.quantiles.box_stats('day_avgtemp_c', by='region', year=year)
+        heavy_rain = detect_heavy_rain(df_year if df_rain is None else df_rain)
+        heavy_rain = heavy_rain[heavy_rain['end'] >= pd.Timestamp(year, 1, 1)].reset_index(drop=True)
+        return {
+            'monthly': monthly,
+            'corr': corr,
+            'region_stats': region_stats,
+            'heatwaves': detect_heatwaves(df_year),
+            'heavy_rain': heavy_rain,
+        }
+
+    def _show_year_tabs(self, view, year, df_year, result):
+        """Tạo notebook 4 tab; nội dung mỗi tab được vẽ khi tab được chọn lần đầu"""
+        from visualization import WeatherVisualizer
+
+        notebook = ttk.Notebook(view)
         notebook.pack(fill='both', expand=True)
+        vis = WeatherVisualizer(df_year, self.figures)
+
+        builders = [
+            ('Nhiệt độ theo Tháng', lambda tab: self._build_chart_tab(tab, vis.plot_monthly_stats(result['monthly']))),
+            ('So sánh Vùng miền',
+             lambda tab: self._build_chart_tab(tab, vis.plot_region_comparison(stats=result['region_stats']))),
+            ('Tương quan Yếu tố', lambda tab: self._build_chart_tab(tab, vis.plot_correlation(result['corr']))),
+            ('Nắng nóng & Mưa lớn',
+             lambda tab: self._build_events_tab(tab, year, result['heatwaves'], result['heavy_rain'])),
+        ]
+        tabs = {}
+        for text, build in builders:
+            tab = tk.Frame(notebook, bg='white')
+            notebook.add(tab, text=text)
+            tabs[str(tab)] = (text, build)
+
+        def on_tab_changed(event):
+            tab_id = notebook.select()
+            text, build = tabs.pop(tab_id, (None, None))
+            if build is None:
+                return
+            tab = notebook.nametowidget(tab_id)
+            placeholder = tk.Label(tab, text="⏳ Đang vẽ biểu đồ...", font=('Arial', 11), bg='white')
+            placeholder.pack(pady=80)
+
+            def render():
+                if not tab.winfo_exists():
+                    return
+                placeholder.destroy()
+                # Tab mở lần đầu cùng lúc tạo notebook được tính vào thao tác đang chạy, các tab sau là thao tác riêng
+                with tracer.action(f"Tab {text}") if event is not None else span('gui.tab'):
+                    build(tab)
+                self._update_timing()
+            # Để Tk vẽ dòng chờ trước khi bắt đầu vẽ biểu đồ
+            self.root.after(1, render)
+
+        notebook.bind('<<NotebookTabChanged>>', on_tab_changed)
+        on_tab_changed(None)
+
+    def _build_chart_tab(self, tab, fig):
+        """Nhúng một figure matplotlib vào tab"""
+        if fig:
+            self._embed_figure(fig, tab)
 
-        vis = WeatherVisualizer(df_year)
-
-        # Tab 1: Monthly stats
-        tab1 = tk.Frame(notebook, bg='white')
-        notebook.add(tab1, text='Nhiệt độ theo Tháng')
-        fig1 = vis.plot_monthly_stats()
-        if fig1:
-            canvas1 = FigureCanvasTkAgg(fig1, tab1)
-            canvas1.draw()
-            canvas1.get_tk_widget().pack(fill='both', expand=True)
-
-        # Tab 2: Region comparison
-        tab2 = tk.Frame(notebook, bg='white')
-        notebook.add(tab2, text='So sánh Vùng miền')
-        fig2 = vis.plot_region_comparison()
-        if fig2:
-            canvas2 = FigureCanvasTkAgg(fig2, tab2)
-            canvas2.draw()
-            canvas2.get_tk_widget().pack(fill='both', expand=True)
-
-        # Tab 3: Correlation
-        tab3 = tk.Frame(notebook, bg='white')
-        notebook.add(tab3, text='Tương quan Yếu tố')
-        fig3 = vis.plot_correlation()
-        if fig3:
-            canvas3 = FigureCanvasTkAgg(fig3, tab3)
-            canvas3.draw()
-            canvas3.get_tk_widget().pack(fill='both', expand=True)
-
-        # Tab 4: Heatwaves and Heavy Rain
-        tab4 = tk.Frame(notebook, bg='white')
-        notebook.add(tab4, text='Nắng nóng & Mưa lớn')
-
-        # Main container with scrollbar
-        main_container = tk.Frame(tab4, bg='white')
-        main_container.pack(fill='both', expand=True)
+    def _embed_figure(self, fig, parent):
+        """Tạo canvas Tk cho figure, vẽ và gắn vòng đời figure với widget"""
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
-        canvas = tk.Canvas(main_container, bg='white')
-        scrollbar = tk.Scrollbar(main_container, orient='vertical', command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas, bg='white')
+        with span('tk.widgets'):
+            canvas = FigureCanvasTkAgg(fig, parent)
+        with span('canvas.draw'):
+            canvas.draw()
+        with span('tk.widgets'):
+            canvas.get_tk_widget().pack(fill='both', expand=True)
+        self.figures.attach(fig, canvas.get_tk_widget())
+        return canvas
 
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
+    @tracer.traced('tk.widgets')
+    def _build_events_tab(self, tab, year, heatwaves, heavy_rain):
+        """Tab danh sách các đợt nắng nóng và ngày mưa lớn (bảng ảo hoá, lọc/sắp xếp trên mảng kết quả)"""
+        from analysis import HEAVY_RAIN_WINDOWS
+        from widgets import VirtualTable, format_date
 
-        canvas.create_window((0, 0), window=scrollable_frame, anchor='nw')
-        canvas.configure(yscrollcommand=scrollbar.set)
+        main_container = tk.Frame(tab, bg='white')
+        main_container.pack(fill='both', expand=True)
 
-        # Create two columns inside scrollable frame
-        left_frame = tk.Frame(scrollable_frame, bg='white')
+        # Thanh lọc theo địa điểm, áp dụng cho cả hai bảng
+        filter_bar = tk.Frame(main_container, bg='white')
+        filter_bar.pack(fill='x', padx=10, pady=(10, 0))
+        tk.Label(filter_bar, text="🔎 Lọc địa điểm:", bg='white', font=('Arial', 10)).pack(side='left')
+        filter_var = tk.StringVar()
+        tk.Entry(filter_bar, textvariable=filter_var, width=30).pack(side='left', padx=5)
+        tk.Label(filter_bar, text="(bấm tiêu đề cột để sắp xếp)", bg='white', fg='gray',
+                 font=('Arial', 9)).pack(side='left', padx=10)
+
+        # Create two columns
+        left_frame = tk.Frame(main_container, bg='white')
         left_frame.pack(side='left', fill='both', expand=True, padx=10, pady=10)
 
-        right_frame = tk.Frame(scrollable_frame, bg='white')
+        right_frame = tk.Frame(main_container, bg='white')
         right_frame.pack(side='left', fill='both', expand=True, padx=10, pady=10)
 
+        tables = []
+
         # Left: Heatwaves
         tk.Label(left_frame, text=f"🔥 CÁC ĐỢT NẮNG NÓNG NĂM {year}",
                  font=('Arial', 14, 'bold'), bg='white', fg='#e74c3c').pack(pady=10)
 
-        try:
-            heatwaves = detect_heatwaves(df_year)
-
-            if heatwaves and len(heatwaves) > 0:
-                for i, (start, end, length) in enumerate(heatwaves, 1):
-                    frame = tk.Frame(left_frame, bg='#ffe6e6', relief='solid', borderwidth=1)
-                    frame.pack(fill='x', padx=5, pady=5)
-
-                    tk.Label(frame, text=f"Đợt {i}:", font=('Arial', 10, 'bold'),
-                             bg='#ffe6e6', fg='#e74c3c').pack(anchor='w', padx=10, pady=5)
-                    tk.Label(frame, text=f"Từ: {start.strftime('%d/%m/%Y')}",
-                             font=('Arial', 9), bg='#ffe6e6').pack(anchor='w', padx=20)
-                    tk.Label(frame, text=f"Đến: {end.strftime('%d/%m/%Y')}",
-                             font=('Arial', 9), bg='#ffe6e6').pack(anchor='w', padx=20)
-                    tk.Label(frame, text=f"Kéo dài: {length} ngày",
-                             font=('Arial', 9, 'bold'), bg='#ffe6e6', fg='#c0392b').pack(anchor='w', padx=20,
-                                                                                         pady=(0, 5))
-            else:
-                tk.Label(left_frame, text="Không có đợt nắng nóng nào trong năm\n(Ngưỡng: >= 30°C, tối thiểu 3 ngày)",
-                         font=('Arial', 10), bg='white', fg='gray', justify='center').pack(pady=20)
-        except Exception as e:
-            tk.Label(left_frame, text=f"Lỗi khi phát hiện nắng nóng:\n{str(e)}",
-                     font=('Arial', 9), bg='white', fg='red', justify='center').pack(pady=20)
+        if not heatwaves.empty:
+            table = VirtualTable(left_frame, [
+                ('location_name', 'Địa điểm', 140, None),
+                ('start', 'Từ', 90, format_date),
+                ('end', 'Đến', 90, format_date),
+                ('length', 'Số ngày', 70, None),
+                ('peak', 'Đỉnh (°C)', 80, lambda v: f"{v:.1f}"),
+                ('mean', 'TB (°C)', 80, lambda v: f"{v:.1f}"),
+            ], bg='white')
+            table.set_data(heatwaves)
+            table.pack(fill='both', expand=True)
+            tables.append(table)
+        else:
+            tk.Label(left_frame, text="Không có đợt nắng nóng nào trong năm\n(Ngưỡng: >= 30°C, tối thiểu 3 ngày)",
+                     font=('Arial', 10), bg='white', fg='gray', justify='center').pack(pady=20)
 
         # Right: Heavy Rain
-        tk.Label(right_frame, text=f"🌧️ CÁC NGÀY MƯA LỚN NĂM {year}",
+        tk.Label(right_frame, text=f"🌧️ CÁC ĐỢT MƯA LỚN NĂM {year}",
                  font=('Arial', 14, 'bold'), bg='white', fg='#3498db').pack(pady=10)
 
-        try:
-            heavy_rain = detect_heavy_rain(df_year)
-
-            if not heavy_rain.empty:
-                for idx, row in heavy_rain.iterrows():
-                    frame = tk.Frame(right_frame, bg='#e6f2ff', relief='solid', borderwidth=1)
-                    frame.pack(fill='x', padx=5, pady=5)
-
-                    tk.Label(frame, text=f"📅 {row['Date'].strftime('%d/%m/%Y')}",
-                             font=('Arial', 10, 'bold'), bg='#e6f2ff', fg='#2980b9').pack(anchor='w', padx=10, pady=5)
-                    tk.Label(frame, text=f"Lượng mưa: {row['TotalPrecipitation']:.1f} mm",
-                             font=('Arial', 9, 'bold'), bg='#e6f2ff', fg='#3498db').pack(anchor='w', padx=20,
-                                                                                         pady=(0, 5))
-            else:
-                tk.Label(right_frame, text="Không có ngày mưa lớn nào trong năm\n(Ngưỡng: >= 100mm/ngày)",
-                         font=('Arial', 10), bg='white', fg='gray', justify='center').pack(pady=20)
-        except Exception as e:
-            tk.Label(right_frame, text=f"Lỗi khi phát hiện mưa lớn:\n{str(e)}",
-                     font=('Arial', 9), bg='white', fg='red', justify='center').pack(pady=20)
-
-        canvas.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
\ No newline at end of file
+        if not heavy_rain.empty:
+            table = VirtualTable(right_frame, [
+                ('location_name', 'Địa điểm', 130, None),
+                ('window', 'Cộng dồn', 70, lambda v: f"{v} ngày"),
+                ('start', 'Từ', 90, format_date),
+                ('end', 'Đến', 90, format_date),
+                ('peak', 'Đỉnh (mm)', 80, lambda v: f"{v:.1f}"),
+                ('max_daily', 'Ngày lớn nhất (mm)', 110, lambda v: f"{v:.1f}"),
+            ], bg='white')
+            table.set_data(heavy_rain)
+            table.pack(fill='both', expand=True)
+            tables.append(table)
+        else:
+            thresholds = ", ".join(f"{w} ngày >= {t}mm" for w, t in HEAVY_RAIN_WINDOWS.items())
+            tk.Label(right_frame, text=f"Không có đợt mưa lớn nào trong năm\n(Ngưỡng: {thresholds})",
+                     font=('Arial', 10), bg='white', fg='gray', justify='center').pack(pady=20)
+
+        filter_var.trace_add('write', lambda *args: [t.filter_text('location_name', filter_var.get().strip())
+                                                     for t in tables])
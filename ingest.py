@@ -0,0 +1,309 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from clean_data import DEFAULT_PIPELINE, cleaning_fingerprint, normalize_column_names
+from instrumentation import span, traced
+from journal import Journal, journal_path_for
+from load_data import WEATHER_COLUMNS, apply_schema, file_fingerprint, read_cache, write_cache
+
+# Phiên bản định dạng manifest, tăng lên khi đổi cách ghi để manifest cũ tự bị bỏ qua
+MANIFEST_VERSION = 2
+# Các cột suy ra được từ cột date: file nguồn thiếu thì tự tính lại thay vì báo lỗi
+DERIVED_COLUMNS = ['month', 'year']
+REPORT_COLUMNS = ['file', 'status', 'rows', 'seconds', 'error']
+
+
+# Đường dẫn manifest (dấu vân tay các file đã nạp) và mảng cho biết mỗi dòng của output đến từ file nào
+def manifest_path_for(output):
+    return f"{output}.manifest.json"
+
+
+def sources_path_for(output):
+    return f"{output}.sources.npy"
+
+
+# Danh sách file CSV từ một thư mục (mọi *.csv, kể cả thư mục con) hoặc một mẫu glob, đã sắp xếp
+def find_weather_files(source):
+    if os.path.isdir(source):
+        pattern = os.path.join(source, '**', '*.csv')
+    else:
+        pattern = source
+    return sorted(os.path.abspath(p) for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+
+
+# Đọc dòng tiêu đề bằng csv (nhanh hơn nhiều so với pd.read_csv(nrows=0) khi có hàng nghìn file nhỏ)
+def read_header(path):
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        return next(csv.reader(f), [])
+
+
+# So tiêu đề (đã chuẩn hoá) với lược đồ 36 cột; trả về danh sách lỗi (rỗng nếu hợp lệ)
+def check_header(columns):
+    columns = list(columns)
+    problems = []
+    duplicated = sorted(set(c for c in columns if columns.count(c) > 1))
+    if duplicated:
+        problems.append(f"cột bị trùng: {', '.join(duplicated)}")
+    missing = [c for c in WEATHER_COLUMNS if c not in columns and c not in DERIVED_COLUMNS]
+    if missing:
+        problems.append(f"thiếu {len(missing)} cột: {', '.join(missing[:5])}{', ...' if len(missing) > 5 else ''}")
+    extra = [c for c in columns if c not in WEATHER_COLUMNS]
+    if extra:
+        problems.append(f"cột lạ: {', '.join(extra)}")
+    return problems
+
+
+# Đọc và kiểm tra một file (chạy trong tiến trình con). known_sha1: mã băm lần nạp trước; nội dung
+# không đổi thì trả về trạng thái 'unchanged' mà không phân tích lại
+def parse_weather_file(path, known_sha1=None):
+    t0 = time.perf_counter()
+    result = {'file': path, 'status': 'failed', 'rows': 0, 'error': None, 'frame': None, 'source': None}
+    try:
+        result['source'] = source = file_fingerprint(path)
+        if known_sha1 is not None and source['sha1'] == known_sha1:
+            result['status'] = 'unchanged'
+            return result
+
+        columns = normalize_column_names(read_header(path))
+        problems = check_header(columns)
+        if problems:
+            raise ValueError("; ".join(problems))
+        df = pd.read_csv(path, header=0, names=columns)
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        if df['date'].isna().any():
+            raise ValueError(f"{int(df['date'].isna().sum())} dòng có ngày không hợp lệ")
+        if 'month' not in df.columns:
+            df['month'] = df['date'].dt.month
+        if 'year' not in df.columns:
+            df['year'] = df['date'].dt.year
+        result.update(status='ok', rows=len(df), frame=df[WEATHER_COLUMNS])
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        result['seconds'] = time.perf_counter() - t0
+    return result
+
+
+def _parse_task(task):
+    return parse_weather_file(*task)
+
+
+# Phân tích các file, song song trên workers tiến trình (1: chạy ngay trong tiến trình này)
+def parse_files(tasks, workers=None):
+    workers = min(workers or os.cpu_count() or 1, max(len(tasks), 1))
+    if workers == 1:
+        return [parse_weather_file(*task) for task in tasks]
+    # Nhiều file nhỏ: gom thành lô để giảm chi phí gửi nhận giữa các tiến trình
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_parse_task, tasks, chunksize=chunksize))
+
+
+# Ghép các bảng thành một bảng có kiểu dữ liệu cố định, sắp xếp một lần theo (địa điểm, ngày).
+# sources: mảng mã file nguồn của từng bảng (cùng độ dài), được sắp xếp theo cùng thứ tự các dòng
+def combine_frames(frames, sources=None):
+    if not frames:
+        return apply_schema(pd.DataFrame(columns=WEATHER_COLUMNS)), np.empty(0, dtype=np.int32)
+    df = apply_schema(pd.concat(frames, ignore_index=True))
+    # Bỏ các giá trị category chỉ còn ở những file đã bị loại (khi mọi bảng đều là category thì concat giữ nguyên)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.remove_unused_categories()
+    order = np.lexsort((df['date'].to_numpy(), df['location_name'].cat.codes.to_numpy()))
+    df = df.take(order).reset_index(drop=True)
+    if sources is None:
+        return df, None
+    return df, np.concatenate(sources).astype(np.int32)[order]
+
+
+def read_manifest(output):
+    try:
+        with open(manifest_path_for(output), encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {'version': MANIFEST_VERSION, 'files': {}, 'output': None}
+
+
+def write_manifest(output, manifest):
+    path = manifest_path_for(output)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+# Output có còn đúng là file do lần nạp gần nhất ghi ra không (kích thước/thời gian sửa, lệch thì so mã băm)
+def output_unchanged(output, manifest):
+    recorded = manifest.get('output')
+    if recorded is None or not os.path.exists(output):
+        return False
+    current = file_fingerprint(output, with_hash=False)
+    if current['size'] != recorded['size']:
+        return False
+    return current['mtime_ns'] == recorded['mtime_ns'] or file_fingerprint(output)['sha1'] == recorded['sha1']
+
+
+# Lý do không được ghi đè output (None nếu được): output đã bị sửa sau lần nạp gần nhất hoặc không do
+# ingest tạo ra (vd giao diện đã lưu thay đổi vào file), hoặc nhật ký của nó còn thao tác chưa gộp.
+# Nạp lại từ các file nguồn khi đó sẽ làm mất các thay đổi này
+def overwrite_problem(output, manifest):
+    if not os.path.exists(output):
+        return None
+    if not output_unchanged(output, manifest):
+        return f"{output} đã bị sửa sau lần nạp gần nhất (hoặc không do ingest tạo ra)"
+    pending = len(Journal(journal_path_for(output)))
+    if pending:
+        return f"{output} còn {pending} thao tác trong nhật ký chưa được lưu vào file"
+    return None
+
+
+# Các dòng của lần nạp trước còn dùng lại được: (bảng output, mã file nguồn của từng dòng), hoặc None
+# nếu output không còn đúng là file của lần nạp đó hoặc thiếu mảng nguồn
+def _previous_rows(output, manifest):
+    if not output_unchanged(output, manifest) or not os.path.exists(sources_path_for(output)):
+        return None
+    cached = read_cache(output)
+    if cached is None:
+        return None
+    sources = np.load(sources_path_for(output))
+    if len(sources) != len(cached[0]):
+        return None
+    return cached[0], sources
+
+
+# Nạp nhiều file CSV (một thư mục hoặc mẫu glob) song song bằng nhóm tiến trình và ghi thành một file output.
+#  - File lỗi (tiêu đề sai lược đồ, không đọc được, ngày không hợp lệ) được báo trong bảng kết quả, không làm dừng cả lượt.
+#  - File không đổi nội dung từ lần nạp trước (theo manifest: kích thước/thời gian sửa, lệch thì so mã băm) không bị
+#    phân tích lại: các dòng của nó được lấy lại từ cache của output. Không có file nào đổi/thêm/bớt thì giữ nguyên output.
+#  - Kết quả được làm sạch bằng DEFAULT_PIPELINE rồi ghi nguyên tử ra output (CSV) kèm cache và dấu vân tay làm sạch,
+#    để main.prepare_data không làm sạch và ghi lại file (làm lệch manifest) ở lần mở sau.
+#  - Output bị sửa sau lần nạp gần nhất hoặc còn nhật ký chưa gộp thì báo ValueError thay vì ghi đè (force=True: vẫn ghi).
+# Trả về (DataFrame hoặc None nếu output giữ nguyên, bảng kết quả từng file với các cột REPORT_COLUMNS)
+@traced('ingest.ingest_files')
+def ingest_files(source, output='df_weather.csv', workers=None, force=False):
+    output = os.path.abspath(output)
+    paths = [p for p in find_weather_files(source) if p != output]
+    manifest = read_manifest(output)
+    if not force:
+        problem = overwrite_problem(output, manifest)
+        if problem:
+            raise ValueError(f"{problem}; dùng force (--force) để nạp lại từ các file nguồn và bỏ các thay đổi đó")
+    previous = None if force else _previous_rows(output, manifest)
+    known = manifest['files'] if previous is not None else {}
+
+    results, tasks = [], []
+    with span('ingest.scan'):
+        for path in paths:
+            old = known.get(path)
+            st = os.stat(path)
+            if old and st.st_size == old['size'] and st.st_mtime_ns == old['mtime_ns']:
+                results.append({'file': path, 'status': 'unchanged', 'rows': old['rows'], 'seconds': 0.0,
+                                'error': None, 'frame': None, 'source': old})
+            else:
+                tasks.append((path, old['sha1'] if old else None))
+
+    with span('ingest.parse', files=len(tasks)):
+        results += parse_files(tasks, workers)
+    results.sort(key=lambda r: r['file'])
+
+    files = {}
+    for r in results:
+        if r['status'] == 'unchanged':
+            r['rows'] = known[r['file']]['rows']
+        if r['status'] != 'failed':
+            files[r['file']] = {'size': r['source']['size'], 'mtime_ns': r['source']['mtime_ns'],
+                                'sha1': r['source']['sha1'], 'rows': r['rows']}
+    report = pd.DataFrame([{k: r[k] for k in REPORT_COLUMNS} for r in results], columns=REPORT_COLUMNS)
+
+    # Không có file nào đổi, thêm hay bớt so với lần nạp trước: giữ nguyên output
+    if previous is not None and set(files) == set(known) and all(r['status'] != 'ok' for r in results):
+        # Chỉ cập nhật thời gian sửa của các file bị chạm vào mà nội dung không đổi
+        write_manifest(output, {**manifest, 'files': files})
+        return None, report
+
+    with span('ingest.combine'):
+        order = list(files)
+        index = {path: i for i, path in enumerate(order)}
+        frames, sources = [], []
+        if previous is not None:
+            # Giữ các dòng của file không đổi; mã file cũ được đổi sang vị trí trong danh sách mới
+            old_df, old_sources = previous
+            status = {r['file']: r['status'] for r in results}
+            remap = np.array([index[p] if status.get(p) == 'unchanged' else -1 for p in manifest['order']],
+                             dtype=np.int32)
+            codes = remap[old_sources]
+            keep = codes >= 0
+            frames.append(old_df[keep])
+            sources.append(codes[keep])
+        for r in results:
+            if r['status'] == 'ok':
+                frames.append(r['frame'])
+                sources.append(np.full(r['rows'], index[r['file']], dtype=np.int32))
+        df, row_sources = combine_frames(frames, sources)
+
+    with span('ingest.clean'):
+        # Bỏ dòng trùng ở đây (cùng mảng nguồn) để bước làm sạch không đổi số dòng
+        keep = ~df.duplicated().to_numpy()
+        if not keep.all():
+            df, row_sources = df[keep].reset_index(drop=True), row_sources[keep]
+        df = apply_schema(DEFAULT_PIPELINE.run(df, copy=False))
+
+    with span('ingest.write'):
+        tmp_path = output + '.tmp'
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, output)
+        fingerprint = file_fingerprint(output)
+        clean = cleaning_fingerprint(fingerprint['sha1'])
+        df.attrs.update(source_hash=fingerprint['sha1'], clean_fingerprint=clean)
+        write_cache(df, output, source=fingerprint, extra={'clean_fingerprint': clean})
+        np.save(sources_path_for(output), row_sources)
+        write_manifest(output, {'version': MANIFEST_VERSION, 'files': files, 'order': order, 'output': fingerprint})
+    return df, report
+
+
+# Dòng tóm tắt kết quả một lượt nạp, kèm lỗi của từng file hỏng
+def summarize_report(report):
+    counts = report['status'].value_counts()
+    text = (f"{len(report)} file: {counts.get('ok', 0)} nạp mới, {counts.get('unchanged', 0)} không đổi, "
+            f"{counts.get('failed', 0)} lỗi, {int(report['rows'].sum())} dòng")
+    failed = report[report['status'] == 'failed']
+    lines = [f"  {os.path.basename(row.file)}: {row.error}" for row in failed.itertuples()]
+    return "\n".join([text] + lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nạp song song nhiều file CSV (theo tỉnh/kỳ) thành một file dữ liệu")
+    parser.add_argument('source', help="thư mục chứa các file CSV hoặc mẫu glob (vd 'feeds/*/2025-*.csv')")
+    parser.add_argument('output', nargs='?', default='df_weather.csv', help="file CSV kết quả (mặc định df_weather.csv)")
+    parser.add_argument('--workers', type=int, help="số tiến trình (mặc định bằng số nhân CPU)")
+    parser.add_argument('--force', action='store_true',
+                        help="phân tích lại mọi file, bỏ qua manifest; ghi đè cả output đã bị sửa sau lần nạp trước")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    try:
+        df, report = ingest_files(args.source, args.output, args.workers, args.force)
+    except ValueError as e:
+        print(f"Không nạp: {e}")
+        sys.exit(1)
+    print(summarize_report(report))
+    if df is None:
+        print(f"Không có file nào thay đổi, giữ nguyên {args.output}")
+    else:
+        print(f"Đã ghi {len(df)} dòng vào {args.output} ({time.perf_counter() - t0:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+
+class _NullSpan:
+    """Span rỗng dùng khi tắt đo: không ghi gì, không tốn thời gian"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        tracer = self.tracer
+        stack = tracer._stack()
+        self.depth = len(stack)
+        stack.append(self.name)
+        self.action = tracer._action
+        self.mem = tracemalloc.get_traced_memory()[0] if tracer.trace_memory else None
+        self.cpu = time.thread_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        cpu = time.thread_time() - self.cpu
+        alloc = tracemalloc.get_traced_memory()[0] - self.mem if self.mem is not None else None
+        self.tracer._stack().pop()
+        self.tracer._record({
+            'name': self.name,
+            'start': self.start,
+            'wall': end - self.start,
+            'cpu': cpu,
+            'alloc': alloc,
+            'tid': threading.get_ident(),
+            'thread': threading.current_thread().name,
+            'depth': self.depth,
+            'action': self.action,
+            'args': self.args,
+        })
+        return False
+
+
+class Tracer:
+    """Đo thời gian các đoạn mã nóng (nạp, làm sạch, phân tích, vẽ, canvas.draw, tạo widget Tk).
+
+    Khi tắt (mặc định), span() trả về một đối tượng rỗng dùng chung và hàm bọc bởi traced()
+    chỉ kiểm tra một cờ rồi gọi thẳng hàm gốc, nên gần như không tốn gì. Khi bật, mỗi span ghi
+    thời gian thực, thời gian CPU của luồng và lượng bộ nhớ tăng thêm (tracemalloc, chênh lệch
+    bộ nhớ đang cấp phát lúc vào/ra span). action() đánh dấu một thao tác của người dùng: mọi
+    span bắt đầu sau đó (kể cả ở luồng nền) được tính cho thao tác này cho tới thao tác kế tiếp.
+    """
+
+    def __init__(self, max_spans=100_000):
+        self.enabled = False
+        self.trace_memory = False
+        self.max_spans = max_spans
+        self.spans = []
+        self.actions = {}
+        self._action = None
+        self._action_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = time.perf_counter()
+        self._started_tracemalloc = False
+
+    def enable(self, trace_memory=True):
+        """Bật đo (trace_memory: đo cả bộ nhớ, chậm hơn đáng kể vì phải bật tracemalloc)"""
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self.trace_memory = trace_memory and tracemalloc.is_tracing()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        self.trace_memory = False
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def reset(self):
+        """Xoá các span và thao tác đã ghi"""
+        with self._lock:
+            self.spans = []
+            self.actions = {}
+            self._action = None
+            self._origin = time.perf_counter()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, span):
+        with self._lock:
+            if len(self.spans) >= self.max_spans:
+                # Giữ bộ nhớ có giới hạn khi bật đo lâu: bỏ nửa cũ nhất
+                del self.spans[:self.max_spans // 2]
+            self.spans.append(span)
+
+    def span(self, name, **args):
+        """Context manager đo một đoạn mã: with tracer.span('canvas.draw'): ..."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def action(self, name, **args):
+        """Bắt đầu một thao tác người dùng mới và trả về span bao quanh phần chạy trên luồng hiện tại"""
+        if not self.enabled:
+            return _NULL_SPAN
+        with self._lock:
+            self._action = next(self._action_ids)
+            self.actions[self._action] = name
+        return _Span(self, name, args)
+
+    def traced(self, name=None):
+        """Decorator đo mỗi lần gọi hàm (tên span mặc định là module.tên_hàm)"""
+        def decorate(func):
+            label = name or f"{func.__module__}.{func.__name__}"
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, label, {}):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def last_action(self):
+        """(tên, danh sách span) của thao tác gần nhất; (None, []) nếu chưa có"""
+        with self._lock:
+            action = self._action
+            spans = [s for s in self.spans if s['action'] == action] if action is not None else []
+        return self.actions.get(action), spans
+
+    def summary(self, spans=None):
+        """Bảng tổng hợp theo tên span: số lần, tổng/trung bình/lớn nhất (ms), CPU (ms), bộ nhớ (MB)"""
+        # pandas nạp tại đây chứ không ở đầu mô-đun: mô-đun này được nạp từ rất sớm khi khởi động
+        import pandas as pd
+        spans = self.spans if spans is None else spans
+        if not spans:
+            return pd.DataFrame(columns=['calls', 'wall_ms', 'mean_ms', 'max_ms', 'cpu_ms', 'alloc_mb'])
+        df = pd.DataFrame(spans)
+        df['wall_ms'] = df['wall'] * 1000
+        df['cpu_ms'] = df['cpu'] * 1000
+        df['alloc_mb'] = pd.to_numeric(df['alloc'], errors='coerce') / 2**20
+        summary = df.groupby('name').agg(
+            calls=('wall_ms', 'size'), wall_ms=('wall_ms', 'sum'), mean_ms=('wall_ms', 'mean'),
+            max_ms=('wall_ms', 'max'), cpu_ms=('cpu_ms', 'sum'), alloc_mb=('alloc_mb', 'sum'))
+        return summary.sort_values('wall_ms', ascending=False)
+
+    def action_breakdown(self, max_items=6):
+        """Một dòng mô tả thao tác gần nhất: tổng thời gian và các span con tốn thời gian nhất"""
+        name, spans = self.last_action()
+        if name is None:
+            return "Chưa có thao tác nào được đo"
+        # Tính từ span đầu tiên tới span kết thúc muộn nhất (gồm cả phần chạy ở luồng nền)
+        total = 0
+        if spans:
+            total = (max(s['start'] + s['wall'] for s in spans) - min(s['start'] for s in spans)) * 1000
+        # Thời gian của mỗi span con (không tính span bao ngoài của chính thao tác)
+        parts = self.summary([s for s in spans if s['name'] != name])
+        items = [f"{part} {row.wall_ms:.0f}ms" for part, row in parts.head(max_items).iterrows()]
+        text = f"{name}: {total:.0f}ms"
+        return f"{text}  |  " + " · ".join(items) if items else text
+
+    def chrome_trace(self):
+        """Sự kiện dạng Chrome trace (mở bằng chrome://tracing hoặc Perfetto)"""
+        pid = os.getpid()
+        events = []
+        threads = {}
+        for s in list(self.spans):
+            threads[s['tid']] = s['thread']
+            args = dict(s['args'])
+            args['cpu_ms'] = round(s['cpu'] * 1000, 3)
+            if s['alloc'] is not None:
+                args['alloc_bytes'] = s['alloc']
+            if s['action'] is not None:
+                args['action'] = self.actions.get(s['action'])
+            events.append({
+                'name': s['name'], 'cat': s['name'].split('.')[0], 'ph': 'X', 'pid': pid, 'tid': s['tid'],
+                'ts': (s['start'] - self._origin) * 1e6, 'dur': s['wall'] * 1e6, 'args': args,
+            })
+        for tid, thread in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f, ensure_ascii=False, default=str)
+        return path
+
+
+# Bộ đo dùng chung cho cả chương trình
+tracer = Tracer()
+span = tracer.span
+traced = tracer.traced
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from clean_data import cleaning_fingerprint
+from load_data import expand_frame, file_fingerprint, write_cache
+
+# Phiên bản định dạng file nhật ký
+JOURNAL_VERSION = 1
+
+
+# Đường dẫn file nhật ký nằm cạnh file dữ liệu
+def journal_path_for(data_path):
+    return f"{data_path}.journal"
+
+
+# Chuyển giá trị (Timestamp, số numpy...) sang dạng JSON được
+def _to_json(value):
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Không ghi được giá trị kiểu {type(value).__name__} vào nhật ký")
+
+
+# Ghi file rồi đổi tên nguyên tử: file cũ chỉ bị thay khi file mới đã ghi xong xuống đĩa
+def _replace_atomic(path, write):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Journal:
+    """Nhật ký ghi trước (write-ahead) cho các thao tác thêm/sửa/xóa.
+
+    Mỗi thao tác được nối vào cuối file (một dòng JSON, fsync) ngay khi thực hiện, nên lưu
+    thay đổi chỉ tốn tỉ lệ với kích thước thay đổi. Dòng đầu file ghi mã băm của file dữ liệu
+    gốc mà nhật ký áp lên. compact() ghi bảng hiện hành ra file tạm rồi đổi tên nguyên tử thành
+    file dữ liệu, sau đó viết lại nhật ký chỉ còn các thao tác mới hơn; nếu chương trình dừng
+    giữa chừng thì dòng đánh dấu 'compact' cho biết thao tác nào đã nằm trong file dữ liệu.
+    """
+
+    def __init__(self, path, base_hash=None):
+        self.path = path
+        self.base_hash = base_hash
+        self.seq = 0
+        self._entries = 0
+        self._lock = threading.Lock()
+        header, entries = self._read()
+        if header is not None:
+            self.seq = header.get('seq', 0)
+        for entry in entries:
+            self.seq = max(self.seq, entry.get('seq', 0))
+            self._entries += entry['op'] != 'compact'
+
+    def __len__(self):
+        """Số thao tác đang nằm trong nhật ký (chưa gộp vào file dữ liệu)"""
+        return self._entries
+
+    def _read(self):
+        """Đọc (dòng đầu, các dòng thao tác); dòng cuối ghi dở khi chương trình dừng đột ngột bị bỏ qua"""
+        if not os.path.exists(self.path):
+            return None, []
+        header, entries = None, []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    break
+                if header is None and 'journal' in item:
+                    header = item
+                else:
+                    entries.append(item)
+        return header, entries
+
+    def _header_line(self, base_hash, seq):
+        return json.dumps({'journal': JOURNAL_VERSION, 'base': base_hash, 'seq': seq}) + '\n'
+
+    def _write_line(self, item):
+        with open(self.path, 'a', encoding='utf-8', newline='') as f:
+            if f.tell() == 0:
+                f.write(self._header_line(self.base_hash, self.seq - 1))
+            f.write(json.dumps(item, ensure_ascii=False, default=_to_json) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append(self, kind, *args):
+        """Ghi một thao tác ('add', record) / ('update', identifier, updates) / ('delete', identifier)"""
+        with self._lock:
+            self.seq += 1
+            self._write_line({'seq': self.seq, 'op': kind, 'args': list(args)})
+            self._entries += 1
+        return self.seq
+
+    def pending(self, base_hash=None):
+        """Các thao tác cần áp lại lên file dữ liệu có mã băm base_hash"""
+        header, entries = self._read()
+        ops = [e for e in entries if e['op'] != 'compact']
+        if header is None or base_hash is None or header.get('base') == base_hash:
+            return ops
+        # File dữ liệu đã được gộp nhưng nhật ký chưa kịp viết lại: bỏ các thao tác đã nằm trong file
+        for marker in reversed(entries):
+            if marker['op'] == 'compact' and marker.get('base') == base_hash:
+                return [e for e in ops if e['seq'] > marker['seq']]
+        return ops
+
+    def replay(self, store, base_hash=None):
+        """Áp lại nhật ký lên kho dữ liệu; trả về (số thao tác áp được, số thao tác bỏ qua)"""
+        applied, skipped = 0, 0
+        for entry in self.pending(base_hash):
+            try:
+                getattr(store, entry['op'])(*entry['args'])
+                applied += 1
+            except (ValueError, KeyError, TypeError, AttributeError):
+                # Ví dụ thêm lại bản ghi đã có sẵn trong file dữ liệu
+                skipped += 1
+        return applied, skipped
+
+    def compact(self, df, data_path, upto_seq=None):
+        """Gộp nhật ký vào file dữ liệu (chạy ở luồng nền).
+
+        df là ảnh chụp bảng hiện hành tại thao tác upto_seq; các thao tác mới hơn (ghi trong
+        lúc đang gộp) được giữ lại trong nhật ký.
+        """
+        upto_seq = self.seq if upto_seq is None else upto_seq
+        full = expand_frame(df)
+        tmp_path = data_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            full.to_csv(f, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+        h = hashlib.sha1()
+        with open(tmp_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        new_hash = h.hexdigest()
+
+        with self._lock:
+            self._write_line({'seq': upto_seq, 'op': 'compact', 'base': new_hash})
+        os.replace(tmp_path, data_path)
+
+        # Bảng đã làm sạch trước khi sửa thì vẫn được đánh dấu là sạch để lần sau không làm sạch lại
+        source = file_fingerprint(data_path, with_hash=False)
+        source['sha1'] = new_hash
+        extra = {'clean_fingerprint': cleaning_fingerprint(new_hash)} if df.attrs.get('clean_fingerprint') else None
+        try:
+            write_cache(df, data_path, source=source, extra=extra)
+        except OSError as e:
+            print(f"Không thể ghi cache: {e}")
+
+        with self._lock:
+            _, entries = self._read()
+            rest = [e for e in entries if e['op'] != 'compact' and e['seq'] > upto_seq]
+
+            def write(f):
+                f.write(self._header_line(new_hash, upto_seq))
+                for e in rest:
+                    f.write(json.dumps(e, ensure_ascii=False, default=_to_json) + '\n')
+            _replace_atomic(self.path, write)
+            self.base_hash = new_hash
+            self._entries = len(rest)
+        return {'rows': len(full), 'kept': len(rest), 'base': new_hash}
@@ -1,8 +1,327 @@
+import hashlib
+import json
+import os
+
+import numpy as np
 import pandas as pd
 
+from instrumentation import traced
+
+# Phiên bản định dạng cache, tăng lên khi thay đổi cách lưu để cache cũ tự bị bỏ qua
+# (2: bảng dạng gọn giữ nguyên các cột đơn vị Anh của file thay vì tính lại)
+CACHE_VERSION = 2
+
+# Lược đồ 36 cột của file dữ liệu thời tiết (tên cột đã chuẩn hoá, đúng thứ tự trong file)
+WEATHER_COLUMNS = [
+    'location_name', 'location_region', 'location_terrain', 'location_country', 'location_lat', 'location_lon',
+    'date', 'date_epoch', 'day_maxtemp_c', 'day_maxtemp_f', 'day_mintemp_c', 'day_mintemp_f', 'day_avgtemp_c',
+    'day_avgtemp_f', 'day_maxwind_mph', 'day_maxwind_kph', 'day_totalprecip_mm', 'day_totalprecip_in',
+    'day_totalsnow_cm', 'day_avgvis_km', 'day_avgvis_miles', 'day_avghumidity', 'day_daily_will_it_rain',
+    'day_daily_chance_of_rain', 'day_condition_text', 'day_condition_icon', 'day_condition_code', 'day_uv',
+    'astro_sunrise', 'astro_sunset', 'astro_moonrise', 'astro_moonset', 'astro_moon_phase',
+    'astro_moon_illumination', 'month', 'year',
+]
+
+# Kiểu dữ liệu cố định cho các cột đã biết
+CATEGORY_COLUMNS = ['location_name', 'location_region', 'day_condition_text']
+SMALL_INT_COLUMNS = {
+    'day_daily_will_it_rain': np.int8,
+    'day_daily_chance_of_rain': np.int8,
+    'day_avghumidity': np.int8,
+    'astro_moon_illumination': np.int8,
+    'month': np.int8,
+    'year': np.int16,
+}
+
+# Chế độ gọn: thêm các cột chuỗi lặp lại nhiều được chuyển sang category
+COMPACT_CATEGORY_COLUMNS = CATEGORY_COLUMNS + ['location_terrain', 'location_country',
+                                               'day_condition_icon', 'astro_moon_phase']
+# Giờ mặt trời/mặt trăng dạng "05:46 AM", lưu gọn thành số phút từ nửa đêm (int16, -1 = không có)
+ASTRO_TIME_COLUMNS = ['astro_sunrise', 'astro_sunset', 'astro_moonrise', 'astro_moonset']
+# Các cột đơn vị Anh suy ra được từ cột hệ mét: cột -> (cột nguồn, hàm đổi, số chữ số thập phân).
+# Giá trị trong file nguồn không khớp hoàn toàn với công thức đổi (vd tầm nhìn 5.0 miles bị tính lại thành 6.0),
+# nên chỉ tính các cột này khi file không có sẵn
+IMPERIAL_COLUMNS = {
+    'day_maxtemp_f': ('day_maxtemp_c', lambda c: c * 9 / 5 + 32, 1),
+    'day_mintemp_f': ('day_mintemp_c', lambda c: c * 9 / 5 + 32, 1),
+    'day_avgtemp_f': ('day_avgtemp_c', lambda c: c * 9 / 5 + 32, 1),
+    'day_maxwind_mph': ('day_maxwind_kph', lambda kph: kph / 1.609344, 1),
+    'day_totalprecip_in': ('day_totalprecip_mm', lambda mm: mm / 25.4, 2),
+    'day_avgvis_miles': ('day_avgvis_km', lambda km: km / 1.609344, 0),
+}
+
+
+# Đường dẫn file cache nằm cạnh file CSV
+def cache_path_for(file_path):
+    return f"{file_path}.cache.npz"
+
+
+# Tính dấu vân tay của file: kích thước, thời gian sửa và mã băm nội dung
+def file_fingerprint(file_path, with_hash=True):
+    st = os.stat(file_path)
+    fp = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    if with_hash:
+        h = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        fp['sha1'] = h.hexdigest()
+    return fp
+
+
+# Ép kiểu dữ liệu cho các cột đã biết (category, datetime, số nguyên nhỏ)
+def apply_schema(df):
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    if 'date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    for col, dtype in SMALL_INT_COLUMNS.items():
+        if col not in df.columns or not pd.api.types.is_numeric_dtype(df[col]):
+            continue
+        s = df[col]
+        if s.isna().any():
+            continue
+        info = np.iinfo(dtype)
+        if s.min() >= info.min and s.max() <= info.max and (s % 1 == 0).all():
+            df[col] = s.astype(dtype)
+    return df
+
+
+# Đổi giờ dạng "05:46 AM" thành số phút từ nửa đêm (-1 với "No moonrise" hoặc giá trị lỗi)
+def encode_times(values):
+    times = pd.to_datetime(pd.Series(values, dtype=object), format='%I:%M %p', errors='coerce')
+    minutes = times.dt.hour * 60 + times.dt.minute
+    return minutes.fillna(-1).to_numpy(dtype=np.int16)
+
+
+# Đổi số phút từ nửa đêm về lại dạng "05:46 AM"; -1 thành missing_text (vd "No moonrise")
+def decode_times(minutes, missing_text=None):
+    minutes = np.nan_to_num(np.asarray(minutes, dtype=float), nan=-1).astype(int)
+    hours, mins = np.divmod(np.maximum(minutes, 0), 60)
+    table = np.array([f"{(h - 1) % 12 + 1:02d}:{m:02d} {'AM' if h < 12 else 'PM'}"
+                      for h in range(24) for m in range(60)], dtype=object)
+    out = table[hours * 60 + mins]
+    out[minutes < 0] = missing_text if missing_text is not None else np.nan
+    return out
+
+
+# Đổi mảng float32 về float64 với số chữ số thập phân ít nhất vẫn cho lại đúng giá trị float32
+# (để 10.7 không thành 10.699999809265137 khi ghi CSV)
+def restore_float(values):
+    values = np.asarray(values, dtype=np.float32)
+    wide = values.astype(float)
+    for decimals in range(8):
+        rounded = np.round(wide, decimals)
+        if np.array_equal(rounded.astype(np.float32), values, equal_nan=True):
+            return rounded
+    return wide
+
+
+# Tính một cột đơn vị Anh (°F, mph, in, miles) từ cột hệ mét tương ứng
+def imperial(df, col):
+    source, convert, decimals = IMPERIAL_COLUMNS[col]
+    return convert(df[source].astype(float)).round(decimals)
+
+
+# Chuyển bảng sang dạng gọn: category cho chuỗi lặp lại, float32 và số nguyên nhỏ cho số đo,
+# giờ thiên văn thành số phút int16. expand_frame phải cho lại đúng các giá trị đã lưu (xem round_trip_mismatches)
+def compact_frame(df):
+    if df.attrs.get('compact'):
+        return df
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if col in ASTRO_TIME_COLUMNS and not pd.api.types.is_numeric_dtype(s):
+            out[col] = encode_times(s)
+        elif col in COMPACT_CATEGORY_COLUMNS and not isinstance(s.dtype, pd.CategoricalDtype):
+            out[col] = s.astype('category')
+        elif pd.api.types.is_float_dtype(s):
+            out[col] = s.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            out[col] = pd.to_numeric(s, downcast='integer')
+        else:
+            out[col] = s
+    compact = pd.DataFrame(out, index=df.index)
+    compact.attrs.update(df.attrs)
+    compact.attrs['compact'] = True
+    compact.attrs['full_columns'] = [str(c) for c in df.columns]
+    return compact
+
+
+# Khôi phục bảng đầy đủ từ dạng gọn (dùng khi ghi CSV): giờ dạng chữ, float64; các cột đơn vị Anh
+# chỉ được tính từ cột hệ mét khi bảng không có sẵn
+def expand_frame(df):
+    if not df.attrs.get('compact'):
+        return df
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if col in ASTRO_TIME_COLUMNS and pd.api.types.is_numeric_dtype(s):
+            out[col] = decode_times(s.to_numpy(), f"No {col.split('_')[1]}" if 'moon' in col else None)
+        elif s.dtype == np.float32:
+            out[col] = restore_float(s.to_numpy())
+        else:
+            out[col] = s
+    for col in IMPERIAL_COLUMNS:
+        if col not in out and IMPERIAL_COLUMNS[col][0] in df.columns:
+            out[col] = imperial(pd.DataFrame(out, index=df.index), col)
+    columns = [c for c in df.attrs.get('full_columns', []) if c in out]
+    columns += [c for c in out if c not in columns]
+    full = pd.DataFrame({c: out[c] for c in columns}, index=df.index)
+    full.attrs.update({k: v for k, v in df.attrs.items() if k not in ('compact', 'full_columns')})
+    return full
+
+
+# Số giá trị khác nhau theo từng cột giữa bảng gốc và expand_frame(compact) (chỉ các cột khác nhau).
+# Rỗng nghĩa là ghi dạng gọn ra CSV cho lại đúng dữ liệu đã đọc
+def round_trip_mismatches(df, compact=None):
+    full = expand_frame(compact_frame(df) if compact is None else compact)
+    mismatches = {}
+    for col in df.columns:
+        if col not in full.columns:
+            mismatches[col] = len(df)
+            continue
+        a, b = df[col], full[col]
+        if isinstance(a.dtype, pd.CategoricalDtype) or isinstance(b.dtype, pd.CategoricalDtype) \
+                or a.dtype == object or b.dtype == object or pd.api.types.is_string_dtype(a):
+            a, b = a.astype(object), b.astype(object)
+        same = (a.to_numpy() == b.to_numpy()) | (a.isna().to_numpy() & b.isna().to_numpy())
+        if not same.all():
+            mismatches[col] = int((~same).sum())
+    return mismatches
+
+
+# So sánh bộ nhớ theo từng cột trước và sau khi chuyển sang dạng gọn
+def memory_report(before, after):
+    b = before.memory_usage(deep=True, index=False)
+    a = after.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'kiểu trước': before.dtypes.astype(str),
+        'kiểu sau': after.dtypes.astype(str).reindex(before.columns).fillna('(tính khi cần)'),
+        'trước (KB)': b / 1024,
+        'sau (KB)': a.reindex(before.columns).fillna(0) / 1024,
+    })
+    report.loc['TỔNG'] = ['', '', b.sum() / 1024, a.sum() / 1024]
+    return report
+
+
+# Ghi DataFrame ra file cache dạng cột (.npz), mỗi cột là một mảng numpy
+def write_cache(df, file_path, source=None, extra=None):
+    if source is None:
+        source = file_fingerprint(file_path)
+    arrays = {}
+    columns = []
+    for i, col in enumerate(df.columns):
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            kind = 'category'
+            arrays[f"c{i}_codes"] = s.cat.codes.to_numpy()
+            arrays[f"c{i}_cats"] = np.asarray(s.cat.categories, dtype=str)
+        elif pd.api.types.is_datetime64_any_dtype(s):
+            kind = 'datetime'
+            arrays[f"c{i}"] = s.to_numpy()
+        elif pd.api.types.is_bool_dtype(s) or pd.api.types.is_numeric_dtype(s):
+            kind = 'numeric'
+            arrays[f"c{i}"] = s.to_numpy()
+        else:
+            # Cột chuỗi khác: lưu dạng mã + từ điển nhưng khôi phục lại thành chuỗi
+            kind = 'string'
+            cat = pd.Categorical(s)
+            arrays[f"c{i}_codes"] = cat.codes
+            arrays[f"c{i}_cats"] = np.asarray(cat.categories, dtype=str)
+        columns.append({'name': str(col), 'kind': kind})
+
+    # Dạng gọn cần biết thứ tự cột đầy đủ để khôi phục khi ghi lại CSV
+    attrs = {k: df.attrs[k] for k in ('compact', 'full_columns') if k in df.attrs}
+    attrs.update(extra or {})
+    meta = {'version': CACHE_VERSION, 'source': source, 'columns': columns, 'attrs': attrs}
+    arrays['__meta__'] = np.array(json.dumps(meta))
+
+    cache_path = cache_path_for(file_path)
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, cache_path)
+    return meta
+
+
+# Đọc file cache; trả về (df, meta) hoặc None nếu cache không khớp với file nguồn
+def read_cache(file_path):
+    cache_path = cache_path_for(file_path)
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with np.load(cache_path, allow_pickle=False) as npz:
+            meta = json.loads(str(npz['__meta__']))
+            if meta.get('version') != CACHE_VERSION:
+                return None
+
+            # So khớp nhanh theo kích thước và thời gian sửa, nếu lệch thì so mã băm
+            source = meta['source']
+            current = file_fingerprint(file_path, with_hash=False)
+            if current['size'] != source['size']:
+                return None
+            if current['mtime_ns'] != source['mtime_ns']:
+                current = file_fingerprint(file_path)
+                if current['sha1'] != source['sha1']:
+                    return None
+                meta['source'] = current
+                meta['touched'] = True
+
+            data = {}
+            for i, c in enumerate(meta['columns']):
+                if c['kind'] == 'category':
+                    data[c['name']] = pd.Categorical.from_codes(npz[f"c{i}_codes"], npz[f"c{i}_cats"])
+                elif c['kind'] == 'string':
+                    codes = npz[f"c{i}_codes"]
+                    values = np.asarray(npz[f"c{i}_cats"], dtype=object)[codes]
+                    values[codes < 0] = np.nan
+                    data[c['name']] = values
+                else:
+                    data[c['name']] = npz[f"c{i}"]
+        df = pd.DataFrame(data)
+        df.attrs.update(meta.get('attrs', {}))
+        df.attrs['source_hash'] = meta['source']['sha1']
+        return df, meta
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+# Đọc dữ liệu thời tiết qua cache: chỉ phân tích CSV khi file nguồn thay đổi.
+# compact=True trả về bảng dạng gọn (xem compact_frame)
+@traced('load.load_weather_data')
+def load_weather_data(file_path, use_cache=True, compact=False):
+    if use_cache:
+        cached = read_cache(file_path)
+        if cached is not None:
+            df, meta = cached
+            if meta.get('touched'):
+                # Nội dung không đổi, chỉ cập nhật lại thời gian sửa trong cache
+                write_cache(df, file_path, source=meta['source'], extra=meta.get('attrs'))
+            return compact_frame(df) if compact else expand_frame(df)
+
+    source = file_fingerprint(file_path)
+    df = apply_schema(pd.read_csv(file_path))
+    df.attrs['source_hash'] = source['sha1']
+    if use_cache:
+        try:
+            write_cache(df, file_path, source=source)
+        except OSError as e:
+            print(f"Không thể ghi cache: {e}")
+    return compact_frame(df) if compact else df
+
+
+# Đọc CSV theo từng khối (generator): bộ nhớ chỉ phụ thuộc kích thước khối, không phụ thuộc kích thước file
+def iter_weather_chunks(file_path, chunksize=100_000, schema=False):
+    with pd.read_csv(file_path, chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield apply_schema(chunk) if schema else chunk
+
+
 def read_and_check_file(file_path):
     try:
-        df = pd.read_csv(file_path)
+        df = load_weather_data(file_path)
         # In thông tin tổng quan của dữ liệu
         print("Dữ liệu ban đầu:")
         df.info()
@@ -19,4 +338,4 @@ def read_and_check_file(file_path):
 
     except FileNotFoundError:
         print("Không tìm thấy file")
-        return None
\ No newline at end of file
+        return None
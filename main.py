@@ -1,36 +1,108 @@
-import tkinter as tk
-from load_data import read_and_check_file
-from clean_data import remove_duplicate_rows, column_name_normalization, convert_date_data_to_datetime, \
-    handling_NaN_values
-from gui import WeatherApp
+import argparse
+import sys
 
+# startup phải được nạp đầu tiên: nó ghi mốc thời gian bắt đầu cho --profile-startup
+from startup import FIRST_WINDOW_BUDGET_MS, mark, print_startup_profile
+from instrumentation import span, tracer
+
+
+# Đọc, làm sạch (nếu cần) và chuyển dữ liệu sang dạng gọn; chạy ở luồng nền sau khi cửa sổ đã hiện.
+# ingest: thư mục/mẫu glob các file CSV nguồn, được nạp (song song, bỏ qua file không đổi) vào path trước.
+# path đã bị sửa sau lần nạp trước (vd đã lưu thay đổi từ giao diện) thì giữ nguyên, trừ khi force_ingest
+def prepare_data(path='df_weather.csv', ingest=None, force_ingest=False):
+    from load_data import read_and_check_file, compact_frame, memory_report, round_trip_mismatches
+    from clean_data import DEFAULT_PIPELINE, is_already_clean, save_clean_data
+
+    if ingest:
+        from ingest import ingest_files, summarize_report
+        print(f"Đang nạp các file nguồn từ {ingest}...")
+        try:
+            ingested, report = ingest_files(ingest, path, force=force_ingest)
+        except ValueError as e:
+            print(f"Không nạp lại các file nguồn: {e}")
+        else:
+            print(summarize_report(report))
+            if ingested is None:
+                print(f"Không có file nguồn nào thay đổi, dùng lại {path}")
 
-def main():
     # Đọc dữ liệu
     print("Đang đọc file dữ liệu...")
-    df = read_and_check_file('df_weather.csv')
+    df = read_and_check_file(path)
 
     if df is None:
-        print("Không thể đọc file. Chương trình dừng.")
-        return
-
-    # Làm sạch dữ liệu
-    print("\nĐang làm sạch dữ liệu...")
-    df = remove_duplicate_rows(df)
-    df = column_name_normalization(df)
-    df = convert_date_data_to_datetime(df)
-    df = handling_NaN_values(df, method="mean")
-
-    # Lưu dữ liệu đã làm sạch
-    df.to_csv('df_weather.csv', index=False)
-    print("Dữ liệu đã được làm sạch và lưu lại!")
-
-    # Khởi động GUI
-    print("\nKhởi động giao diện...")
-    root = tk.Tk()
-    app = WeatherApp(root)
+        raise ValueError(f"Không thể đọc file {path}")
+
+    # Làm sạch dữ liệu (bỏ qua nếu file đã được làm sạch bằng đúng công thức hiện tại)
+    if is_already_clean(df):
+        print("\nDữ liệu đã được làm sạch trước đó, bỏ qua bước làm sạch.")
+    else:
+        print("\nĐang làm sạch dữ liệu...")
+        # Các bước chạy trực tiếp trên bảng vừa đọc (không chép lại), điền NaN theo từng địa điểm
+        df = DEFAULT_PIPELINE.run(df, copy=False, trace_memory=True)
+        print(DEFAULT_PIPELINE.report().round(3).to_string())
+
+        # Lưu dữ liệu đã làm sạch
+        save_clean_data(df, path)
+        print("Dữ liệu đã được làm sạch và lưu lại!")
+
+    # Chuyển sang dạng gọn để giảm bộ nhớ khi chạy giao diện
+    compact = compact_frame(df)
+    # Bảng dạng gọn sẽ được ghi đè lên file nguồn khi lưu: không dùng nếu không cho lại đúng dữ liệu đã đọc
+    mismatches = round_trip_mismatches(df, compact)
+    if mismatches:
+        print(f"\nDạng gọn không giữ nguyên dữ liệu ({mismatches}), dùng bảng đầy đủ.")
+        return df
+    report = memory_report(df, compact)
+    print(f"\nBộ nhớ dữ liệu: {report.loc['TỔNG', 'trước (KB)'] / 1024:.1f} MB -> "
+          f"{report.loc['TỔNG', 'sau (KB)'] / 1024:.1f} MB (dạng gọn)")
+    return compact
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hệ thống Thống kê Thời tiết")
+    parser.add_argument('--ingest', metavar='SOURCE',
+                        help="nạp các file CSV trong thư mục (hoặc mẫu glob) vào df_weather.csv trước khi mở")
+    parser.add_argument('--force', action='store_true',
+                        help="dùng cùng --ingest: ghi đè df_weather.csv kể cả khi file đã được sửa/lưu sau lần nạp trước")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="in thời gian nạp mô-đun và khởi tạo khi khởi động")
+    parser.add_argument('--budget-ms', type=float, default=FIRST_WINDOW_BUDGET_MS,
+                        help=f"ngân sách thời gian tới cửa sổ đầu tiên (mặc định {FIRST_WINDOW_BUDGET_MS} ms)")
+    parser.add_argument('--no-prewarm', action='store_true',
+                        help="không nạp trước matplotlib/seaborn; nạp khi vẽ biểu đồ đầu tiên")
+    parser.add_argument('--exit-after-startup', action='store_true',
+                        help="thoát ngay khi khởi động xong (dùng cùng --profile-startup để đo)")
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        # Không đo bộ nhớ: tracemalloc làm chậm việc nạp mô-đun nhiều lần
+        tracer.enable(trace_memory=False)
+
+    with span('import.tkinter'):
+        import tkinter as tk
+    with span('import.gui'):
+        from gui import WeatherApp
+    mark('imports')
+
+    status = {'within_budget': True}
+
+    def on_ready(app):
+        if args.profile_startup:
+            status['within_budget'] = print_startup_profile(args.budget_ms)
+        if args.exit_after_startup:
+            app.on_close()
+
+    # Khởi động GUI: cửa sổ hiện ngay, dữ liệu được đọc và làm sạch ở luồng nền
+    print("Khởi động giao diện...")
+    with span('startup.window'):
+        root = tk.Tk()
+        app = WeatherApp(root, lambda: prepare_data(ingest=args.ingest, force_ingest=args.force), prewarm=not args.no_prewarm, on_ready=on_ready)
+        root.update()
+    mark('first_window')
     root.mainloop()
+    if args.exit_after_startup and not status['within_budget']:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,629 @@
+import numpy as np
+import pandas as pd
+
+from weather_index import WeatherIndex
+
+# Khoá của một bản ghi: mỗi địa điểm chỉ có một dòng cho mỗi ngày
+KEY_COLUMNS = ['date', 'location_name']
+
+# Toán tử dùng được trong điều kiện dạng (toán tử, giá trị), vd {'day_avgtemp_c': ('>', 40)}
+OPERATORS = {
+    '==': np.equal, '!=': np.not_equal,
+    '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal,
+}
+
+
+# Chuyển (ngày, địa điểm) về dạng khoá so sánh được: (int64 ns, str)
+def make_key(date, location):
+    return pd.Timestamp(date).value, str(location)
+
+
+# Gán giá trị vào các vị trí của một cột (chỉ chép lại cột đó), tự nới kiểu dữ liệu khi cần
+def assign_values(df, col, positions, values):
+    values = pd.Series(list(values), dtype=object)
+    if col in df.columns:
+        s = df[col].copy()
+    else:
+        numeric = pd.to_numeric(values, errors='coerce').notna().all()
+        s = pd.Series(np.nan if numeric else None, index=df.index, dtype=float if numeric else object)
+
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        missing = pd.Index(values.dropna().unique()).difference(s.cat.categories)
+        if len(missing):
+            s = s.cat.add_categories(missing)
+        arr = values.to_numpy()
+    elif pd.api.types.is_datetime64_any_dtype(s):
+        arr = pd.to_datetime(values).to_numpy(dtype=s.dtype)
+    elif pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        arr = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+        if pd.api.types.is_integer_dtype(s):
+            info = np.iinfo(s.dtype)
+            if np.isnan(arr).any() or (arr % 1 != 0).any() or arr.min() < info.min or arr.max() > info.max:
+                s = s.astype(float)
+            else:
+                arr = arr.astype(s.dtype)
+        else:
+            # Cột số thực gọn (float32) nhận giá trị float64 từ form: ép về đúng kiểu của cột
+            arr = arr.astype(s.dtype)
+    else:
+        arr = values.to_numpy()
+
+    s.iloc[positions] = arr
+    df[col] = s
+
+
+# Điều kiện trên một cột có phải là một giá trị đơn (so bằng) hay không
+def is_scalar_condition(condition):
+    return not isinstance(condition, (tuple, list, set, frozenset))
+
+
+# Giá trị của một cột dưới dạng mảng numpy so sánh được: datetime64[ns], số, hoặc chuỗi (thiếu -> '')
+def column_values(s):
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.to_numpy(dtype='datetime64[ns]')
+    if pd.api.types.is_numeric_dtype(s) and not isinstance(s.dtype, pd.CategoricalDtype):
+        return s.to_numpy()
+    return s.astype(object).fillna('').to_numpy().astype(str)
+
+
+# Đổi giá trị trong điều kiện về cùng kiểu với mảng cột
+def _coerce(values, value):
+    if values.dtype.kind == 'M':
+        return np.datetime64(pd.Timestamp(value), 'ns')
+    if values.dtype.kind == 'U':
+        return str(value)
+    return value
+
+
+# Mặt nạ các phần tử của mảng cột thoả điều kiện. Điều kiện là một giá trị (so bằng), (toán tử, giá trị)
+# với toán tử trong OPERATORS, khoảng (đầu, cuối) tính cả hai đầu (None: không giới hạn), hoặc list/set các giá trị
+def condition_mask(values, condition):
+    if isinstance(condition, tuple):
+        if len(condition) != 2:
+            raise ValueError(f"Điều kiện không hợp lệ: {condition!r}")
+        if isinstance(condition[0], str) and condition[0] in OPERATORS:
+            op, value = condition
+            return OPERATORS[op](values, _coerce(values, value))
+        lo, hi = condition
+        mask = np.ones(len(values), dtype=bool)
+        if lo is not None:
+            mask &= values >= _coerce(values, lo)
+        if hi is not None:
+            mask &= values <= _coerce(values, hi)
+        return mask
+    if isinstance(condition, (list, set, frozenset)):
+        return pd.Series(values).isin([_coerce(values, v) for v in condition]).to_numpy()
+    return values == _coerce(values, condition)
+
+
+# Trải các khoảng [lo, hi) thành (chỉ số khoảng, vị trí) của từng phần tử
+def expand_ranges(lo, hi):
+    lengths = hi - lo
+    items = np.repeat(np.arange(len(lo)), lengths)
+    offsets = np.repeat(lo - (np.cumsum(lengths) - lengths), lengths)
+    return items, offsets + np.arange(len(items))
+
+
+# Đưa các dòng mới về cùng cột và kiểu dữ liệu với bảng chính để pd.concat giữ nguyên kiểu
+def conform_rows(new, base):
+    for col in base.columns:
+        if col not in new.columns:
+            new[col] = np.nan
+        dtype = base[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            missing = pd.Index(new[col].dropna().unique()).difference(dtype.categories)
+            if len(missing):
+                base[col] = base[col].cat.add_categories(missing)
+            new[col] = pd.Categorical(new[col], categories=base[col].cat.categories)
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            new[col] = pd.to_datetime(new[col]).astype(dtype)
+        else:
+            try:
+                if not (pd.api.types.is_integer_dtype(dtype) and new[col].isna().any()):
+                    new[col] = new[col].astype(dtype)
+            except (TypeError, ValueError):
+                pass
+    return new[list(base.columns) + [c for c in new.columns if c not in base.columns]], base
+
+
+class RecordStore:
+    """Kho dữ liệu thời tiết có chỉ mục khoá (ngày, địa điểm) đã sắp xếp.
+
+    Các thao tác thêm/sửa/xóa không chép lại cả bảng mà được đệm trong một delta
+    (dòng mới, giá trị sửa, dòng bị đánh dấu xóa) và chỉ gộp vào bảng chính
+    khi cần đọc bảng hoàn chỉnh qua frame(). Việc gộp chỉ tốn O(n) (không sắp xếp lại).
+    """
+
+    def __init__(self, df):
+        df = df.reset_index(drop=True)
+        dates, locs = self._key_arrays(df)
+        if not self._is_sorted(dates, locs):
+            order = self._sort_order(dates, locs)
+            df = df.take(order).reset_index(drop=True)
+            dates, locs = dates[order], locs[order]
+        self._base = df
+        self._dates = dates
+        self._locs = locs
+        self._inserts = {}
+        self._updates = {}
+        self._deleted = set()
+        self._index = None
+        self._codes = None
+        self._subscribers = []
+        # Thông báo bị giữ lại trong lúc apply_batch (chỉ gửi khi cả lô thành công)
+        self._held = None
+        self.version = 0
+
+    @staticmethod
+    def _key_arrays(df):
+        dates = df['date'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        locs = df['location_name'].astype(object).fillna('').astype(str).to_numpy(dtype=object)
+        return dates, locs
+
+    @staticmethod
+    def _sort_order(dates, locs):
+        return pd.DataFrame({'d': dates, 'l': locs}).sort_values(['d', 'l'], kind='stable').index.to_numpy()
+
+    @staticmethod
+    def _is_sorted(dates, locs):
+        if len(dates) < 2:
+            return True
+        d0, d1 = dates[:-1], dates[1:]
+        return bool(np.all((d1 > d0) | ((d1 == d0) & (locs[1:] >= locs[:-1]))))
+
+    def _locate(self, dates, locs, date_value, location=None):
+        """Trả về khoảng vị trí [lo, hi) của khoá trong mảng khoá đã sắp xếp"""
+        lo = np.searchsorted(dates, date_value, 'left')
+        hi = np.searchsorted(dates, date_value, 'right')
+        if location is None:
+            return lo, hi
+        sub = locs[lo:hi]
+        return lo + np.searchsorted(sub, location, 'left'), lo + np.searchsorted(sub, location, 'right')
+
+    def _key_codes(self):
+        """Khoá số của từng dòng (mã ngày * số địa điểm + mã địa điểm, không giảm theo thứ tự bảng) cùng
+        bảng băm ngày -> mã và địa điểm -> mã; dựng lại khi mảng khoá của bảng chính đổi"""
+        if self._codes is None or self._codes[0] is not self._dates:
+            date_codes, date_values = pd.factorize(self._dates, sort=True)
+            loc_codes, loc_values = pd.factorize(self._locs, sort=True)
+            n = max(len(loc_values), 1)
+            keys = date_codes.astype(np.int64) * n + loc_codes
+            self._codes = (self._dates, keys, pd.Index(date_values), pd.Index(loc_values), n)
+        return self._codes[1:]
+
+    def _locate_many(self, dates, locs):
+        """Khoảng vị trí [lo, hi) trong bảng chính của nhiều khoá cùng lúc (locs[i] None: cả ngày dates[i]).
+
+        Ngày và địa điểm được đổi sang mã bằng tra bảng băm, rồi tìm nhị phân trên khoá số đã sắp xếp.
+        """
+        keys, date_index, loc_index, n = self._key_codes()
+        d = date_index.get_indexer(dates).astype(np.int64)
+        has_loc = np.array([loc is not None for loc in locs], dtype=bool)
+        loc = loc_index.get_indexer(np.where(has_loc, locs, '').astype(object)).astype(np.int64)
+        lo_key = np.where(has_loc, d * n + loc, d * n)
+        hi_key = np.where(has_loc, lo_key + 1, (d + 1) * n)
+        lo = np.searchsorted(keys, lo_key, 'left')
+        hi = np.searchsorted(keys, hi_key, 'left')
+        missing = (d < 0) | (has_loc & (loc < 0))
+        hi[missing] = lo[missing]
+        return lo, hi
+
+    def _date_bounds(self, condition):
+        """Khoảng vị trí [lo, hi) chắc chắn chứa mọi dòng thoả điều kiện trên cột date (bảng sắp theo ngày)"""
+        n = len(self._dates)
+
+        def left(v):
+            return int(np.searchsorted(self._dates, pd.Timestamp(v).value, 'left'))
+
+        def right(v):
+            return int(np.searchsorted(self._dates, pd.Timestamp(v).value, 'right'))
+
+        if is_scalar_condition(condition):
+            return left(condition), right(condition)
+        if isinstance(condition, tuple) and len(condition) == 2:
+            if isinstance(condition[0], str) and condition[0] in OPERATORS:
+                op, value = condition
+                if op == '==':
+                    return left(value), right(value)
+                if op in ('>', '>='):
+                    return (right(value) if op == '>' else left(value)), n
+                if op in ('<', '<='):
+                    return 0, (left(value) if op == '<' else right(value))
+                return 0, n
+            lo, hi = condition
+            return (0 if lo is None else left(lo)), (n if hi is None else right(hi))
+        return 0, n
+
+    def _match(self, identifier, arrays=None):
+        """Vị trí các dòng của bảng đã gộp thoả mọi điều kiện trong identifier (xem condition_mask).
+
+        Điều kiện trên date thu hẹp trước khoảng dòng cần xét bằng tìm nhị phân; arrays là bộ đệm
+        mảng cột dùng chung giữa nhiều lần gọi trong cùng một lượt.
+        """
+        if not identifier:
+            raise ValueError("Điều kiện rỗng: cần ít nhất một cột để so khớp")
+        df = self.frame()
+        arrays = {} if arrays is None else arrays
+        lo, hi = self._date_bounds(identifier['date']) if 'date' in identifier else (0, len(df))
+        mask = np.ones(hi - lo, dtype=bool)
+        for col, condition in identifier.items():
+            if col not in df.columns:
+                raise ValueError(f"Không có cột {col}")
+            if col not in arrays:
+                arrays[col] = column_values(df[col])
+            mask &= condition_mask(arrays[col][lo:hi], condition)
+        return lo + np.flatnonzero(mask)
+
+    def _match_many(self, identifiers):
+        """So khớp nhiều identifier trên bảng đã gộp; trả về (chỉ số identifier, vị trí dòng) của từng cặp khớp.
+
+        Identifier chỉ gồm ngày (và địa điểm) dạng giá trị đơn được tra cùng lúc qua _locate_many;
+        các identifier khác (khoảng, bất đẳng thức, cột khác) đi qua _match.
+        """
+        self.frame()
+        exact, general = [], []
+        for i, identifier in enumerate(identifiers):
+            if ('date' in identifier and set(identifier) <= set(KEY_COLUMNS)
+                    and all(is_scalar_condition(v) for v in identifier.values())):
+                exact.append(i)
+            else:
+                general.append(i)
+
+        items, positions = [], []
+        if exact:
+            dates = pd.to_datetime([identifiers[i]['date'] for i in exact]).to_numpy(dtype='datetime64[ns]')
+            locs = np.array([None if identifiers[i].get('location_name') is None
+                             else str(identifiers[i]['location_name']) for i in exact], dtype=object)
+            lo, hi = self._locate_many(dates.astype(np.int64), locs)
+            idx, pos = expand_ranges(lo, hi)
+            items.append(np.asarray(exact, dtype=np.intp)[idx])
+            positions.append(pos)
+        arrays = {}
+        for i in general:
+            pos = self._match(identifiers[i], arrays)
+            items.append(np.full(len(pos), i, dtype=np.intp))
+            positions.append(pos)
+        if not items:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        return np.concatenate(items), np.concatenate(positions)
+
+    @staticmethod
+    def _normalize_edits(edits, on=None):
+        """Đưa danh sách (identifier, updates) hoặc bảng về (danh sách identifier, {cột: (chỉ số mục, giá trị)}).
+
+        Với bảng: các cột trong on (mặc định các cột khoá có trong bảng) là identifier, các cột còn lại là
+        giá trị sửa; ô trống (NaN) nghĩa là không sửa cột đó ở dòng này.
+        """
+        if isinstance(edits, pd.DataFrame):
+            on = list(on) if on is not None else [c for c in edits.columns if c in KEY_COLUMNS + ['Date']]
+            if not on:
+                raise ValueError("Bảng sửa cần ít nhất một cột định danh (on)")
+            identifiers = edits[on].to_dict('records')
+            updates = {}
+            for col in edits.columns:
+                if col in on:
+                    continue
+                ok = edits[col].notna().to_numpy()
+                updates[col] = (np.flatnonzero(ok), edits[col][ok].tolist())
+        else:
+            identifiers, updates = [], {}
+            for i, (identifier, upd) in enumerate(edits):
+                identifiers.append(dict(identifier))
+                for col, value in upd.items():
+                    idx, values = updates.setdefault(col, ([], []))
+                    idx.append(i)
+                    values.append(value)
+            updates = {col: (np.asarray(idx, dtype=np.intp), values) for col, (idx, values) in updates.items()}
+        for identifier in identifiers:
+            if 'Date' in identifier:
+                identifier['date'] = identifier.pop('Date')
+        return identifiers, updates
+
+    @property
+    def dirty(self):
+        return bool(self._inserts or self._updates or self._deleted)
+
+    def __len__(self):
+        return len(self._base) - len(self._deleted) + len(self._inserts)
+
+    def frame(self):
+        """Trả về bảng dữ liệu hoàn chỉnh (đã gộp delta), sắp theo (ngày, địa điểm)"""
+        if self.dirty:
+            self._merge()
+        return self._base
+
+    def subscribe(self, callback):
+        """Đăng ký callback(removed, added) được gọi với các dòng cũ/mới sau mỗi thay đổi"""
+        self._subscribers.append(callback)
+
+    def _notify(self, removed, added):
+        if self._held is not None:
+            self._held.append((removed, added))
+            return
+        for callback in self._subscribers:
+            callback(removed, added)
+
+    def index(self):
+        """Chỉ mục truy vấn (tháng/năm/khoảng ngày/địa điểm) của bảng hiện hành, tự dựng lại sau mỗi thay đổi"""
+        df = self.frame()
+        if self._index is None or self._index.df is not df:
+            self._index = WeatherIndex(df, self._dates)
+        return self._index
+
+    def _merge(self):
+        base = self._base.copy(deep=False)
+        dates, locs = self._dates, self._locs
+
+        if self._updates:
+            by_col = {}
+            for pos, upd in self._updates.items():
+                for col, val in upd.items():
+                    by_col.setdefault(col, ([], []))
+                    by_col[col][0].append(pos)
+                    by_col[col][1].append(val)
+            for col, (positions, values) in by_col.items():
+                assign_values(base, col, np.asarray(positions), values)
+
+        if self._deleted:
+            keep = np.ones(len(base), dtype=bool)
+            keep[list(self._deleted)] = False
+            base = base[keep]
+            dates, locs = dates[keep], locs[keep]
+
+        if self._inserts:
+            keys = sorted(self._inserts)
+            new = pd.DataFrame([self._inserts[k] for k in keys])
+            new, base = conform_rows(new, base)
+            positions = [self._locate(dates, locs, d, loc)[1] for d, loc in keys]
+            m = len(base)
+            take = np.insert(np.arange(m), positions, m + np.arange(len(keys)))
+            base = pd.concat([base, new], ignore_index=True).take(take)
+            new_dates = np.array([k[0] for k in keys], dtype=np.int64)
+            new_locs = np.array([k[1] for k in keys], dtype=object)
+            dates = np.insert(dates, positions, new_dates)
+            locs = np.insert(locs, positions, new_locs)
+
+        attrs = dict(self._base.attrs)
+        self._base = base.reset_index(drop=True)
+        # Giữ attrs (mã băm nguồn, đánh dấu dạng gọn...) qua các lần gộp
+        self._base.attrs.update(attrs)
+        self._dates, self._locs = dates, locs
+        self._inserts, self._updates, self._deleted = {}, {}, set()
+
+    def _resolve(self, identifier):
+        """Tìm các dòng khớp identifier: trả về (vị trí trong bảng chính, khoá của dòng mới chưa gộp)"""
+        identifier = dict(identifier)
+        if 'Date' in identifier:
+            identifier['date'] = identifier.pop('Date')
+
+        if 'index' in identifier:
+            self.frame()
+            idx = identifier['index']
+            positions = [idx] if 0 <= idx < len(self._base) else []
+            return np.asarray(positions, dtype=np.intp), []
+
+        if ('date' in identifier and set(identifier) <= set(KEY_COLUMNS)
+                and all(is_scalar_condition(v) for v in identifier.values())):
+            d = pd.Timestamp(identifier['date']).value
+            loc = identifier.get('location_name')
+            loc = None if loc is None else str(loc)
+            lo, hi = self._locate(self._dates, self._locs, d, loc)
+            positions = np.array([p for p in range(lo, hi) if p not in self._deleted], dtype=np.intp)
+            keys = [k for k in self._inserts if k[0] == d and (loc is None or k[1] == loc)]
+            return positions, keys
+
+        # Trường hợp tổng quát (cột khác, khoảng, bất đẳng thức): so khớp trên bảng đã gộp
+        return self._match(identifier), []
+
+    def _effective_rows(self, positions, keys=()):
+        """Các dòng khớp với giá trị hiện hành (đã áp giá trị sửa đang chờ gộp)"""
+        rows = self._base.iloc[positions].to_dict('records')
+        for pos, row in zip(positions, rows):
+            row.update(self._updates.get(pos, {}))
+        rows.extend(dict(self._inserts[k]) for k in keys)
+        return rows
+
+    def add(self, record: dict):
+        """Thêm một bản ghi; khoá (ngày, địa điểm) không được trùng với bản ghi đã có"""
+        rec = dict(record)
+        if 'Date' in rec:
+            rec['date'] = rec.pop('Date')
+        if rec.get('date') is None or rec.get('location_name') in (None, ''):
+            raise ValueError("Bản ghi cần có ngày và địa điểm")
+        rec['date'] = pd.Timestamp(rec['date'])
+        key = make_key(rec['date'], rec['location_name'])
+        lo, hi = self._locate(self._dates, self._locs, *key)
+        if key in self._inserts or any(p not in self._deleted for p in range(lo, hi)):
+            raise ValueError(f"Đã có dữ liệu của {key[1]} ngày {rec['date'].strftime('%Y-%m-%d')}")
+        self._inserts[key] = rec
+        self.version += 1
+        self._notify([], [dict(rec)])
+        return 1
+
+    def update(self, identifier: dict, updates: dict):
+        """Cập nhật các dòng khớp identifier; trả về số dòng được cập nhật"""
+        positions, keys = self._resolve(identifier)
+        if len(positions) + len(keys) == 0:
+            return 0
+        rekey = any(col in updates for col in KEY_COLUMNS)
+        old_rows = self._effective_rows(positions, keys) if (rekey or self._subscribers) else []
+        if rekey:
+            # Đổi khoá: kiểm tra mọi khoá mới trước (lỗi thì kho chưa bị đổi gì),
+            # rồi xóa dòng cũ và thêm lại dòng đã sửa vào đúng vị trí mới
+            self._check_rekey(old_rows, updates, positions, keys)
+            self._drop(positions, keys)
+            self._notify(old_rows, [])
+            for row in old_rows:
+                self.add({**row, **updates})
+        else:
+            for pos in positions:
+                self._updates.setdefault(int(pos), {}).update(updates)
+            for k in keys:
+                self._inserts[k].update(updates)
+            self._notify(old_rows, [{**row, **updates} for row in old_rows])
+        self.version += 1
+        return len(positions) + len(keys)
+
+    def _check_rekey(self, rows, updates, positions, keys):
+        """Báo ValueError nếu khoá mới của các dòng đổi khoá bị thiếu, trùng nhau hoặc trùng dòng khác"""
+        moving = {int(p) for p in positions}
+        moving_keys = set(keys)
+        targets = set()
+        for row in rows:
+            new = {**row, **updates}
+            if pd.isna(new.get('date')) or new.get('location_name') in (None, ''):
+                raise ValueError("Bản ghi cần có ngày và địa điểm")
+            key = make_key(new['date'], new['location_name'])
+            lo, hi = self._locate(self._dates, self._locs, *key)
+            if (key in targets or (key in self._inserts and key not in moving_keys)
+                    or any(p not in self._deleted and p not in moving for p in range(lo, hi))):
+                raise ValueError(f"Đã có dữ liệu của {key[1]} ngày {pd.Timestamp(key[0]).strftime('%Y-%m-%d')}")
+            targets.add(key)
+
+    def _snapshot(self):
+        """Trạng thái hiện tại của kho (bảng chính không bị sửa tại chỗ nên chỉ cần giữ tham chiếu)"""
+        return (self._base, self._dates, self._locs, {k: dict(v) for k, v in self._inserts.items()},
+                {p: dict(u) for p, u in self._updates.items()}, set(self._deleted), self.version,
+                self._index, self._codes)
+
+    def _restore(self, snapshot):
+        (self._base, self._dates, self._locs, self._inserts, self._updates, self._deleted, self.version,
+         self._index, self._codes) = snapshot
+
+    def _drop(self, positions, keys):
+        self._deleted.update(int(p) for p in positions)
+        for p in positions:
+            self._updates.pop(int(p), None)
+        for k in keys:
+            del self._inserts[k]
+
+    def delete(self, identifier: dict):
+        """Xóa các dòng khớp identifier; trả về số dòng bị xóa"""
+        positions, keys = self._resolve(identifier)
+        if len(positions) + len(keys) == 0:
+            return 0
+        removed = self._effective_rows(positions, keys) if self._subscribers else []
+        self._drop(positions, keys)
+        self.version += 1
+        self._notify(removed, [])
+        return len(positions) + len(keys)
+
+    def apply_batch(self, operations):
+        """Áp dụng nhiều thao tác rồi gộp một lần duy nhất.
+
+        Mỗi thao tác là ('add', record), ('update', identifier, updates) hoặc
+        ('delete', identifier). Trả về danh sách số dòng bị ảnh hưởng của từng thao tác.
+        Cả lô là một giao dịch: nếu một thao tác lỗi thì kho trở về trạng thái trước lô, lỗi được
+        báo lại và callback không nhận thay đổi nào (chỉ nhận khi cả lô thành công).
+        """
+        snapshot = self._snapshot()
+        self._held = []
+        try:
+            counts = []
+            for op in operations:
+                kind, args = op[0], op[1:]
+                if kind == 'add':
+                    counts.append(self.add(*args))
+                elif kind == 'update':
+                    counts.append(self.update(*args))
+                elif kind == 'delete':
+                    counts.append(self.delete(*args))
+                else:
+                    raise ValueError(f"Thao tác không hợp lệ: {kind}")
+            self.frame()
+        except Exception:
+            self._restore(snapshot)
+            raise
+        finally:
+            held, self._held = self._held, None
+        for removed, added in held:
+            self._notify(removed, added)
+        return counts
+
+    def update_many(self, edits, on=None):
+        """Cập nhật nhiều nhóm dòng trong một lượt, gộp và sắp xếp lại (nếu đổi khoá) đúng một lần.
+
+        edits là danh sách (identifier, updates) hoặc bảng có các cột định danh on (xem _normalize_edits).
+        Mọi identifier được so khớp trên cùng bảng trước khi sửa; nếu nhiều mục sửa cùng một ô thì mục sau
+        thắng. Trả về mảng số dòng được cập nhật của từng mục.
+        """
+        identifiers, updates = self._normalize_edits(edits, on)
+        items, positions = self._match_many(identifiers)
+        counts = np.bincount(items, minlength=len(identifiers))
+        if not len(positions):
+            return counts
+
+        base = self._base.copy(deep=False)
+        touched = np.zeros(len(base), dtype=bool)
+        old_rows = None
+        for col, (idx, values) in updates.items():
+            # Các cặp (mục, dòng) của những mục có sửa cột này; mỗi dòng lấy giá trị của mục cuối cùng
+            item_values = np.full(len(identifiers), -1, dtype=np.intp)
+            item_values[idx] = np.arange(len(idx))
+            which = item_values[items]
+            ok = which >= 0
+            pos, which = positions[ok], which[ok]
+            order = np.lexsort((which, pos))
+            pos, which = pos[order], which[order]
+            last = np.r_[pos[1:] != pos[:-1], True] if len(pos) else np.empty(0, dtype=bool)
+            pos, which = pos[last], which[last]
+            if not len(pos):
+                continue
+            if old_rows is None and self._subscribers:
+                old_rows = {}
+            if old_rows is not None:
+                for p in pos[~touched[pos]]:
+                    old_rows[int(p)] = self._base.iloc[int(p)].to_dict()
+            touched[pos] = True
+            assign_values(base, col, pos, [values[w] for w in which])
+
+        if not touched.any():
+            return counts
+        attrs = dict(self._base.attrs)
+        dates, locs = self._dates, self._locs
+        if any(col in updates for col in KEY_COLUMNS):
+            dates, locs = self._key_arrays(base)
+            if not self._is_sorted(dates, locs):
+                order = self._sort_order(dates, locs)
+                base = base.take(order).reset_index(drop=True)
+                dates, locs, touched = dates[order], locs[order], touched[order]
+            same = np.r_[False, (dates[1:] == dates[:-1]) & (locs[1:] == locs[:-1])]
+            clash = same & (touched | np.r_[False, touched[:-1]])
+            if clash.any():
+                p = int(np.flatnonzero(clash)[0])
+                raise ValueError(f"Đã có dữ liệu của {locs[p]} ngày "
+                                 f"{pd.Timestamp(dates[p]).strftime('%Y-%m-%d')}")
+        self._base = base
+        self._base.attrs.update(attrs)
+        self._dates, self._locs = dates, locs
+        self.version += 1
+        if old_rows is not None:
+            self._notify(list(old_rows.values()), base.iloc[np.flatnonzero(touched)].to_dict('records'))
+        return counts
+
+    def delete_many(self, identifiers):
+        """Xóa các dòng khớp bất kỳ identifier nào (danh sách điều kiện hoặc bảng cột định danh) trong một lượt.
+
+        Trả về mảng số dòng khớp của từng identifier (một dòng khớp nhiều identifier chỉ bị xóa một lần).
+        """
+        if isinstance(identifiers, pd.DataFrame):
+            identifiers = identifiers.to_dict('records')
+        identifiers = [dict(identifier) for identifier in identifiers]
+        for identifier in identifiers:
+            if 'Date' in identifier:
+                identifier['date'] = identifier.pop('Date')
+        items, positions = self._match_many(identifiers)
+        counts = np.bincount(items, minlength=len(identifiers))
+        if not len(positions):
+            return counts
+
+        keep = np.ones(len(self._base), dtype=bool)
+        keep[positions] = False
+        removed = self._base[~keep].to_dict('records') if self._subscribers else []
+        attrs = dict(self._base.attrs)
+        self._base = self._base[keep].reset_index(drop=True)
+        self._base.attrs.update(attrs)
+        self._dates, self._locs = self._dates[keep], self._locs[keep]
+        self.version += 1
+        self._notify(removed, [])
+        return counts
@@ -0,0 +1,198 @@
+import argparse
+import html
+import multiprocessing as mp
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+from load_data import load_weather_data
+from record_store import RecordStore
+from visualization import WeatherVisualizer, FigureManager
+
+# Các biểu đồ của báo cáo: tên -> (tiêu đề, cách vẽ)
+CHARTS = {
+    'temp_trend': ('Xu hướng nhiệt độ', lambda vis: vis.plot_temp_trend()),
+    'monthly_stats': ('Nhiệt độ TB theo tháng', lambda vis: vis.plot_monthly_stats()),
+    'region_comparison': ('So sánh vùng miền', lambda vis: vis.plot_region_comparison()),
+    'correlation': ('Tương quan yếu tố', lambda vis: vis.plot_correlation()),
+}
+
+# Dữ liệu dùng chung cho các tiến trình con: nạp một lần ở tiến trình cha rồi chia sẻ qua fork
+# (hoặc nạp một lần cho mỗi tiến trình con qua cache .npz nếu hệ điều hành không hỗ trợ fork)
+_SHARED = {}
+
+
+def _init_shared(data_path):
+    if 'index' not in _SHARED:
+        _SHARED['index'] = RecordStore(load_weather_data(data_path)).index()
+
+
+# Tên thư mục an toàn cho một vùng miền (bỏ dấu, thay ký tự đặc biệt)
+def slugify(text):
+    text = unicodedata.normalize('NFKD', str(text)).replace('đ', 'd').replace('Đ', 'D')
+    text = text.encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^A-Za-z0-9]+', '_', text).strip('_').lower() or 'khac'
+
+
+# Tạo danh sách việc: mỗi lát (năm, tháng, vùng) với các biểu đồ phù hợp
+def plan_tasks(index, years=None, months=None, regions=None):
+    years = index.years() if years is None else years
+    if regions is None:
+        regions = sorted(index.df['location_region'].dropna().unique().tolist()) \
+            if 'location_region' in index.df.columns else []
+    months = list(range(1, 13)) if months is None else months
+    tasks = []
+    for year in years:
+        for month in [None] + list(months):
+            if month is not None and index.month_bounds(year, month) == (0, 0):
+                continue
+            for region in [None] + list(regions):
+                for chart in CHARTS:
+                    if chart == 'monthly_stats' and month is not None:
+                        continue
+                    if chart == 'region_comparison' and region is not None:
+                        continue
+                    tasks.append((chart, year, month, region))
+    return tasks
+
+
+def _slice(index, year, month, region):
+    df = index.month(year, month) if month is not None else index.year(year)
+    if region is not None:
+        df = df[df['location_region'] == region]
+    return df
+
+
+# Vẽ một biểu đồ và lưu ra các định dạng yêu cầu (chạy trong tiến trình con)
+def render_task(task, out_dir, formats):
+    chart, year, month, region = task
+    t0 = time.perf_counter()
+    rel_dir = os.path.join(str(year), f"{month:02d}" if month else 'ca_nam', slugify(region) if region else 'tat_ca')
+    try:
+        df = _slice(_SHARED['index'], year, month, region)
+        if df.empty:
+            return task, [], time.perf_counter() - t0, 'không có dữ liệu'
+        figures = FigureManager()
+        fig = CHARTS[chart][1](WeatherVisualizer(df, figures))
+        if fig is None:
+            return task, [], time.perf_counter() - t0, 'không vẽ được biểu đồ'
+        os.makedirs(os.path.join(out_dir, rel_dir), exist_ok=True)
+        paths = []
+        for fmt in formats:
+            rel_path = os.path.join(rel_dir, f"{chart}.{fmt}")
+            fig.savefig(os.path.join(out_dir, rel_path), format=fmt)
+            paths.append(rel_path)
+        figures.release(fig)
+        return task, paths, time.perf_counter() - t0, None
+    except Exception as e:
+        return task, [], time.perf_counter() - t0, str(e)
+
+
+# Ghi trang index.html liệt kê mọi biểu đồ theo từng lát
+def write_index(out_dir, results):
+    sections = {}
+    for (chart, year, month, region), paths, _, error in results:
+        title = f"Năm {year}" + (f" - Tháng {month}" if month else '') + (f" - {region}" if region else '')
+        sections.setdefault((year, month or 0, region or ''), (title, []))[1].append((chart, paths, error))
+
+    parts = ['<!DOCTYPE html><html><head><meta charset="utf-8"><title>Báo cáo thời tiết</title>',
+             '<style>body{font-family:Arial}img{max-width:480px;margin:4px;border:1px solid #ccc}'
+             '.chart{display:inline-block;vertical-align:top}</style></head><body>',
+             '<h1>Báo cáo thống kê thời tiết</h1>']
+    for key in sorted(sections):
+        title, charts = sections[key]
+        parts.append(f'<h2>{html.escape(title)}</h2>')
+        for chart, paths, error in charts:
+            parts.append(f'<div class="chart"><h4>{html.escape(CHARTS[chart][0])}</h4>')
+            if error:
+                parts.append(f'<p style="color:gray">{html.escape(error)}</p>')
+            for path in paths:
+                url = html.escape(path.replace(os.sep, '/'))
+                if path.endswith(('.png', '.svg')):
+                    parts.append(f'<a href="{url}"><img src="{url}" loading="lazy"></a>')
+                else:
+                    parts.append(f'<a href="{url}">{html.escape(os.path.basename(path))}</a>')
+            parts.append('</div>')
+    parts.append('</body></html>')
+    path = os.path.join(out_dir, 'index.html')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(parts))
+    return path
+
+
+def generate_report(data_path, out_dir, years=None, months=None, regions=None, formats=('png',), workers=None):
+    workers = workers or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    _init_shared(data_path)
+    tasks = plan_tasks(_SHARED['index'], years, months, regions)
+    load_time = time.perf_counter() - t0
+    os.makedirs(out_dir, exist_ok=True)
+
+    t1 = time.perf_counter()
+    if workers == 1:
+        results = [render_task(task, out_dir, formats) for task in tasks]
+    else:
+        if 'fork' in mp.get_all_start_methods():
+            # Tiến trình con được fork sau khi dữ liệu đã nạp nên dùng chung bộ nhớ, không pickle lại bảng
+            pool = ProcessPoolExecutor(workers, mp_context=mp.get_context('fork'))
+        else:
+            pool = ProcessPoolExecutor(workers, initializer=_init_shared, initargs=(data_path,))
+        with pool:
+            chunksize = max(1, len(tasks) // (workers * 8))
+            results = list(pool.map(render_task, tasks, [out_dir] * len(tasks), [formats] * len(tasks),
+                                    chunksize=chunksize))
+    render_time = time.perf_counter() - t1
+
+    index_path = write_index(out_dir, results)
+    charts = sum(1 for _, paths, _, error in results if not error)
+    failed = [(task, error) for task, _, _, error in results if error]
+    return {
+        'charts': charts,
+        'files': sum(len(paths) for _, paths, _, _ in results),
+        'failed': failed,
+        'workers': workers,
+        'load_seconds': load_time,
+        'render_seconds': render_time,
+        'charts_per_second': charts / render_time if render_time > 0 else 0.0,
+        'index': index_path,
+    }
+
+
+def _parse_list(text, cast=str):
+    if text is None or text == 'all':
+        return None
+    if text == 'none':
+        return []
+    return [cast(item.strip()) for item in text.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Xuất báo cáo biểu đồ thời tiết (không cần giao diện)")
+    parser.add_argument('--data', default='df_weather.csv', help="file dữ liệu CSV")
+    parser.add_argument('--out', default='reports', help="thư mục lưu báo cáo")
+    parser.add_argument('--years', help="danh sách năm, ví dụ 2024,2025 (mặc định: tất cả)")
+    parser.add_argument('--months', help="danh sách tháng, 'all' hoặc 'none' (mặc định: all)")
+    parser.add_argument('--regions', help="danh sách vùng, 'all' hoặc 'none' (mặc định: all)")
+    parser.add_argument('--formats', default='png', help="định dạng ảnh: png,svg,pdf")
+    parser.add_argument('--workers', type=int, default=None, help="số tiến trình (mặc định: số nhân CPU)")
+    args = parser.parse_args()
+
+    summary = generate_report(args.data, args.out, _parse_list(args.years, int), _parse_list(args.months, int),
+                              _parse_list(args.regions), tuple(_parse_list(args.formats) or ['png']),
+                              args.workers)
+    print(f"Đã vẽ {summary['charts']} biểu đồ ({summary['files']} file) với {summary['workers']} tiến trình")
+    print(f"Nạp dữ liệu: {summary['load_seconds']:.2f}s, vẽ: {summary['render_seconds']:.2f}s "
+          f"({summary['charts_per_second']:.1f} biểu đồ/giây)")
+    for task, error in summary['failed']:
+        print(f"  Bỏ qua {task}: {error}")
+    print(f"Trang tổng hợp: {summary['index']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from aggregates import AggregateCube, CovarianceCube
+from analysis import detect_heatwaves, detect_heavy_rain
+from journal import Journal, journal_path_for
+from load_data import load_weather_data, restore_float
+from record_store import RecordStore
+from visualization import CORRELATION_COLUMNS, prepare_correlation_from_cube
+
+
+class HTTPError(Exception):
+    """Lỗi trả về cho client kèm mã trạng thái HTTP"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Chuyển DataFrame thành danh sách bản ghi JSON (ngày dạng ISO, NaN thành null)
+def _records(df):
+    if df is None or df.empty:
+        return []
+    # Số đo lưu dạng float32: trả về 35.3 thay vì 35.29999923706055
+    df = df.assign(**{c: restore_float(df[c].to_numpy()) for c in df.columns if pd.api.types.is_float_dtype(df[c])})
+    return json.loads(df.to_json(orient='records', date_format='iso', force_ascii=False))
+
+
+def _to_json(value):
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Không chuyển được kiểu {type(value).__name__} sang JSON")
+
+
+class StatsService:
+    """Các truy vấn thống kê trên bộ dữ liệu nạp một lần trong bộ nhớ.
+
+    Dịch vụ chỉ đọc: các thay đổi chưa lưu trong nhật ký của giao diện được áp lên bản trong bộ nhớ
+    khi khởi động, nhưng dịch vụ không ghi vào file dữ liệu hay nhật ký. Kết quả (đã mã hoá JSON)
+    được lưu trong LRU theo khoá (đường dẫn, tham số, phiên bản dữ liệu). Kho dữ liệu và khối tổng
+    hợp không an toàn luồng nên mọi thao tác trên chúng đi qua một khoá; các phép tính nặng (nắng
+    nóng, mưa lớn, tương quan) chạy ngoài khoá trên lát cắt đã lấy ra.
+    """
+
+    def __init__(self, data_path, max_cached=256, journal=True):
+        df = load_weather_data(data_path, compact=True)
+        self.store = RecordStore(df)
+        if journal:
+            # Chỉ đọc nhật ký: việc ghi và gộp nhật ký thuộc về giao diện
+            base_hash = df.attrs.get('source_hash')
+            Journal(journal_path_for(data_path), base_hash).replay(self.store, base_hash)
+        self.cube = AggregateCube.from_store(self.store)
+        self.covariance = CovarianceCube.from_store(self.store, CORRELATION_COLUMNS)
+        self._lock = threading.RLock()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.max_cached = max_cached
+        self.hits = self.misses = 0
+
+        self.routes = {
+            ('GET', '/health'): self.health,
+            ('GET', '/stats'): self.stats,
+            ('GET', '/monthly'): self.monthly,
+            ('GET', '/heatwaves'): self.heatwaves,
+            ('GET', '/heavy-rain'): self.heavy_rain,
+            ('GET', '/correlation'): self.correlation,
+        }
+
+    @property
+    def version(self):
+        return self.store.version
+
+    def handle(self, method, path, params):
+        """Trả về (mã trạng thái, nội dung JSON dạng bytes); kết quả được lấy từ cache nếu có"""
+        route = self.routes.get((method, path))
+        if route is None:
+            raise HTTPError(404, f"Không có đường dẫn {method} {path}")
+        key = (path, tuple(sorted(params.items())), self.version)
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return 200, cached
+        payload = self._encode(route(params))
+        with self._cache_lock:
+            self.misses += 1
+            self._cache[key] = payload
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return 200, payload
+
+    @staticmethod
+    def _encode(payload):
+        return json.dumps(payload, ensure_ascii=False, default=_to_json).encode('utf-8')
+
+    # --- Tham số truy vấn ---
+
+    @staticmethod
+    def _int(params, name, default=None):
+        if name not in params:
+            return default
+        try:
+            return int(params[name])
+        except ValueError:
+            raise HTTPError(400, f"Tham số {name} phải là số nguyên")
+
+    @staticmethod
+    def _numbers(params, name, default):
+        if name not in params:
+            return default
+        try:
+            values = [float(v) for v in params[name].split(',')]
+        except ValueError:
+            raise HTTPError(400, f"Tham số {name} phải là số hoặc danh sách số")
+        return values if len(values) > 1 else values[0]
+
+    @staticmethod
+    def _range(params, name):
+        """Một số nguyên hoặc khoảng 'đầu-cuối' (tính cả hai đầu)"""
+        if name not in params:
+            return None
+        try:
+            parts = [int(v) for v in params[name].split('-')]
+        except ValueError:
+            raise HTTPError(400, f"Tham số {name} phải là số nguyên hoặc khoảng dạng 3-8")
+        if len(parts) == 1:
+            return parts[0]
+        if len(parts) != 2:
+            raise HTTPError(400, f"Tham số {name} phải là số nguyên hoặc khoảng dạng 3-8")
+        return tuple(parts)
+
+    def _slice(self, params):
+        """Lát dữ liệu theo năm/tháng/địa điểm/vùng (lấy trong khoá, tính toán ngoài khoá)"""
+        year, month = self._int(params, 'year'), self._int(params, 'month')
+        if month is not None and year is None:
+            raise HTTPError(400, "Cần có year khi lọc theo month")
+        with self._lock:
+            index = self.store.index()
+            if month is not None:
+                df = index.month(year, month)
+            elif year is not None:
+                df = index.year(year)
+            else:
+                df = index.df
+            if 'location' in params:
+                df = df[df['location_name'] == params['location']]
+            if 'region' in params and 'location_region' in df.columns:
+                df = df[df['location_region'] == params['region']]
+        return df
+
+    # --- Các điểm truy vấn ---
+
+    def health(self, params):
+        with self._lock:
+            rows = len(self.store)
+        return {'rows': rows, 'version': self.version, 'cache': {'entries': len(self._cache),
+                                                                 'hits': self.hits, 'misses': self.misses}}
+
+    def stats(self, params):
+        col = params.get('col', 'day_avgtemp_c')
+        by = params.get('by')
+        if col not in self.cube.columns:
+            raise HTTPError(400, f"Không có cột số {col}")
+        if by is not None and by not in ('location', 'region', 'year', 'month'):
+            raise HTTPError(400, "by phải là location, region, year hoặc month")
+        with self._lock:
+            result = self.cube.stats(col, by=by, year=self._int(params, 'year'), month=self._int(params, 'month'),
+                                     location=params.get('location'), region=params.get('region'))
+        return {'column': col, 'by': by, 'rows': _records(result.reset_index() if by else result)}
+
+    def monthly(self, params):
+        """Nhiệt độ (hoặc cột col) trung bình theo tháng"""
+        return self.stats({**params, 'by': 'month'})
+
+    def heatwaves(self, params):
+        df = self._slice(params)
+        events = detect_heatwaves(df, params.get('col', 'day_avgtemp_c'),
+                                  threshold=self._numbers(params, 'threshold', 30),
+                                  min_days=self._numbers(params, 'min_days', 3))
+        return {'count': len(events), 'events': _records(events)}
+
+    def heavy_rain(self, params):
+        """Các đợt mưa lớn theo lượng mưa cộng dồn; windows=1:100,3:150 đặt ngưỡng cho từng cửa sổ,
+        threshold chỉ đổi ngưỡng 1 ngày"""
+        windows = None
+        if 'windows' in params:
+            try:
+                windows = {int(w): float(t) for w, t in (item.split(':') for item in params['windows'].split(','))}
+            except ValueError:
+                raise HTTPError(400, "windows phải có dạng số_ngày:ngưỡng_mm, ví dụ 1:100,3:150")
+            if not windows or min(windows) < 1:
+                raise HTTPError(400, "Số ngày cộng dồn phải từ 1 trở lên")
+        threshold = self._numbers(params, 'threshold', None)
+        if isinstance(threshold, list):
+            raise HTTPError(400, "threshold chỉ nhận một giá trị (dùng windows để đặt nhiều ngưỡng)")
+        df = self._slice(params)
+        events = detect_heavy_rain(df, threshold_mm=threshold, windows=windows)
+        return {'count': len(events), 'events': _records(events)}
+
+    def correlation(self, params):
+        """Ma trận tương quan gộp từ các ô (địa điểm, năm, tháng); month có thể là khoảng 3-8"""
+        year = self._int(params, 'year')
+        month = self._range(params, 'month')
+        if month is not None and year is None:
+            raise HTTPError(400, "Cần có year khi lọc theo month")
+        with self._lock:
+            corr = prepare_correlation_from_cube(self.covariance, year=year, month=month,
+                                                 location=params.get('location'), region=params.get('region'))
+        if corr is None:
+            return {'columns': [], 'matrix': []}
+        return {'columns': list(corr.columns), 'matrix': corr.round(4).replace({np.nan: None}).values.tolist()}
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer giao mỗi kết nối cho một nhóm luồng cố định thay vì tạo luồng mới"""
+
+    def __init__(self, address, handler, service, workers=8):
+        super().__init__(address, handler)
+        self.service = service
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+class StatsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Tiêu đề và nội dung được gửi thành hai lần ghi; tắt Nagle để lần ghi sau không bị giữ lại ~40ms
+    disable_nagle_algorithm = True
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            status, payload = self.server.service.handle(method, url.path.rstrip('/') or '/', params)
+        except HTTPError as e:
+            status, payload = e.status, json.dumps({'error': str(e)}, ensure_ascii=False).encode('utf-8')
+        except Exception as e:
+            status, payload = 500, json.dumps({'error': f"Lỗi máy chủ: {e}"}, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(data_path='df_weather.csv', host='127.0.0.1', port=8765, workers=8, journal=True,
+                verbose=False):
+    service = StatsService(data_path, journal=journal)
+    server = PooledHTTPServer((host, port), StatsHandler, service, workers)
+    server.verbose = verbose
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dịch vụ HTTP/JSON cung cấp số liệu thống kê thời tiết")
+    parser.add_argument('--data', default='df_weather.csv', help="file dữ liệu CSV")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=8, help="số luồng xử lý yêu cầu")
+    parser.add_argument('--no-journal', action='store_true', help="bỏ qua các thay đổi chưa lưu trong nhật ký")
+    parser.add_argument('--verbose', action='store_true', help="in log từng yêu cầu")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    server = make_server(args.data, args.host, args.port, args.workers, not args.no_journal, args.verbose)
+    print(f"Đã nạp {len(server.service.store)} bản ghi ({time.perf_counter() - t0:.2f}s)")
+    print(f"Đang phục vụ tại http://{args.host}:{args.port} (Ctrl+C để dừng)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
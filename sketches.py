@@ -0,0 +1,124 @@
+import math
+
+import numpy as np
+
+
+class QuantileSketch:
+    """Phác thảo phân vị gần đúng (kiểu KLL), gộp được và dùng bộ nhớ cố định.
+
+    Giá trị được gom vào nhiều tầng; khi một tầng đầy thì được sắp xếp và chỉ giữ lại
+    một nửa (xen kẽ) đẩy lên tầng trên với trọng số gấp đôi. Bộ nhớ chỉ còn khoảng
+    O(k) phần tử dù nạp bao nhiêu giá trị, sai số thứ hạng cỡ 1/k. Hai phác thảo có thể
+    gộp với nhau (merge) nên tính được theo từng khối dữ liệu hoặc từng ô rồi cộng lại.
+    """
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.n = 0
+        self.min = math.nan
+        self.max = math.nan
+        self._levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.n
+
+    def _capacity(self, level):
+        depth = len(self._levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        """Nạp thêm một mảng giá trị (NaN bị bỏ qua)"""
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.n += len(values)
+        self.min = float(np.fmin(self.min, values.min()))
+        self.max = float(np.fmax(self.max, values.max()))
+        self._levels[0] = np.concatenate([self._levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Gộp phác thảo khác vào phác thảo này"""
+        if not other.n:
+            return self
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.empty(0))
+        for h, items in enumerate(other._levels):
+            self._levels[h] = np.concatenate([self._levels[h], items])
+        self.n += other.n
+        self.min = float(np.fmin(self.min, other.min))
+        self.max = float(np.fmax(self.max, other.max))
+        self._compress()
+        return self
+
+    def _compress(self):
+        h = 0
+        while h < len(self._levels):
+            items = self._levels[h]
+            if len(items) > self._capacity(h):
+                if h + 1 == len(self._levels):
+                    self._levels.append(np.empty(0))
+                items = np.sort(items)
+                # Số phần tử lẻ: giữ lại một phần tử ở tầng hiện tại để tổng trọng số không đổi
+                rest, items = items[len(items) - (len(items) % 2):], items[:len(items) - (len(items) % 2)]
+                promoted = items[int(self._rng.integers(2))::2]
+                self._levels[h] = rest
+                self._levels[h + 1] = np.concatenate([self._levels[h + 1], promoted])
+            h += 1
+
+    def _weighted(self):
+        items = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self._levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        """Phân vị q (một số hoặc mảng trong [0, 1]); NaN nếu chưa có dữ liệu"""
+        q = np.asarray(q, dtype=float)
+        if not self.n:
+            return np.full(q.shape, np.nan) if q.ndim else math.nan
+        items, cum = self._weighted()
+        pos = np.searchsorted(cum, q * cum[-1], 'left')
+        out = items[np.minimum(pos, len(items) - 1)]
+        # Hai đầu luôn trả về giá trị nhỏ nhất/lớn nhất chính xác
+        out = np.where(q <= 0, self.min, np.where(q >= 1, self.max, out))
+        return out if q.ndim else float(out)
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def rank(self, value):
+        """Tỉ lệ (gần đúng) các giá trị nhỏ hơn hoặc bằng value"""
+        if not self.n:
+            return math.nan
+        items, cum = self._weighted()
+        i = np.searchsorted(items, value, 'right')
+        return float(cum[i - 1] / cum[-1]) if i else 0.0
+
+    def box_stats(self, whis=1.5, max_fliers=50, label=None):
+        """Thống kê hộp (dạng dict cho Axes.bxp): tứ phân vị, râu và một mẫu giới hạn các điểm ngoại lai.
+
+        Râu là giá trị xa nhất còn nằm trong [Q1 - whis·IQR, Q3 + whis·IQR] như boxplot thông thường;
+        điểm ngoại lai lấy từ các phần tử phác thảo còn giữ (kèm min/max chính xác), tối đa max_fliers điểm.
+        """
+        q1, med, q3 = self.quantile([0.25, 0.5, 0.75])
+        stats = {'label': label, 'q1': q1, 'med': med, 'q3': q3,
+                 'whislo': q1, 'whishi': q3, 'fliers': np.empty(0)}
+        if not self.n:
+            return stats
+        items, _ = self._weighted()
+        items = np.unique(np.concatenate([items, [self.min, self.max]]))
+        lo, hi = q1 - whis * (q3 - q1), q3 + whis * (q3 - q1)
+        inside = items[(items >= lo) & (items <= hi)]
+        stats['whislo'] = float(inside[0]) if len(inside) else q1
+        stats['whishi'] = float(inside[-1]) if len(inside) else q3
+        fliers = items[(items < lo) | (items > hi)]
+        if len(fliers) > max_fliers:
+            # Giữ hai đầu và lấy đều phần còn lại
+            keep = np.unique(np.r_[0, len(fliers) - 1, np.linspace(0, len(fliers) - 1, max_fliers - 2).round()])
+            fliers = fliers[keep.astype(int)]
+        stats['fliers'] = fliers
+        return stats
@@ -0,0 +1,74 @@
+import importlib
+import sys
+import time
+
+from instrumentation import span, tracer
+
+# Mốc thời gian khi mô-đun này được nạp lần đầu (main.py nạp nó trước mọi thư viện nặng)
+PROCESS_START = time.perf_counter()
+
+# Ngân sách thời gian từ lúc khởi động tới khi cửa sổ đầu tiên hiện ra (ms)
+FIRST_WINDOW_BUDGET_MS = 500
+
+# Các mô-đun cần cho dữ liệu (kéo theo numpy/pandas), nạp ở luồng nền trước khi đọc dữ liệu
+DATA_MODULES = ['numpy', 'pandas', 'load_data', 'clean_data', 'record_store', 'journal', 'aggregates',
+                'analysis', 'widgets', 'visualization']
+# Bộ vẽ biểu đồ: matplotlib/seaborn (qua visualization.load_plotting) và backend TkAgg
+PLOTTING_MODULES = ['matplotlib.backends.backend_tkagg']
+
+
+# Nạp lần lượt các mô-đun, mỗi mô-đun một span import.<tên> (mô-đun đã nạp rồi thì gần như không tốn gì)
+def import_modules(names):
+    for name in names:
+        if name in sys.modules:
+            continue
+        with span(f"import.{name}"):
+            importlib.import_module(name)
+
+
+# Nạp trước bộ vẽ ở luồng nền để biểu đồ đầu tiên không phải chờ nạp matplotlib/seaborn.
+# Vẽ thử một figure nhỏ bằng Agg để nạp sẵn bộ đệm font (không đụng tới Tk nên an toàn ở luồng nền).
+def prewarm_plotting():
+    with span('prewarm.plotting'):
+        import_modules(['visualization'])
+        sys.modules['visualization'].load_plotting()
+        import_modules(PLOTTING_MODULES)
+        with span('prewarm.font_cache'):
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+            fig = Figure(figsize=(2, 2))
+            fig.add_subplot().set_title('0')
+            FigureCanvasAgg(fig).draw()
+
+
+# Các mốc khởi động (ms tính từ PROCESS_START), do ứng dụng ghi lại khi tới mỗi mốc
+milestones = {}
+
+
+def mark(name):
+    milestones[name] = (time.perf_counter() - PROCESS_START) * 1000
+    return milestones[name]
+
+
+# In bảng thời gian khởi động: các mốc, rồi từng span (nạp mô-đun, khởi tạo, đọc dữ liệu) theo thứ tự bắt đầu
+def print_startup_profile(budget_ms=FIRST_WINDOW_BUDGET_MS, min_ms=1.0):
+    print("\n=== Thời gian khởi động ===")
+    for name, at in milestones.items():
+        print(f"  {name:<28} {at:>9.1f} ms")
+    first = milestones.get('first_window')
+    if first is not None:
+        verdict = "trong ngân sách" if first <= budget_ms else "VƯỢT ngân sách"
+        print(f"  -> cửa sổ đầu tiên sau {first:.0f} ms ({verdict} {budget_ms} ms)")
+
+    print(f"\n{'span':<48} {'luồng':<22} {'bắt đầu':>9} {'thời gian':>10}")
+    for s in sorted(tracer.spans, key=lambda s: s['start']):
+        wall = s['wall'] * 1000
+        if wall < min_ms:
+            continue
+        name = '  ' * s['depth'] + s['name']
+        start = (s['start'] - PROCESS_START) * 1000
+        print(f"{name:<48} {s['thread'][:22]:<22} {start:>9.1f} {wall:>10.1f}")
+
+    total = sum(s['wall'] for s in tracer.spans if s['name'].startswith('import.')) * 1000
+    print(f"\nTổng thời gian nạp mô-đun: {total:.0f} ms")
+    return first is None or first <= budget_ms
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import journal
+from analysis import delete_record, update_record
+from journal import Journal, journal_path_for
+from load_data import file_fingerprint, load_weather_data
+from record_store import RecordStore
+
+
+# Bảng nhỏ: 3 địa điểm x 5 ngày, sắp theo (ngày, địa điểm)
+@pytest.fixture
+def weather():
+    dates = pd.date_range('2024-05-01', periods=5)
+    rows = [{'location_name': name, 'location_region': region, 'date': date,
+             'day_avgtemp_c': 25.0 + i + 0.5 * j, 'day_totalprecip_mm': float(i * j)}
+            for i, date in enumerate(dates)
+            for j, (name, region) in enumerate([('An Giang', 'Nam Bộ'), ('Hà Nội', 'Bắc Bộ'), ('Huế', 'Trung Bộ')])]
+    return pd.DataFrame(rows)
+
+
+def _row(store, date, location):
+    df = store.frame()
+    return df[(df['date'] == pd.Timestamp(date)) & (df['location_name'] == location)]
+
+
+def test_add_keeps_key_order(weather):
+    store = RecordStore(weather)
+    store.add({'location_name': 'Cà Mau', 'date': '2024-05-03', 'day_avgtemp_c': 30.0})
+    df = store.frame()
+    assert len(df) == 16
+    assert df['date'].is_monotonic_increasing
+    assert _row(store, '2024-05-03', 'Cà Mau')['day_avgtemp_c'].item() == 30.0
+    with pytest.raises(ValueError):
+        store.add({'location_name': 'Huế', 'date': '2024-05-03'})
+
+
+def test_update_and_delete(weather):
+    store = RecordStore(weather)
+    assert store.update({'date': '2024-05-02', 'location_name': 'Huế'}, {'day_avgtemp_c': 40.0}) == 1
+    assert _row(store, '2024-05-02', 'Huế')['day_avgtemp_c'].item() == 40.0
+    assert store.delete({'location_name': 'Hà Nội'}) == 5
+    assert len(store.frame()) == 10
+    assert store.update({'location_name': 'Hà Nội'}, {'day_avgtemp_c': 0.0}) == 0
+
+
+def test_rekey_moves_row(weather):
+    store = RecordStore(weather)
+    store.update({'date': '2024-05-01', 'location_name': 'Huế'}, {'date': '2024-05-10'})
+    df = store.frame()
+    assert df['date'].is_monotonic_increasing
+    assert _row(store, '2024-05-01', 'Huế').empty
+    assert _row(store, '2024-05-10', 'Huế')['day_avgtemp_c'].item() == 26.0
+
+
+def test_rekey_clash_leaves_store_unchanged(weather):
+    store = RecordStore(weather)
+    before = store.frame().copy()
+    with pytest.raises(ValueError):
+        store.update({'date': '2024-05-01', 'location_name': 'Huế'}, {'date': '2024-05-02'})
+    pd.testing.assert_frame_equal(store.frame(), before)
+
+
+def test_apply_batch_rolls_back_on_error(weather):
+    store = RecordStore(weather)
+    changes = []
+    store.subscribe(lambda removed, added: changes.append((removed, added)))
+    before, version = store.frame().copy(), store.version
+    with pytest.raises(ValueError):
+        store.apply_batch([
+            ('update', {'location_name': 'Huế'}, {'day_avgtemp_c': 0.0}),
+            ('delete', {'date': '2024-05-01'}),
+            ('add', {'location_name': 'An Giang', 'date': '2024-05-02'}),
+        ])
+    pd.testing.assert_frame_equal(store.frame(), before)
+    assert store.version == version
+    assert changes == []
+
+    assert store.apply_batch([('delete', {'date': '2024-05-01'}),
+                              ('add', {'location_name': 'Cà Mau', 'date': '2024-05-01'})]) == [3, 1]
+    assert len(store.frame()) == 13
+    assert len(changes) == 2
+
+
+def test_legacy_wrappers_ignore_unknown_identifier_columns(weather):
+    df = update_record(weather, {'location_name': 'Huế', 'station_id': 7}, {'day_avgtemp_c': 0.0})
+    assert (df.loc[df['location_name'] == 'Huế', 'day_avgtemp_c'] == 0.0).all()
+    df = delete_record(df, {'location_name': 'Huế', 'station_id': 7})
+    assert len(df) == 10
+    with pytest.raises(ValueError):
+        RecordStore(weather).update({'location_name': 'Huế', 'station_id': 7}, {'day_avgtemp_c': 0.0})
+
+
+def test_journal_replay_after_crash_mid_compact(weather, tmp_path, monkeypatch):
+    path = str(tmp_path / 'weather.csv')
+    weather.to_csv(path, index=False)
+    base_hash = file_fingerprint(path)['sha1']
+    store = RecordStore(weather)
+    log = Journal(journal_path_for(path), base_hash)
+
+    def edit(op, *args):
+        getattr(store, op)(*args)
+        log.append(op, *args)
+
+    edit('update', {'date': '2024-05-02', 'location_name': 'Huế'}, {'day_avgtemp_c': 40.0})
+    edit('add', {'location_name': 'Cà Mau', 'date': pd.Timestamp('2024-05-03'), 'day_avgtemp_c': 30.0})
+    snapshot, upto = store.frame().copy(), log.seq
+    # Thao tác ghi trong lúc đang gộp: không nằm trong ảnh chụp nên phải được áp lại
+    edit('delete', {'location_name': 'Hà Nội', 'date': '2024-05-05'})
+
+    # Dừng sau khi file dữ liệu đã được thay nhưng trước khi nhật ký được viết lại
+    def crash(path, write):
+        raise OSError("dừng giữa chừng")
+    monkeypatch.setattr(journal, '_replace_atomic', crash)
+    with pytest.raises(OSError):
+        log.compact(snapshot, path, upto)
+    monkeypatch.undo()
+
+    df = load_weather_data(path, use_cache=False)
+    new_hash = df.attrs['source_hash']
+    assert new_hash != base_hash
+    reopened = RecordStore(df)
+    recovered = Journal(journal_path_for(path), new_hash)
+    assert recovered.pending(new_hash) == [e for e in recovered.pending() if e['seq'] > upto]
+    assert recovered.replay(reopened, new_hash) == (1, 0)
+
+    got, expected = reopened.frame(), store.frame()
+    assert len(got) == len(expected) == 15
+    cols = ['location_name', 'day_avgtemp_c', 'day_totalprecip_mm']
+    np.testing.assert_array_equal(got['date'].to_numpy(), expected['date'].to_numpy())
+    pd.testing.assert_frame_equal(got[cols].astype({'location_name': str}), expected[cols].astype({'location_name': str}))
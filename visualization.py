@@ -1,95 +1,273 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
+import threading
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
 
+from downsample import decimate
+from instrumentation import span, traced
+
+# matplotlib/seaborn được nạp khi tạo figure đầu tiên (hoặc sớm hơn ở luồng nền, xem load_plotting),
+# để các phần chỉ cần tính toán (prepare_*, CORRELATION_COLUMNS) không phải chờ nạp bộ vẽ
+mdates = setp = Figure = sns = None
+_plotting_lock = threading.Lock()
+
+CORRELATION_COLUMNS = [
+    'day_avgtemp_c',  # Nhiệt độ
+    'day_avghumidity',  # Độ ẩm
+    'day_totalprecip_mm',  # Lượng mưa
+    'day_maxwind_kph',  # Gió
+    'day_uv',  # UV
+    'day_avgvis_km',  # Tầm nhìn (Mới)
+    'day_daily_chance_of_rain'  # Khả năng mưa (Mới)
+]
+# Đặt tên tiếng Việt
+READABLE_NAMES = {
+    'day_avgtemp_c': 'Nhiệt độ',
+    'day_avghumidity': 'Độ ẩm',
+    'day_totalprecip_mm': 'Lượng mưa',
+    'day_maxwind_kph': 'Gió',
+    'day_uv': 'Tia UV',
+    'day_avgvis_km': 'Tầm nhìn',
+    'day_daily_chance_of_rain': 'Khả năng mưa'
+}
+
+
+# Nạp matplotlib/seaborn và đặt giao diện biểu đồ (chỉ làm một lần, gọi được từ luồng nền)
+def load_plotting():
+    global mdates, setp, Figure, sns
+    if sns is not None:
+        return
+    with _plotting_lock:
+        if sns is not None:
+            return
+        with span('import.matplotlib'):
+            import matplotlib.dates as _mdates
+            from matplotlib.artist import setp as _setp
+            from matplotlib.figure import Figure as _Figure
+        with span('import.seaborn'):
+            import seaborn as _sns
+        _sns.set_theme(style="whitegrid")
+        mdates, setp, Figure = _mdates, _setp, _Figure
+        # Gán sns sau cùng: các luồng khác thấy sns khác None là bộ vẽ đã sẵn sàng
+        sns = _sns
+
+
+# Thứ tự các vùng theo trung vị nhiệt độ giảm dần (phần tính toán của boxplot, chạy được ở luồng nền)
+@traced('analysis.prepare_region_comparison')
+def prepare_region_comparison(df):
+    if 'location_region' not in df.columns:
+        return None
+    return df.groupby('location_region', observed=True)['day_avgtemp_c'].median() \
+        .sort_values(ascending=False).index
+
+
+# Ma trận tương quan giữa các yếu tố (phần tính toán của heatmap, chạy được ở luồng nền)
+@traced('analysis.prepare_correlation')
+def prepare_correlation(df):
+    valid_cols = [c for c in CORRELATION_COLUMNS if c in df.columns]
+    if len(valid_cols) > 1:
+        return df[valid_cols].rename(columns=READABLE_NAMES).corr()
+    return None
+
+
+# Ma trận tương quan lấy từ CovarianceCube: gộp các ô của lát (year, month, region, location) thay vì quét lại dòng
+def prepare_correlation_from_cube(cube, **filters):
+    corr = cube.corr(**filters)
+    if len(corr.columns) < 2 or corr.isna().all().all():
+        return None
+    return corr.rename(index=READABLE_NAMES, columns=READABLE_NAMES)
+
+
+class FigureManager:
+    """Quản lý vòng đời của mọi figure do WeatherVisualizer tạo ra.
+
+    Figure được tạo trực tiếp (không qua pyplot) nên không bị giữ lại trong danh sách figure
+    toàn cục của pyplot; figure được giải phóng khi widget hiển thị nó bị huỷ. Ngoài ra giữ một
+    LRU nhỏ các khung hiển thị đã vẽ, theo khoá (view, năm, tháng, phiên bản dữ liệu), để quay
+    lại một khung vừa xem không phải vẽ lại.
+    """
+
+    def __init__(self, max_views=6):
+        self.max_views = max_views
+        self._figures = set()
+        self._views = OrderedDict()
+
+    def __len__(self):
+        return len(self._figures)
+
+    def new_figure(self, figsize):
+        load_plotting()
+        fig = Figure(figsize=figsize)
+        self._figures.add(fig)
+        return fig
+
+    def release(self, fig):
+        """Giải phóng một figure (xoá toàn bộ artist để thu hồi bộ nhớ)"""
+        if fig in self._figures:
+            self._figures.discard(fig)
+            fig.clear()
+
+    def attach(self, fig, widget):
+        """Tự giải phóng figure khi widget hiển thị nó bị huỷ"""
+        widget.bind('<Destroy>', lambda e: self.release(fig) if e.widget is widget else None, add='+')
+
+    def get_view(self, key):
+        view = self._views.get(key)
+        if view is not None:
+            self._views.move_to_end(key)
+            return view[0]
+        return None
+
+    def put_view(self, key, value, on_evict=None):
+        self._views[key] = (value, on_evict)
+        self._views.move_to_end(key)
+        while len(self._views) > self.max_views:
+            _, (old, evict) = self._views.popitem(last=False)
+            if evict is not None:
+                evict(old)
+
+    def cached_views(self):
+        return [value for value, _ in self._views.values()]
+
+    def discard_views(self, predicate=None):
+        """Bỏ các khung đã lưu (tất cả, hoặc những khung có khoá thoả predicate)"""
+        for key in [k for k in self._views if predicate is None or predicate(k)]:
+            value, evict = self._views.pop(key)
+            if evict is not None:
+                evict(value)
+
 
 class WeatherVisualizer:
-    def __init__(self, df):
+    def __init__(self, df, figures=None):
         self.df = df
-        sns.set_theme(style="whitegrid")
+        self.figures = figures if figures is not None else FigureManager()
+
+    # Vẽ một chuỗi thời gian có giảm mẫu: chỉ giữ khoảng max_points điểm (mặc định bằng số pixel
+    # theo chiều ngang của figure) và giảm mẫu lại theo vùng đang xem mỗi khi người dùng phóng to/thu nhỏ.
+    # method: 'lttb', 'minmax' hoặc None (vẽ đủ mọi điểm).
+    def plot_series(self, ax, x, y, max_points=None, method='lttb', **kwargs):
+        x = np.asarray(x)
+        y = np.asarray(y, dtype=float)
+        ok = ~np.isnan(y)
+        x, y = x[ok], y[ok]
+        if method is None:
+            return ax.plot(x, y, **kwargs)[0]
+        if max_points is None:
+            max_points = int(ax.figure.get_figwidth() * ax.figure.dpi)
+
+        idx = decimate(x, y, max_points, method)
+        line, = ax.plot(x[idx], y[idx], **kwargs)
+        xnum = mdates.date2num(x) if np.issubdtype(x.dtype, np.datetime64) else x.astype(float)
+
+        def on_xlim_changed(axes):
+            lo, hi = axes.get_xlim()
+            start = max(int(np.searchsorted(xnum, lo)) - 1, 0)
+            stop = min(int(np.searchsorted(xnum, hi, 'right')) + 1, len(xnum))
+            view = decimate(x[start:stop], y[start:stop], max_points, method) + start
+            line.set_data(x[view], y[view])
+
+        ax.callbacks.connect('xlim_changed', on_xlim_changed)
+        return line
 
     # Biểu đồ đường: Xu hướng nhiệt độ theo thời gian
-    def plot_temp_trend(self):
+    @traced('plot.temp_trend')
+    def plot_temp_trend(self, max_points=None, method='lttb'):
         if 'date' not in self.df.columns or 'day_avgtemp_c' not in self.df.columns:
             return None
 
-        fig = plt.figure(figsize=(10, 5))
-        daily_avg = self.df.groupby('date')['day_avgtemp_c'].mean()
-        plt.plot(daily_avg.index, daily_avg.values, label='Nhiệt độ TB (°C)', color='#d62728')
-        plt.title('Xu hướng Nhiệt độ trung bình theo Thời gian')
-        plt.xlabel('Ngày')
-        plt.ylabel('Nhiệt độ (°C)')
-        plt.legend()
-        plt.tight_layout()
+        fig = self.figures.new_figure(figsize=(10, 5))
+        ax = fig.add_subplot()
+        with span('plot.groupby'):
+            daily_avg = self.df.groupby('date')['day_avgtemp_c'].mean()
+        self.plot_series(ax, daily_avg.index.to_numpy(), daily_avg.to_numpy(), max_points, method,
+                         label='Nhiệt độ TB (°C)', color='#d62728')
+        ax.set_title('Xu hướng Nhiệt độ trung bình theo Thời gian')
+        ax.set_xlabel('Ngày')
+        ax.set_ylabel('Nhiệt độ (°C)')
+        ax.legend()
+        fig.tight_layout()
         return fig
 
     # Biểu đồ cột: Nhiệt độ trung bình theo tháng
-    def plot_monthly_stats(self):
-        if 'month' not in self.df.columns:
-            self.df['month'] = pd.to_datetime(self.df['date']).dt.month
-
-        fig = plt.figure(figsize=(8, 5))
-        monthly_avg = self.df.groupby('month')['day_avgtemp_c'].mean()
-        plt.bar(monthly_avg.index, monthly_avg.values, color='#ff7f0e', alpha=0.8)
-        plt.title('Nhiệt độ Trung bình từng Tháng')
-        plt.xlabel('Tháng')
-        plt.ylabel('Nhiệt độ (°C)')
-        plt.xticks(range(1, 13))
+    # monthly_avg: Series (tháng -> nhiệt độ TB) đã tính sẵn, ví dụ lấy từ AggregateCube
+    @traced('plot.monthly_stats')
+    def plot_monthly_stats(self, monthly_avg=None):
+        if monthly_avg is None:
+            if 'month' not in self.df.columns:
+                self.df['month'] = pd.to_datetime(self.df['date']).dt.month
+            with span('plot.groupby'):
+                monthly_avg = self.df.groupby('month')['day_avgtemp_c'].mean()
+
+        fig = self.figures.new_figure(figsize=(8, 5))
+        ax = fig.add_subplot()
+        ax.bar(monthly_avg.index, monthly_avg.values, color='#ff7f0e', alpha=0.8)
+        ax.set_title('Nhiệt độ Trung bình từng Tháng')
+        ax.set_xlabel('Tháng')
+        ax.set_ylabel('Nhiệt độ (°C)')
+        ax.set_xticks(range(1, 13))
         return fig
 
     # Boxplot: So sánh nhiệt độ giữa các vùng miền
-    def plot_region_comparison(self):
+    # stats: thống kê hộp đã tính sẵn (ví dụ QuantileCube.box_stats) thì vẽ thẳng bằng Axes.bxp, không cần dữ liệu dòng
+    @traced('plot.region_comparison')
+    def plot_region_comparison(self, order=None, stats=None):
+        if stats is not None:
+            return self._plot_box_stats(stats)
         if 'location_region' not in self.df.columns:
             return None
 
-        fig = plt.figure(figsize=(12, 6))
+        fig = self.figures.new_figure(figsize=(12, 6))
+        ax = fig.add_subplot()
         # Sắp xếp thứ tự
         try:
-            order = self.df.groupby('location_region')['day_avgtemp_c'].median().sort_values(ascending=False).index
-            sns.boxplot(data=self.df, x='location_region', y='day_avgtemp_c', order=order, palette="Set2")
-            plt.title('Phân bố Nhiệt độ theo Vùng miền (Độ ổn định khí hậu)')
-            plt.xlabel('Vùng')
-            plt.ylabel('Nhiệt độ (°C)')
-            plt.xticks(rotation=45, ha='right')
-            plt.tight_layout()
+            if order is None:
+                order = prepare_region_comparison(self.df)
+            with span('seaborn.boxplot'):
+                sns.boxplot(data=self.df, x='location_region', y='day_avgtemp_c', order=order, palette="Set2", ax=ax)
+            ax.set_title('Phân bố Nhiệt độ theo Vùng miền (Độ ổn định khí hậu)')
+            ax.set_xlabel('Vùng')
+            ax.set_ylabel('Nhiệt độ (°C)')
+            setp(ax.get_xticklabels(), rotation=45, ha='right')
+            fig.tight_layout()
             return fig
         except Exception as e:
             print(f"Lỗi khi vẽ biểu đồ vùng: {e}")
+            self.figures.release(fig)
             return None
 
+    def _plot_box_stats(self, stats):
+        if not stats:
+            return None
+        fig = self.figures.new_figure(figsize=(12, 6))
+        ax = fig.add_subplot()
+        with span('matplotlib.bxp'):
+            boxes = ax.bxp(stats, patch_artist=True, widths=0.6,
+                           flierprops={'marker': 'd', 'markersize': 4, 'markerfacecolor': '#555555'},
+                           medianprops={'color': '#333333'})
+        for patch, color in zip(boxes['boxes'], sns.color_palette("Set2", len(stats))):
+            patch.set_facecolor(color)
+        ax.set_title('Phân bố Nhiệt độ theo Vùng miền (Độ ổn định khí hậu)')
+        ax.set_xlabel('Vùng')
+        ax.set_ylabel('Nhiệt độ (°C)')
+        setp(ax.get_xticklabels(), rotation=45, ha='right')
+        fig.tight_layout()
+        return fig
+
     # Biểu đồ nhiệt (Heatmap) phân tích mối quan hệ giữa tất cả các yếu tố
-    def plot_correlation(self):
-        fig = plt.figure(figsize=(10, 8))
-
-        cols = [
-            'day_avgtemp_c',  # Nhiệt độ
-            'day_avghumidity',  # Độ ẩm
-            'day_totalprecip_mm',  # Lượng mưa
-            'day_maxwind_kph',  # Gió
-            'day_uv',  # UV
-            'day_avgvis_km',  # Tầm nhìn (Mới)
-            'day_daily_chance_of_rain'  # Khả năng mưa (Mới)
-        ]
-        # Đặt tên tiếng Việt
-        readable_names = {
-            'day_avgtemp_c': 'Nhiệt độ',
-            'day_avghumidity': 'Độ ẩm',
-            'day_totalprecip_mm': 'Lượng mưa',
-            'day_maxwind_kph': 'Gió',
-            'day_uv': 'Tia UV',
-            'day_avgvis_km': 'Tầm nhìn',
-            'day_daily_chance_of_rain': 'Khả năng mưa'
-        }
-        valid_cols = [c for c in cols if c in self.df.columns]
-
-        if len(valid_cols) > 1:
-            df_corr = self.df[valid_cols].rename(columns=readable_names)
-            corr = df_corr.corr()
-
-            sns.heatmap(corr, annot=True, cmap='coolwarm', fmt=".2f", linewidths=0.5)
-            plt.title('Phân tích tổng hợp: Tương quan giữa các yếu tố thời tiết')
-            plt.xticks(rotation=45, ha='right')
-            plt.yticks(rotation=0)
-            plt.tight_layout()
-            return fig
-        return None
\ No newline at end of file
+    @traced('plot.correlation')
+    def plot_correlation(self, corr=None):
+        if corr is None:
+            corr = prepare_correlation(self.df)
+        if corr is None:
+            return None
+
+        fig = self.figures.new_figure(figsize=(10, 8))
+        ax = fig.add_subplot()
+        with span('seaborn.heatmap'):
+            sns.heatmap(corr, annot=True, cmap='coolwarm', fmt=".2f", linewidths=0.5, ax=ax)
+        ax.set_title('Phân tích tổng hợp: Tương quan giữa các yếu tố thời tiết')
+        setp(ax.get_xticklabels(), rotation=45, ha='right')
+        setp(ax.get_yticklabels(), rotation=0)
+        fig.tight_layout()
+        return fig
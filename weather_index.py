@@ -0,0 +1,141 @@
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+
+# Chuẩn hoá chuỗi để tìm kiếm: chữ thường, bỏ dấu tiếng Việt (vd 'Hà Nội' -> 'ha noi')
+def fold_text(text):
+    text = unicodedata.normalize('NFD', str(text).lower()).replace('đ', 'd')
+    return ''.join(ch for ch in text if not unicodedata.combining(ch))
+
+
+class WeatherIndex:
+    """Chỉ mục truy vấn trên bảng dữ liệu đã sắp theo (ngày, địa điểm).
+
+    Giữ mảng ngày đã sắp xếp cùng vị trí bắt đầu/kết thúc của từng tháng và từng năm,
+    nên các lát cắt theo tháng, năm hoặc khoảng ngày là một lần tìm nhị phân và trả về
+    df.iloc[lo:hi] (không chép dữ liệu). Chỉ mục phụ theo địa điểm được dựng khi cần.
+    """
+
+    def __init__(self, df, dates=None):
+        self.df = df
+        if dates is None:
+            dates = df['date'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        self._dates = dates
+        self._locations = None
+        self._regions = self._folded = None
+
+        months = dates.view('datetime64[ns]').astype('datetime64[M]')
+        if len(months):
+            bounds = np.flatnonzero(months[1:] != months[:-1]) + 1
+            starts = np.concatenate([[0], bounds])
+            ends = np.concatenate([bounds, [len(months)]])
+        else:
+            starts = ends = np.empty(0, dtype=np.intp)
+
+        self._months = {}
+        self._years = {}
+        for lo, hi, m in zip(starts, ends, months[starts]):
+            if np.isnat(m):
+                continue
+            year, month = divmod(int(m.astype(np.int64)), 12)
+            year, month = year + 1970, month + 1
+            self._months[(year, month)] = (int(lo), int(hi))
+            y_lo, _ = self._years.get(year, (int(lo), int(hi)))
+            self._years[year] = (y_lo, int(hi))
+
+    def years(self):
+        """Danh sách các năm có dữ liệu"""
+        return sorted(self._years)
+
+    def month_bounds(self, year, month):
+        return self._months.get((int(year), int(month)), (0, 0))
+
+    def year_bounds(self, year):
+        return self._years.get(int(year), (0, 0))
+
+    def month(self, year, month):
+        """Dữ liệu của một tháng trong năm"""
+        lo, hi = self.month_bounds(year, month)
+        return self.df.iloc[lo:hi]
+
+    def year(self, year):
+        """Dữ liệu của cả năm"""
+        lo, hi = self.year_bounds(year)
+        return self.df.iloc[lo:hi]
+
+    def date_bounds(self, start=None, end=None):
+        lo = 0 if start is None else int(np.searchsorted(self._dates, pd.Timestamp(start).value, 'left'))
+        hi = len(self._dates) if end is None else int(np.searchsorted(self._dates, pd.Timestamp(end).value, 'right'))
+        return lo, max(lo, hi)
+
+    def date_range(self, start=None, end=None):
+        """Dữ liệu trong khoảng ngày [start, end] (bao gồm cả hai đầu)"""
+        lo, hi = self.date_bounds(start, end)
+        return self.df.iloc[lo:hi]
+
+    def _location_table(self):
+        if self._locations is None:
+            locations = self.df.groupby('location_name', observed=True, sort=True).indices
+            # Mỗi địa điểm thuộc một vùng: lấy vùng ở dòng đầu của từng địa điểm
+            if 'location_region' in self.df.columns:
+                first = [positions[0] for positions in locations.values()]
+                regions = self.df['location_region'].iloc[first].astype(object).fillna('').tolist()
+            else:
+                regions = [''] * len(locations)
+            self._regions = {str(name): str(region) for name, region in zip(locations, regions)}
+            self._folded = {name: fold_text(name) for name in locations}
+            # Gán sau cùng: luồng khác thấy _locations thì các bảng phụ cũng đã sẵn sàng
+            self._locations = locations
+        return self._locations
+
+    def regions(self):
+        """Danh sách các vùng miền có dữ liệu"""
+        self._location_table()
+        return sorted({r for r in self._regions.values() if r})
+
+    def match_locations(self, text=None, region=None):
+        """Các địa điểm có tên chứa text (không phân biệt hoa thường và dấu) và thuộc vùng region"""
+        names = list(self._location_table())
+        if text:
+            needle = fold_text(text.strip())
+            names = [name for name in names if needle in self._folded[name]]
+        if region:
+            names = [name for name in names if self._regions.get(str(name)) == region]
+        return names
+
+    def search(self, text=None, start=None, end=None, region=None):
+        """Vị trí (tăng dần) các dòng thoả bộ lọc địa điểm, khoảng ngày [start, end] và vùng miền.
+
+        Khoảng ngày là một lần tìm nhị phân; bộ lọc địa điểm/vùng được đổi thành tập địa điểm rồi lấy
+        vị trí của từng địa điểm trong khoảng đó, nên không phải quét cả bảng.
+        """
+        lo, hi = self.date_bounds(start, end)
+        if not text and not region:
+            return np.arange(lo, hi)
+        names = self.match_locations(text, region)
+        if len(names) == len(self._locations):
+            return np.arange(lo, hi)
+        mask = np.zeros(hi - lo, dtype=bool)
+        for name in names:
+            mask[self.location_positions(name, lo, hi) - lo] = True
+        return lo + np.flatnonzero(mask)
+
+    def location_positions(self, name, lo=0, hi=None):
+        """Vị trí các dòng của một địa điểm (tăng dần theo ngày), giới hạn trong [lo, hi)"""
+        self._location_table()
+        positions = self._locations.get(name, np.empty(0, dtype=np.intp))
+        if hi is None:
+            hi = len(self._dates)
+        return positions[np.searchsorted(positions, lo):np.searchsorted(positions, hi)]
+
+    def location(self, name, year=None, month=None):
+        """Dữ liệu của một địa điểm, có thể lọc thêm theo năm/tháng"""
+        if month is not None:
+            lo, hi = self.month_bounds(year, month)
+        elif year is not None:
+            lo, hi = self.year_bounds(year)
+        else:
+            lo, hi = 0, len(self._dates)
+        return self.df.take(self.location_positions(name, lo, hi))
@@ -0,0 +1,181 @@
+import tkinter as tk
+from tkinter import ttk
+
+import numpy as np
+import pandas as pd
+
+
+# Định dạng ngày cho các ô của bảng
+def format_date(value):
+    return pd.Timestamp(value).strftime('%d/%m/%Y') if not pd.isna(value) else ''
+
+
+class VirtualTable(tk.Frame):
+    """Bảng ảo hoá dựa trên ttk.Treeview.
+
+    Dữ liệu được giữ dưới dạng các mảng numpy theo cột; Treeview chỉ chứa đúng số dòng đang
+    nhìn thấy và các dòng này được điền lại giá trị khi cuộn. Lọc và sắp xếp thực hiện trên mảng
+    (qua một mảng chỉ số thứ tự), không đụng tới widget, nên bảng vẫn mượt với hàng chục nghìn dòng.
+
+    Với set_rows, bảng chỉ giữ DataFrame nguồn và mảng vị trí dòng cần hiện; giá trị của một trang
+    được lấy từ DataFrame khi trang đó hiện ra, nên mở được kết quả hàng triệu dòng ngay lập tức.
+
+    columns: danh sách (khoá cột, tiêu đề, độ rộng, hàm định dạng hoặc None).
+    """
+
+    def __init__(self, master, columns, rows=15, **kwargs):
+        super().__init__(master, **kwargs)
+        self.columns = columns
+        self.tree = ttk.Treeview(self, columns=[c[0] for c in columns], show='headings',
+                                 height=rows, selectmode='browse')
+        for key, heading, width, _ in columns:
+            self.tree.heading(key, text=heading, command=lambda k=key: self.sort_by(k))
+            self.tree.column(key, width=width, anchor='w', stretch=True)
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self._on_scrollbar)
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+
+        self._data = {}
+        self._source = None
+        self._mask = None
+        self._order = np.empty(0, dtype=np.intp)
+        self._sort_key, self._ascending = None, True
+        self._top = 0
+        self._rows = rows
+
+        self.tree.bind('<MouseWheel>', self._on_wheel)
+        self.tree.bind('<Button-4>', lambda e: self.scroll(-3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll(3))
+        self.tree.bind('<Configure>', self._on_configure)
+
+    def __len__(self):
+        return len(self._order)
+
+    def set_data(self, data):
+        """Nạp dữ liệu (DataFrame hoặc dict các mảng) cho bảng"""
+        self._data = {key: np.asarray(data[key]) for key, *_ in self.columns if key in data}
+        self._source = None
+        self._mask = None
+        self._apply()
+
+    def set_rows(self, df, positions, keep_position=False):
+        """Hiện các dòng df.iloc[positions] theo đúng thứ tự positions, chỉ đọc dữ liệu của trang đang xem.
+
+        Ở chế độ này không lọc/sắp xếp trên bảng (bộ lọc do nơi gọi tính sẵn thành positions).
+        keep_position: giữ nguyên vị trí cuộn (vd sau khi sửa một dòng).
+        """
+        top = self._top
+        self._data = {}
+        self._source = df
+        self._mask = None
+        self._sort_key = None
+        self._order = np.asarray(positions, dtype=np.intp)
+        self._top = 0
+        if keep_position:
+            self.scroll_to(top, force=True)
+        else:
+            self._refresh()
+
+    def set_filter(self, mask):
+        """Chỉ hiện các dòng có mask = True (None để bỏ lọc)"""
+        self._mask = mask
+        self._apply()
+
+    def filter_text(self, key, text):
+        """Lọc các dòng mà cột key chứa chuỗi text (không phân biệt hoa thường)"""
+        if not text or key not in self._data:
+            self.set_filter(None)
+            return
+        values = pd.Series(self._data[key], dtype=object).astype(str)
+        self.set_filter(values.str.contains(text, case=False, regex=False).to_numpy())
+
+    def sort_by(self, key):
+        """Sắp xếp theo một cột; bấm lại cùng cột để đảo chiều"""
+        if key not in self._data:
+            return
+        self._ascending = not self._ascending if key == self._sort_key else True
+        self._sort_key = key
+        self._apply()
+
+    def row(self, position):
+        """Giá trị các cột của dòng thứ position (theo thứ tự đang hiển thị)"""
+        i = self._order[position]
+        if self._source is not None:
+            return self._source.iloc[int(i)].to_dict()
+        return {key: values[i] for key, values in self._data.items()}
+
+    def selected_row(self):
+        """Dòng đang được chọn (hoặc None)"""
+        selection = self.tree.selection()
+        if not selection:
+            return None
+        position = self._top + self.tree.index(selection[0])
+        return self.row(position) if position < len(self._order) else None
+
+    def _apply(self):
+        if self._source is not None:
+            self._refresh()
+            return
+        n = len(next(iter(self._data.values()))) if self._data else 0
+        order = np.arange(n) if self._mask is None else np.flatnonzero(self._mask)
+        if self._sort_key is not None:
+            keys = self._data[self._sort_key][order]
+            ranked = np.argsort(keys, kind='stable')
+            if not self._ascending:
+                ranked = ranked[::-1]
+            order = order[ranked]
+        self._order = order
+        self._top = 0
+        self._refresh()
+
+    def _refresh(self):
+        visible = self._order[self._top:self._top + self._rows]
+        data, rows = self._data, visible
+        if self._source is not None:
+            # Chỉ đọc các dòng của trang đang xem từ DataFrame nguồn
+            data = {key: self._source[key].iloc[visible].to_numpy()
+                    for key, *_ in self.columns if key in self._source.columns}
+            rows = range(len(visible))
+        items = self.tree.get_children()
+        for item in items[len(visible):]:
+            self.tree.delete(item)
+        items = list(items[:len(visible)])
+        while len(items) < len(visible):
+            items.append(self.tree.insert('', 'end'))
+        for item, i in zip(items, rows):
+            self.tree.item(item, values=[
+                (fmt(data[key][i]) if fmt else data[key][i]) if key in data else ''
+                for key, _, _, fmt in self.columns
+            ])
+        self.tree.selection_remove(self.tree.selection())
+
+        total = len(self._order)
+        if total:
+            self.scrollbar.set(self._top / total, min(1.0, (self._top + self._rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll_to(self, top, force=False):
+        top = min(max(top, 0), max(len(self._order) - self._rows, 0))
+        if force or top != self._top:
+            self._top = top
+            self._refresh()
+
+    def scroll(self, delta):
+        self.scroll_to(self._top + delta)
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == 'moveto':
+            self.scroll_to(int(float(value) * len(self._order)))
+        elif action == 'scroll':
+            self.scroll(int(value) * (self._rows if unit == 'pages' else 1))
+
+    def _on_wheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+
+    def _on_configure(self, event):
+        row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        rows = max(1, event.height // row_height - 1)
+        if rows != self._rows:
+            self._rows = rows
+            self.scroll_to(self._top, force=True)